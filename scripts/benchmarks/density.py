@@ -0,0 +1,139 @@
+# Measures the matching search on documents with densely overlapping objects
+# Requires python 3
+
+# Usage (from the scripts folder):
+#
+#   <Python3 executable> -m benchmarks.density [-o <results.json>] [--max-density <n>]
+#                            [--documents <n>] [--groups <n>] [--group-size <n>]
+#                            [--seed <n>] [--limit <seconds>]
+#       -o [results.json]   - file the results are saved to (default: print only)
+#       --max-density [n]   - the highest density measured (default: 5)
+#       --documents [n]     - documents in a corpus (default: 3)
+#       --groups [n]        - groups of overlapping objects in a document (default: 1)
+#       --group-size [n]    - objects in a group (default: 6)
+#       --seed [n]          - random seed of the corpus generator (default: 1)
+#       --limit [seconds]   - a track is not measured at higher densities once its run
+#                             takes longer than that (default: 60)
+#
+# Corpora of growing density are generated by benchmarks.synthetic.DenseCorpus (see
+# there for what density means in every track) and evaluated in every track. The search
+# time and the search tree size come from the search_stats of the evaluators, the
+# results file holds them along with the revision of the scripts, so that the files of
+# two revisions can be compared.
+
+#########################################################################################
+
+import os
+import sys
+import gc
+import json
+import time
+import getopt
+import platform
+import tempfile
+
+from dialent.common.stats import SearchStats
+
+from benchmarks.scaling import tracks, revision
+from benchmarks.synthetic import DenseCorpus
+
+#########################################################################################
+
+def run(create, std_path, test_path):
+    """Evaluate the corpus with a new evaluator. Returns a tuple (elapsed time, total
+    SearchStats of all the documents)"""
+    gc.collect()
+    evaluator = create()
+    start = time.perf_counter()
+    evaluator.evaluate(std_path, test_path, '', is_silent=True)
+    elapsed = time.perf_counter() - start
+    total = SearchStats()
+    for stats in evaluator.search_stats.values():
+        total.add(stats)
+    return elapsed, total
+
+def measure(params, max_density, limit, tmp_path):
+    """Generate a corpus of every density and evaluate it in the tracks that are still
+    within the time limit. Returns a list of the result dictionaries"""
+    results = []
+    stopped = set()
+    print('    {:6} {:>7} {:>9} '.format('Track', 'Density', 'Total, s') +
+          SearchStats.header())
+    for density in range(max_density + 1):
+        corpus = DenseCorpus(density=density, **params)
+        std_path = os.path.join(tmp_path, str(density), 'std')
+        test_path = os.path.join(tmp_path, str(density), 'test')
+        corpus.write(std_path, test_path)
+
+        for track, create in tracks:
+            if track in stopped:
+                continue
+            elapsed, stats = run(create, std_path, test_path)
+            results.append({
+                'track' : track,
+                'density' : density,
+                'time' : elapsed,
+                'search' : stats.toDict()
+            })
+            print('    {:6} {:7d} {:9.3f} '.format(track, density, elapsed) +
+                  stats.toLine(), flush=True)
+            if elapsed > limit:
+                print('    {} is over the time limit, higher densities are skipped'
+                      .format(track))
+                stopped.add(track)
+
+    return results
+
+def usage():
+    print('Usage:')
+    print('<Python3 executable> -m benchmarks.density [-o <results.json>] [--max-density <n>]')
+    print('                         [--documents <n>] [--groups <n>] [--group-size <n>]')
+    print('                         [--seed <n>] [--limit <seconds>]')
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'o:h',
+            ['max-density=', 'documents=', 'groups=', 'group-size=', 'seed=', 'limit='])
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+        sys.exit(2)
+
+    output_path = ''
+    max_density = 5
+    limit = 60.0
+    params = {}
+    names = { '--documents' : 'n_documents', '--groups' : 'n_groups',
+              '--group-size' : 'group_size', '--seed' : 'seed' }
+    for o, a in opts:
+        if o == '-h':
+            usage()
+            sys.exit()
+        elif o == '-o':
+            output_path = a
+        elif o == '--max-density':
+            max_density = int(a)
+        elif o == '--limit':
+            limit = float(a)
+        else:
+            params[names[o]] = int(a)
+
+    parameters = DenseCorpus(**params).parameters()
+    del parameters['density']
+    print('Corpus: ' + ', '.join('{} {}'.format(k, v) for k, v in parameters.items()))
+    with tempfile.TemporaryDirectory() as tmp_path:
+        results = measure(params, max_density, limit, tmp_path)
+
+    if len(output_path) > 0:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'revision' : revision(),
+                'python' : platform.python_version(),
+                'parameters' : parameters,
+                'max_density' : max_density,
+                'results' : results
+            }, f, indent=2)
+            f.write('\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Measures the time spent in the cyclic garbage collector during a full track 2 run
+# Requires python 3
+
+# Usage (from the scripts folder):
+#
+#   <Python3 executable> -m benchmarks.gctime [std_dir] [test_dir] [-m]
+#       [std_dir]    - path to the standard files directory
+#       [test_dir]   - path to the track 2 response files directory
+#       -m           - use the simple evaluation mode
+#
+# Only the public evaluation interface is used, so the numbers for another revision can be
+# obtained by running this file with the scripts folder of that revision in PYTHONPATH
+
+#########################################################################################
+
+import sys
+import gc
+import time
+
+from dialent.task2.eval import Evaluator
+
+#########################################################################################
+
+class GCTimer:
+    """Collects the garbage collector statistics through gc.callbacks"""
+
+    def __init__(self):
+        self.collections = [0, 0, 0]
+        self.collected = [0, 0, 0]
+        self.elapsed = [0.0, 0.0, 0.0]
+        self._start = None
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self._start = time.perf_counter()
+        elif self._start != None:
+            generation = info['generation']
+            self.collections[generation] += 1
+            self.collected[generation] += info['collected']
+            self.elapsed[generation] += time.perf_counter() - self._start
+            self._start = None
+
+    def printStats(self):
+        print('    {:12} {:>12} {:>12} {:>12}'.format(
+            'Generation', 'Collections', 'Collected', 'Time, ms'))
+        for i in range(3):
+            print('    {:12} {:12} {:12} {:12.1f}'.format(
+                str(i), self.collections[i], self.collected[i], self.elapsed[i] * 1000))
+        print('    {:12} {:12} {:12} {:12.1f}'.format(
+            'total', sum(self.collections), sum(self.collected), sum(self.elapsed) * 1000))
+
+
+def measure(std_path, test_path, mode):
+    """Run the evaluation and report the garbage collector statistics"""
+    gc.collect()
+    timer = GCTimer()
+    gc.callbacks.append(timer)
+
+    start = time.perf_counter()
+    Evaluator(mode).evaluate(std_path, test_path, is_silent=True)
+    elapsed = time.perf_counter() - start
+
+    gc.callbacks.remove(timer)
+
+    print('Track 2 ({}) run: {} vs {}, {:.1f} s'.format(
+        mode, std_path, test_path, elapsed))
+    timer.printStats()
+
+    # everything loaded by the run is garbage now, and whatever is left for the
+    # collector is in reference cycles
+    print('    {:28} {:12}'.format('Unreachable after the run', gc.collect()))
+
+
+if __name__ == '__main__':
+    args = [x for x in sys.argv[1:] if x != '-m']
+    if len(args) != 2:
+        print('Usage: <Python3 executable> -m benchmarks.gctime [std_dir] [test_dir] [-m]')
+    else:
+        measure(args[0], args[1], 'simple' if '-m' in sys.argv else 'regular')
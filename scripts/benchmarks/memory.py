@@ -0,0 +1,53 @@
+# Measures the memory taken by the loaded standard markup
+# Requires python 3
+
+# Usage (from the scripts folder):
+#
+#   <Python3 executable> -m benchmarks.memory [std_dir]*
+#       [std_dir]    - path to a standard files directory (devset and testset by default)
+#
+# Only the public loading functions are used, so the numbers for another revision can be
+# obtained by running this file with the scripts folder of that revision in PYTHONPATH
+
+#########################################################################################
+
+import os
+import sys
+import gc
+import time
+import tracemalloc
+
+from dialent.task2.util import loadAllStandard
+
+#########################################################################################
+
+def measure(path):
+    """Load all documents from the given directory and report the memory they take"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    documents = loadAllStandard(path)
+    token_sets = [doc.makeTokenSets() for doc in documents]
+
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n = max(len(documents), 1)
+    print('{} ({} documents, {:.1f} s)'.format(path, len(documents), elapsed))
+    print('    {:20} {:10.1f}'.format('Total, MB', current / 2**20))
+    print('    {:20} {:10.1f}'.format('Peak, MB', peak / 2**20))
+    print('    {:20} {:10.0f}'.format('Bytes per document', current / n))
+
+    return documents, token_sets
+
+if __name__ == '__main__':
+    paths = sys.argv[1:]
+    if len(paths) == 0:
+        root = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..')
+        paths = [os.path.join(root, 'devset'), os.path.join(root, 'testset')]
+
+    # keep the loaded data, so that it is not freed until the end of the measurement
+    loaded = [measure(os.path.normpath(path)) for path in paths]
@@ -0,0 +1,70 @@
+# Compares the fast standard layer parsers from dialent.common.parsers with the original
+# csv-based parsing code
+# Requires python 3
+
+# Usage (from the scripts folder):
+#
+#   <Python3 executable> -m benchmarks.parsers [std_dir]*
+#       [std_dir]    - path to a standard files directory (devset and testset by default)
+#
+
+#########################################################################################
+
+import os
+import sys
+import time
+
+from dialent.common.util import decodeText
+from dialent.common.source import openSource
+from dialent.common.parsers import parseTokens, parseSpans, parseMentions
+from dialent.common.parsers import csvTokens, csvSpans, csvMentions
+
+#########################################################################################
+
+layers = [
+    ('.tokens', csvTokens, parseTokens),
+    ('.spans', csvSpans, parseSpans),
+    ('.objects', csvMentions, parseMentions)
+]
+
+def timeParser(parser, texts, repeat):
+    """Returns the best total time of parsing all the given texts and the parse result"""
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        res = [parser(text, filename) for filename, text in texts]
+        elapsed = time.perf_counter() - start
+        if best == None or elapsed < best:
+            best = elapsed
+    return best, res
+
+def benchmark(path, repeat=5):
+    """Time both parser versions on all documents in the given directory"""
+    source = openSource(path)
+    names = sorted(x for x in source.names() if x.startswith('book_'))
+
+    print('{} ({} documents, best of {})'.format(path, len(names), repeat))
+    print('    {:10} {:>8} {:>12} {:>12} {:>8}'.format(
+        'Layer', 'Lines', 'csv, ms', 'parsers, ms', 'Speedup'))
+    for ext, reference, parser in layers:
+        texts = [(source.location(name, ext), decodeText(source.read(name, ext)))
+                 for name in names]
+        n_lines = sum(text.count('\n') for filename, text in texts)
+
+        old, old_res = timeParser(reference, texts, repeat)
+        new, new_res = timeParser(parser, texts, repeat)
+        if ext == '.spans':
+            # the loader removes line breaks from the span texts anyway
+            old_res = [[x[:7] + (x[7].replace('\n', ''),) for x in doc] for doc in old_res]
+        assert(old_res == new_res)
+
+        print('    {:10} {:8} {:12.1f} {:12.1f} {:8.2f}'.format(
+            ext, n_lines, old * 1000, new * 1000, old / new))
+
+if __name__ == '__main__':
+    paths = sys.argv[1:]
+    if len(paths) == 0:
+        root = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..')
+        paths = [os.path.join(root, 'devset'), os.path.join(root, 'testset')]
+    for path in paths:
+        benchmark(os.path.normpath(path))
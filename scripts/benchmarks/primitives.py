@@ -0,0 +1,428 @@
+# Measures the per-pair primitives of the evaluation one by one on real standard data
+# Requires python 3
+
+# Usage (from the scripts folder):
+#
+#   <Python3 executable> -m benchmarks.primitives [std_dir] [-r <repeat>] [-n <documents>]
+#                            [-o <results.json>] [-b <baseline.json>] [-t <tolerance>]
+#       [std_dir]          - path to a standard files directory (devset by default)
+#       -r [repeat]        - measurements of every benchmark, the best is reported
+#                            (default: 5)
+#       -n [documents]     - number of the first documents of the directory used
+#                            (default: 20, 0 for all of them)
+#       -o [results.json]  - file the results are saved to, e.g. to be used as a baseline
+#       -b [baseline.json] - results of an earlier run to compare with
+#       -t [tolerance]     - relative slowdown (or growth of the allocated memory) that
+#                            is reported as a regression (default: 0.25)
+#
+# The inputs of the primitives are taken from the standard documents: the comparisons
+# a perfect response would need (responses are generated from the standard in memory).
+# All the caches (normalization, distances, attribute comparisons) are cleared before
+# every run, so the numbers are those of the first evaluation. A run shorter than
+# Microbenchmark.min_time is repeated within a measurement and the time is averaged,
+# the benchmarks are measured in turns (see measureAll). The allocations are
+# measured in a separate run with tracemalloc: the peak and the memory still held after
+# the run (e.g. by the caches).
+#
+# The speeds are compared relative to that of the 'reference' benchmark, a fixed loop of
+# plain Python code, so that a machine that is slower as a whole (e.g. a busy virtual
+# machine) is not taken for a regression. The exit code is 1 if a regression against
+# the baseline is found. The benchmarks that seem to regress are measured repeat more
+# times before that, and the best of all their measurements is compared again. Only the
+# public interface is used, so the numbers for another revision can be obtained by
+# running this file with the scripts folder of that revision in PYTHONPATH
+
+#########################################################################################
+
+import os
+import sys
+import gc
+import json
+import time
+import getopt
+import platform
+import tracemalloc
+
+from dialent.standard import Standard
+from dialent.common.util import decodeText, dist, compareStrings, normalize
+from dialent.common.util import safeNormalize, Normalizer, DistCache, StringPool
+from dialent.common.source import MemorySource, openSource
+from dialent.common.parsers import parseSpans
+
+from dialent.task1.eval import TokenSetQualityCalculator
+from dialent.task2.eval import EntityQualityCalculator
+from dialent.task3.eval import Cluster
+
+from dialent.task2.test import Test as Test2
+from dialent.task3.test import Test as Test3
+
+from benchmarks.scaling import revision
+
+#########################################################################################
+
+# name of the benchmark that measures the speed of the machine
+reference_name = 'reference'
+
+class Microbenchmark:
+    """A single primitive measured on a fixed list of inputs"""
+
+    def __init__(self, name, inputs, run, setup=None):
+        """Create the benchmark. run(inputs, state) performs one operation per input,
+        state is created before every run by setup() and is not measured"""
+        self.name = name
+        self.inputs = inputs
+        self.run = run
+        self.setup = setup if setup != None else lambda: None
+        # runs per measurement, see calibrate
+        self.number = 1
+        self.best = None
+
+    # a run shorter than that is repeated, as the timer resolution and the noise would
+    # outweigh it, seconds
+    min_time = 0.2
+
+    def calibrate(self):
+        """Choose the number of runs per measurement, so that it takes at least
+        min_time"""
+        elapsed = self.runOnce()
+        self.number = 1
+        if elapsed < Microbenchmark.min_time:
+            self.number = int(Microbenchmark.min_time / max(elapsed, 1e-6)) + 1
+
+    def measureTime(self):
+        """Measure the average time of a run once, the best measurement is kept"""
+        elapsed = 0.0
+        for k in range(self.number):
+            elapsed += self.runOnce()
+        if self.best == None or elapsed / self.number < self.best:
+            self.best = elapsed / self.number
+
+    def measure(self):
+        """Trace the allocations of a run. Returns a result dictionary, the time is the
+        best measurement of measureTime"""
+        best = self.best
+        state = self.setup()
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        self.run(self.inputs, state)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        n = len(self.inputs)
+        return {
+            'ops' : n,
+            'time' : best,
+            'ops_per_s' : n / best if best > 0 else 0.0,
+            'peak_kb' : (peak - before) / 2**10,
+            'retained_kb' : (current - before) / 2**10
+        }
+
+    def runOnce(self):
+        """Run the benchmark once. Returns the measured time"""
+        state = self.setup()
+        gc.collect()
+        # the collections would depend on all the objects alive, e.g. the inputs of
+        # the other benchmarks, so the collector is off the way it is in timeit
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            self.run(self.inputs, state)
+            return time.perf_counter() - start
+        finally:
+            gc.enable()
+
+
+class LoaderBenchmark(Microbenchmark):
+    """A standard layer loader. Only the time the run adds to state[0] is measured, the
+    allocations of the whole run are traced"""
+
+    def runOnce(self):
+        state = self.setup()
+        gc.collect()
+        gc.disable()
+        try:
+            self.run(self.inputs, state)
+            return state[0]
+        finally:
+            gc.enable()
+
+#########################################################################################
+# Cache handling
+
+def clearCaches():
+    """Clear the module level caches of the string primitives"""
+    Normalizer.cache.clear()
+    Normalizer.safe_cache.clear()
+    DistCache.table.clear()
+
+#########################################################################################
+# Inputs
+
+def loadInputs(path, n_documents=None):
+    """Load the standard documents from path and build the inputs of all the benchmarks.
+    Returns a dictionary {input name : list}"""
+    source = openSource(path)
+    names = sorted(set(x.split('.')[0] for x in source.names() if x.startswith('book_')),
+                   key=lambda x: int(x[5:]))
+    if n_documents != None:
+        names = names[:n_documents]
+
+    res = dict((x, []) for x in ['layers', 'strings', 'token_sets', 'entities',
+                                 'attributes', 'values', 'facts', 'clusters'])
+    for name in names:
+        std = Standard(name, path)
+        res['layers'].append( (std, [(source.location(name, ext),
+                                      decodeText(source.read(name, ext))
+                                      if source.has(name, ext) else None)
+                                     for ext in Standard.layers]) )
+
+        spans = res['layers'][-1][1][Standard.layers.index('.spans')]
+        res['strings'].extend(x[7] for x in parseSpans(spans[1], spans[0]))
+
+        token_sets = std.makeTokenSets()
+        res['token_sets'].extend((s, t) for s in token_sets for t in token_sets)
+
+        if std.has_coref:
+            text = ''.join(x.toTestString() + '\n\n' for x in std.entities
+                           if x.tag != 'unknown')
+            test = Test2(name, MemorySource({ name + '.task2' : text.encode('utf-8') }))
+            s_ent = [x for x in std.entities if len(x.attributes) > 0]
+            pairs = [(s, t) for s in s_ent for t in test.entities if s.tag == t.tag]
+            res['entities'].extend(pairs)
+            for s, t in pairs:
+                for x in s.attributes:
+                    for y in t.attributes:
+                        if x.name == y.name:
+                            res['attributes'].append( (x, y) )
+                            res['values'].extend((v1, v2) for v1 in x.values
+                                                 for v2 in y.values)
+
+        if std.has_facts:
+            text = ''.join(x.toTestString() + '\n' for x in std.facts)
+            test = Test3(name, MemorySource({ name + '.task3' : text.encode('utf-8') }))
+            s_facts = [x.makeEasyModeCopy() for x in std.facts]
+            res['facts'].extend((s, t) for s in s_facts for t in test.facts)
+            for s in s_facts:
+                cluster = Cluster.unpairedStandard(s)
+                for t in test.facts:
+                    if s.canMatch(t):
+                        cluster.add(t)
+                res['clusters'].append(cluster)
+
+    return res
+
+#########################################################################################
+# Benchmark bodies
+
+def runLoaders(layer):
+    """Returns the body of the benchmark of the loader of the given layer. The previous
+    layers of every document are loaded before the measured one, but not measured"""
+    index = Standard.layers.index(layer)
+
+    def setup():
+        clearCaches()
+        return [0.0]
+
+    def run(inputs, state):
+        # the strings are pooled the way they are when the standard is loaded
+        with StringPool.scope():
+            for std, texts in inputs:
+                loaders = [std.loadText, std.loadTokens, std.loadSpans, std.loadMentions,
+                           std.loadCoreference, std.loadFacts]
+                for loader, (location, text) in zip(loaders[:index], texts):
+                    loader(text, location)
+                location, text = texts[index]
+                start = time.perf_counter()
+                loaders[index](text, location)
+                state[0] += time.perf_counter() - start
+
+    return setup, run
+
+def buildBenchmarks(inputs):
+    """Returns the list of all the benchmarks on the given inputs"""
+    def pairs(f):
+        def run(items, state):
+            for x, y in items:
+                f(x, y)
+        return run
+
+    def singles(f):
+        def run(items, state):
+            for x in items:
+                f(x)
+        return run
+
+    def entityQuality(items, calc):
+        for s, t in items:
+            calc.quality(s, t)
+
+    res = [
+        Microbenchmark(reference_name, list(range(2**16)),
+                       singles(lambda x: x * x % 7)),
+        Microbenchmark('dist', inputs['values'], pairs(dist), clearCaches),
+        Microbenchmark('compareStrings', inputs['values'], pairs(compareStrings),
+                       clearCaches),
+        Microbenchmark('normalize', inputs['strings'], singles(normalize), clearCaches),
+        Microbenchmark('safeNormalize', inputs['strings'], singles(safeNormalize),
+                       clearCaches),
+        Microbenchmark('TokenSet.priority', inputs['token_sets'],
+                       pairs(TokenSetQualityCalculator().priority)),
+        Microbenchmark('TokenSet.quality', inputs['token_sets'],
+                       pairs(TokenSetQualityCalculator().quality)),
+        Microbenchmark('Entity.quality', inputs['entities'], entityQuality,
+                       lambda: clearCaches() or EntityQualityCalculator()),
+        Microbenchmark('Attribute.matches', inputs['attributes'],
+                       pairs(lambda x, y: x.matches(y)), clearCaches),
+        Microbenchmark('Fact.canMatch', inputs['facts'],
+                       pairs(lambda x, y: x.canMatch(y)), clearCaches),
+        Microbenchmark('Cluster.quality', inputs['clusters'],
+                       singles(lambda x: x.calculateQuality()), clearCaches)
+    ]
+    return res
+
+#########################################################################################
+
+def buildLoaderBenchmarks(inputs):
+    """Returns the list of the benchmarks of the standard layer loaders"""
+    res = []
+    for layer in Standard.layers:
+        setup, run = runLoaders(layer)
+        # the allocations of the previous layers are not separated, so the whole
+        # document load is traced
+        res.append(LoaderBenchmark('load' + layer, inputs, run, setup))
+    return res
+
+def measureAll(benchmarks, repeat):
+    """Measure the benchmarks in repeat rounds, every round measures each of them once.
+    A slowdown of the machine that lasts for a while then spoils a single measurement of
+    several benchmarks rather than all the measurements of one. Returns a dictionary
+    {benchmark name : result}"""
+    for benchmark in benchmarks:
+        benchmark.calibrate()
+    for i in range(repeat):
+        for benchmark in benchmarks:
+            benchmark.measureTime()
+    return dict((x.name, x.measure()) for x in benchmarks)
+
+def compare(results, baseline, tolerance):
+    """Compare the results with the baseline ones. Returns a dictionary {benchmark name :
+    (speed ratio, memory ratio, True if it is a regression)}. The benchmarks run on
+    different inputs (e.g. another number of documents) are never regressions. The
+    speed ratios are divided by that of the reference benchmark"""
+    scale = 1.0
+    if reference_name in results and reference_name in baseline:
+        scale = (results[reference_name]['ops_per_s'] /
+                 baseline[reference_name]['ops_per_s'])
+
+    res = {}
+    for name, r in results.items():
+        if not name in baseline:
+            continue
+        b = baseline[name]
+        speed = r['ops_per_s'] / b['ops_per_s'] / scale if b['ops_per_s'] > 0 else 1.0
+        memory = r['peak_kb'] / b['peak_kb'] if b['peak_kb'] > 0 else 1.0
+        is_regression = (r['ops'] == b['ops'] and
+                         (speed < 1.0 - tolerance or memory > 1.0 + tolerance))
+        res[name] = (speed, memory, is_regression)
+    return res
+
+def buildTable(results, comparison=None):
+    """Build the results table, with the comparison columns if provided"""
+    res = '    {:20} {:>9} {:>12} {:>10} {:>12}'.format(
+        'Benchmark', 'Ops', 'Ops/s', 'Peak, KB', 'Retained, KB')
+    if comparison != None:
+        res += ' {:>7} {:>7}'.format('Speed', 'Memory')
+    for name, r in results.items():
+        res += '\n    {:20} {:9d} {:12.0f} {:10.1f} {:12.1f}'.format(
+            name, r['ops'], r['ops_per_s'], r['peak_kb'], r['retained_kb'])
+        if comparison != None and name in comparison:
+            speed, memory, is_regression = comparison[name]
+            res += ' {:7.2f} {:7.2f}'.format(speed, memory)
+            if is_regression:
+                res += '  REGRESSION'
+    return res
+
+def usage():
+    print('Usage:')
+    print('<Python3 executable> -m benchmarks.primitives [std_dir] [-r <repeat>] [-n <documents>]')
+    print('                         [-o <results.json>] [-b <baseline.json>] [-t <tolerance>]')
+
+def main():
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], 'r:n:o:b:t:h')
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+        sys.exit(2)
+
+    repeat = 5
+    n_documents = 20
+    output_path = ''
+    baseline_path = ''
+    tolerance = 0.25
+    for o, a in opts:
+        if o == '-h':
+            usage()
+            sys.exit()
+        elif o == '-r':
+            repeat = int(a)
+        elif o == '-n':
+            n_documents = int(a) if int(a) > 0 else None
+        elif o == '-o':
+            output_path = a
+        elif o == '-b':
+            baseline_path = a
+        elif o == '-t':
+            tolerance = float(a)
+        else:
+            assert False, 'unhandled option'
+
+    if len(args) > 1:
+        usage()
+        sys.exit(2)
+    path = args[0] if len(args) > 0 else os.path.join(
+        os.path.dirname(os.path.realpath(__file__)), '..', '..', 'devset')
+    path = os.path.normpath(path)
+
+    inputs = loadInputs(path, n_documents)
+    print('{} ({} documents, best of {})'.format(path, len(inputs['layers']), repeat))
+
+    benchmarks = buildBenchmarks(inputs) + buildLoaderBenchmarks(inputs['layers'])
+    results = measureAll(benchmarks, repeat)
+
+    comparison = None
+    if len(baseline_path) > 0:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        comparison = compare(results, baseline, tolerance)
+        # a slowdown must persist in more measurements to be reported, so that a
+        # passing slowdown of the machine is not taken for a regression
+        suspects = [x for x in benchmarks if x.name in comparison and
+                    comparison[x.name][2]]
+        if len(suspects) > 0:
+            suspects += [x for x in benchmarks if x.name == reference_name]
+            results.update(measureAll(suspects, repeat))
+            comparison = compare(results, baseline, tolerance)
+    print(buildTable(results, comparison))
+
+    if len(output_path) > 0:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'revision' : revision(),
+                'python' : platform.python_version(),
+                'path' : path,
+                'repeat' : repeat,
+                'results' : results
+            }, f, indent=2)
+            f.write('\n')
+
+    if comparison != None:
+        regressions = [x for x, values in comparison.items() if values[2]]
+        if len(regressions) > 0:
+            print('Regressions (tolerance {}): {}'.format(
+                tolerance, ', '.join(regressions)))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+# Measures how the evaluation time and memory grow with the size of the corpus
+# Requires python 3
+
+# Usage (from the scripts folder):
+#
+#   <Python3 executable> -m benchmarks.scaling [-o <results.json>] [--sizes <n,n,...>]
+#                            [--tokens <n>] [--mentions <n>] [--entities <n>]
+#                            [--facts <n>] [--seed <n>] [--no-memory]
+#       -o [results.json] - file the results are saved to (default: print only)
+#       --sizes [n,n,...] - numbers of the documents in the corpora (default: 10,20,40,80)
+#       --tokens [n]      - tokens in a document (default: 500)
+#       --mentions [n]    - mentions in a document (default: 40)
+#       --entities [n]    - entities in a document (default: 25)
+#       --facts [n]       - facts in a document (default: 5)
+#       --seed [n]        - random seed of the corpus generator (default: 1)
+#       --no-memory       - do not measure the peak memory (saves a second run)
+#
+# Synthetic corpora of the given sizes are generated by benchmarks.synthetic and
+# evaluated in every track. The results file holds the revision of the scripts and the
+# throughput of every run, so that the files of two revisions can be compared.
+# Only the public evaluation interface is used, so the numbers for another revision can be
+# obtained by running this file with the scripts folder of that revision in PYTHONPATH
+
+#########################################################################################
+
+import os
+import sys
+import gc
+import json
+import time
+import getopt
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+
+import dialent
+
+from dialent.task1.eval import Evaluator as Evaluator1
+from dialent.task2.eval import Evaluator as Evaluator2
+from dialent.task3.eval import Evaluator as Evaluator3
+
+from benchmarks.synthetic import SyntheticCorpus
+
+#########################################################################################
+
+# evaluator factories of each track
+tracks = [
+    ('t1', lambda: Evaluator1(True)),
+    ('t2', lambda: Evaluator2('regular')),
+    ('t3', lambda: Evaluator3(False))
+]
+
+def revision():
+    """Returns the git revision of the evaluated scripts, or None if it is unknown"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(dialent.__file__),
+            stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(create, std_path, test_path, is_memory):
+    """Evaluate the corpus with a new evaluator. Returns a tuple (elapsed time, peak
+    memory in bytes or None)"""
+    gc.collect()
+    if is_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    create().evaluate(std_path, test_path, '', is_silent=True)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if is_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+def measure(params, sizes, is_memory, tmp_path):
+    """Generate a corpus of every size and evaluate it in all the tracks. Returns a list
+    of the result dictionaries"""
+    results = []
+    print('    {:6} {:>9} {:>9} {:>9} {:>12} {:>12} {:>10}'.format(
+        'Track', 'Documents', 'Mentions', 'Time, s', 'Documents/s', 'Mentions/s',
+        'Peak, MB'))
+    for size in sizes:
+        corpus = SyntheticCorpus(n_documents=size, **params)
+        std_path = os.path.join(tmp_path, str(size), 'std')
+        test_path = os.path.join(tmp_path, str(size), 'test')
+        documents = corpus.write(std_path, test_path)
+        n_mentions = sum(x.n_mentions for x in documents)
+
+        for track, create in tracks:
+            # the memory is traced in a separate run, as tracemalloc slows it down
+            elapsed = run(create, std_path, test_path, False)[0]
+            peak = run(create, std_path, test_path, True)[1] if is_memory else None
+            results.append({
+                'track' : track,
+                'documents' : size,
+                'mentions' : n_mentions,
+                'entities' : sum(x.n_entities for x in documents),
+                'facts' : sum(x.n_facts for x in documents),
+                'time' : elapsed,
+                'documents_per_s' : size / elapsed,
+                'mentions_per_s' : n_mentions / elapsed,
+                'peak_memory_mb' : peak / 2**20 if peak != None else None
+            })
+            print('    {:6} {:9d} {:9d} {:9.3f} {:12.1f} {:12.1f} {:>10}'.format(
+                track, size, n_mentions, elapsed, size / elapsed, n_mentions / elapsed,
+                '{:.1f}'.format(peak / 2**20) if peak != None else '-'), flush=True)
+
+    return results
+
+def usage():
+    print('Usage:')
+    print('<Python3 executable> -m benchmarks.scaling [-o <results.json>] [--sizes <n,n,...>]')
+    print('                         [--tokens <n>] [--mentions <n>] [--entities <n>]')
+    print('                         [--facts <n>] [--seed <n>] [--no-memory]')
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'o:h',
+            ['sizes=', 'tokens=', 'mentions=', 'entities=', 'facts=', 'seed=',
+             'no-memory'])
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+        sys.exit(2)
+
+    output_path = ''
+    sizes = [10, 20, 40, 80]
+    params = {}
+    is_memory = True
+    names = { '--tokens' : 'n_tokens', '--mentions' : 'n_mentions',
+              '--entities' : 'n_entities', '--facts' : 'n_facts', '--seed' : 'seed' }
+    for o, a in opts:
+        if o == '-h':
+            usage()
+            sys.exit()
+        elif o == '-o':
+            output_path = a
+        elif o == '--sizes':
+            sizes = [int(x) for x in a.split(',')]
+        elif o == '--no-memory':
+            is_memory = False
+        else:
+            params[names[o]] = int(a)
+
+    parameters = SyntheticCorpus(**params).parameters()
+    del parameters['documents']
+    print('Corpus: ' + ', '.join('{} {}'.format(k, v) for k, v in parameters.items()))
+    with tempfile.TemporaryDirectory() as tmp_path:
+        results = measure(params, sizes, is_memory, tmp_path)
+
+    if len(output_path) > 0:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'revision' : revision(),
+                'python' : platform.python_version(),
+                'parameters' : parameters,
+                'sizes' : sizes,
+                'results' : results
+            }, f, indent=2)
+            f.write('\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,503 @@
+# Generates a synthetic standard corpus in the devset format along with a response to it
+# Requires python 3
+
+# Usage (from the scripts folder):
+#
+#   <Python3 executable> -m benchmarks.synthetic <std_dir> <test_dir> [-n <documents>]
+#                            [-t <tokens>] [-m <mentions>] [-e <entities>] [-f <facts>]
+#                            [-r <error_rate>] [-s <seed>]
+#       [std_dir]       - folder the standard files are written to
+#                         (.txt, .tokens, .spans, .objects, .coref, .facts)
+#       [test_dir]      - folder the response files are written to
+#                         (.task1, .task2, .task3)
+#       -n [documents]  - number of the documents (default: 10)
+#       -t [tokens]     - number of the tokens in a document (default: 500)
+#       -m [mentions]   - number of the mentions in a document (default: 40)
+#       -e [entities]   - number of the entities in a document (default: 25)
+#       -f [facts]      - number of the facts in a document (default: 5)
+#       -r [error_rate] - share of the response objects with an error (default: 0.1)
+#       -s [seed]       - random seed (default: 1)
+#
+# The corpus only depends on the parameters, the generator does not use the evaluation
+# code, so the same corpus can be used to measure any revision of the scripts
+
+#########################################################################################
+
+import os
+import sys
+import random
+import getopt
+
+#########################################################################################
+
+class SyntheticDocument:
+    """Standard markup of a generated document and the response to it"""
+
+    def __init__(self, name):
+        self.name = name
+        # {extension : file contents} of the standard (.txt, .tokens, ...) and of the
+        # response (.task1, .task2, .task3)
+        self.files = {}
+        self.n_mentions = 0
+        self.n_entities = 0
+        self.n_facts = 0
+
+class SyntheticCorpus:
+    """Generator of synthetic standard documents with controllable sizes. A document is a
+    sequence of random words with the mentions placed at random positions. Mentions are
+    grouped into entities, and the entities take part in facts. The response has the
+    same objects, with the given share of them dropped or distorted"""
+
+    consonants = 'бвгдзклмнпрстфхч'
+    vowels = 'аеиоуя'
+    jobs = ['директор', 'министр', 'глава', 'президент', 'мэр', 'председатель']
+    # mention types, their share and the number of their tokens
+    mention_types = [('Person', 'per', 0.4, 2), ('Org', 'org', 0.25, 3),
+                     ('Location', 'loc', 0.2, 2), ('LocOrg', 'locorg', 0.15, 1)]
+
+    def __init__(self, n_documents=10, n_tokens=500, n_mentions=40, n_entities=25,
+                 n_facts=5, error_rate=0.1, seed=1):
+        """Set up the generator. Every document has n_tokens tokens, n_mentions mentions
+        of n_entities entities (n_entities <= n_mentions) and up to n_facts facts"""
+        if n_entities > n_mentions:
+            raise Exception('There can not be more entities than mentions: {} > {}'
+                .format(n_entities, n_mentions))
+        self.n_documents = n_documents
+        self.n_tokens = n_tokens
+        self.n_mentions = n_mentions
+        self.n_entities = n_entities
+        self.n_facts = n_facts
+        self.error_rate = error_rate
+        self.seed = seed
+
+    def parameters(self):
+        """Returns a dictionary of the generator parameters"""
+        return {
+            'documents' : self.n_documents,
+            'tokens' : self.n_tokens,
+            'mentions' : self.n_mentions,
+            'entities' : self.n_entities,
+            'facts' : self.n_facts,
+            'error_rate' : self.error_rate,
+            'seed' : self.seed
+        }
+
+    def write(self, std_path, test_path):
+        """Generate all the documents and write the standard to std_path and the response
+        to test_path. Returns a list of the generated SyntheticDocument objects without
+        the file contents"""
+        os.makedirs(std_path, exist_ok=True)
+        os.makedirs(test_path, exist_ok=True)
+        res = []
+        for i in range(self.n_documents):
+            doc = self.generateDocument(i)
+            for ext, text in doc.files.items():
+                path = test_path if ext.startswith('.task') else std_path
+                with open(os.path.join(path, doc.name + ext), 'w',
+                          encoding='utf-8') as f:
+                    f.write(text)
+            doc.files = {}
+            res.append(doc)
+        return res
+
+    def generateDocument(self, index):
+        """Generate the document with the given index (from 0)"""
+        rng = random.Random('{}:{}'.format(self.seed, index))
+        # the errors are drawn separately, so the standard does not depend on the rate
+        err = random.Random('{}:{}:errors'.format(self.seed, index))
+        doc = SyntheticDocument('book_{}'.format(index + 1))
+        id_base = (index + 1) * 100000
+
+        # entities, the first mentions of each entity define its type and words
+        entities = []
+        for i in range(self.n_entities):
+            r = rng.random()
+            for std_type, tag, share, max_length in SyntheticCorpus.mention_types:
+                if r < share:
+                    break
+                r -= share
+            length = 2 if tag == 'per' else rng.randint(1, max_length)
+            words = [self._word(rng).capitalize() for k in range(length)]
+            entities.append( { 'id' : str(id_base + i), 'type' : std_type, 'tag' : tag,
+                               'words' : words, 'mentions' : [] } )
+
+        mentions = []
+        for i in range(self.n_mentions):
+            entity = entities[i] if i < len(entities) else rng.choice(entities)
+            mention = { 'id' : str(id_base + 20000 + i), 'entity' : entity }
+            entity['mentions'].append(mention)
+            mentions.append(mention)
+
+        facts = self._makeFacts(rng, entities)
+        doc.n_mentions = len(mentions)
+        doc.n_entities = len(entities)
+        doc.n_facts = len(facts)
+
+        # place the mentions and the job words of the facts among the filler words
+        items = ([(m['entity']['words'], m) for m in mentions] +
+                 [([f['job']], f) for f in facts if 'job' in f])
+        n_item_tokens = sum(len(words) for words, item in items)
+        if n_item_tokens > self.n_tokens:
+            raise Exception('{} tokens are too few for {} mentions and {} facts'.format(
+                self.n_tokens, len(mentions), len(facts)))
+        n_fillers = self.n_tokens - n_item_tokens
+        order = set(rng.sample(range(n_fillers + len(items)), len(items)))
+        rng.shuffle(items)
+
+        tokens = []
+        position = 0
+        next_item = 0
+        for i in range(n_fillers + len(items)):
+            if not i in order:
+                word = '.' if rng.random() < 0.07 else self._word(rng)
+                tokens.append(self._token(id_base, tokens, position, word))
+                position += len(word) + 1
+                continue
+            words, item = items[next_item]
+            next_item += 1
+            item['tokens'] = []
+            for word in words:
+                token = self._token(id_base, tokens, position, word)
+                tokens.append(token)
+                item['tokens'].append(token)
+                position += len(word) + 1
+
+        doc.files['.txt'] = ' '.join(t['text'] for t in tokens)
+        doc.files['.tokens'] = ''.join('{} {} {} {}\n'.format(
+            t['id'], t['start'], len(t['text']), t['text']) for t in tokens)
+        doc.files.update(self._makeStandard(id_base, mentions, entities, facts, index))
+        doc.files.update(self._makeResponse(err, mentions, entities, facts))
+
+        return doc
+
+    def _makeFacts(self, rng, entities):
+        """Build the facts of the document out of the entities"""
+        by_tag = {}
+        for entity in entities:
+            tag = 'loc' if entity['tag'] == 'locorg' else entity['tag']
+            by_tag.setdefault(tag, []).append(entity)
+        persons = by_tag.get('per', [])
+        orgs = by_tag.get('org', [])
+
+        facts = []
+        for i in range(self.n_facts):
+            kinds = []
+            if len(persons) > 0 and len(orgs) > 0:
+                kinds.extend(['Occupation'] * 3)
+            if len(persons) > 1:
+                kinds.append('Meeting')
+            if len(orgs) > 1:
+                kinds.append('Ownership')
+            if len(persons) + len(orgs) > 1:
+                kinds.append('Deal')
+            if len(kinds) == 0:
+                break
+
+            kind = rng.choice(kinds)
+            if kind == 'Occupation':
+                args = [('Who', rng.choice(persons)), ('Where', rng.choice(orgs))]
+                facts.append( { 'type' : kind, 'args' : args,
+                                'job' : rng.choice(SyntheticCorpus.jobs) } )
+            elif kind == 'Meeting':
+                args = [('Participant', x) for x in rng.sample(persons, 2)]
+                facts.append( { 'type' : kind, 'args' : args } )
+            elif kind == 'Ownership':
+                owner, item = rng.sample(orgs, 2)
+                facts.append( { 'type' : kind,
+                                'args' : [('Owner', owner), ('Property', item)] } )
+            else:
+                args = [('Participant', x) for x in rng.sample(persons + orgs, 2)]
+                facts.append( { 'type' : kind, 'args' : args } )
+
+        return facts
+
+    def _makeStandard(self, id_base, mentions, entities, facts, index):
+        """Returns the contents of the .spans, .objects, .coref and .facts files"""
+        span_lines = []
+        object_lines = []
+        next_span = [id_base + 40000]
+
+        def addSpan(tag, tokens):
+            span_id = str(next_span[0])
+            next_span[0] += 1
+            span_lines.append('{} {} {} {} {} {}  # {} {}\n'.format(
+                span_id, tag, tokens[0]['start'],
+                tokens[-1]['start'] + len(tokens[-1]['text']) - tokens[0]['start'],
+                tokens[0]['id'], len(tokens), ' '.join(t['id'] for t in tokens),
+                ' '.join(t['text'] for t in tokens)))
+            return span_id
+
+        for m in mentions:
+            tokens = m['tokens']
+            tag = m['entity']['tag']
+            if tag == 'per':
+                spans = [addSpan('name', tokens[:1]), addSpan('surname', tokens[1:])]
+            elif tag == 'org':
+                spans = [addSpan('org_name', tokens)]
+            else:
+                spans = [addSpan('loc_name', tokens)]
+            object_lines.append('{} {} {} # {}\n'.format(
+                m['id'], m['entity']['type'], ' '.join(spans),
+                ' '.join(t['text'] for t in tokens)))
+
+        coref = ''
+        for e in entities:
+            coref += '{} {}\n'.format(e['id'], ' '.join(m['id'] for m in e['mentions']))
+            if e['tag'] == 'per':
+                coref += 'firstname {}\nlastname {}\n\n'.format(*e['words'])
+            else:
+                coref += 'name {}\n\n'.format(' '.join(e['words']))
+
+        facts_text = ''
+        for i, f in enumerate(facts):
+            facts_text += '{}-{} {}\n'.format(index + 1, i, f['type'])
+            for name, entity in f['args']:
+                facts_text += '{} obj{} {}\n'.format(
+                    name, entity['id'], self._entityName(entity))
+            if 'job' in f:
+                facts_text += 'Position span{} {}\n'.format(
+                    addSpan('job', f['tokens']), f['job'])
+            facts_text += '\n'
+
+        return { '.spans' : ''.join(span_lines), '.objects' : ''.join(object_lines),
+                 '.coref' : coref, '.facts' : facts_text }
+
+    def _makeResponse(self, err, mentions, entities, facts):
+        """Returns the contents of the .task1, .task2 and .task3 response files with the
+        errors drawn from err"""
+        task1 = ''
+        for m in mentions:
+            if err.random() < self.error_rate / 2:
+                # missed mention
+                continue
+            tokens = m['tokens']
+            start = tokens[0]['start']
+            length = tokens[-1]['start'] + len(tokens[-1]['text']) - start
+            if err.random() < self.error_rate / 2:
+                # boundary error
+                start += 1
+                length -= 1
+            task1 += '{} {} {}\n'.format(m['entity']['tag'], start, length)
+
+        task2 = []
+        for e in entities:
+            if err.random() < self.error_rate / 2:
+                continue
+            tag = 'loc' if e['tag'] == 'locorg' else e['tag']
+            if tag == 'per':
+                attrs = [('firstname', e['words'][0]), ('lastname', e['words'][1])]
+            else:
+                attrs = [('name', ' '.join(e['words']))]
+            lines = [tag]
+            for name, value in attrs:
+                if err.random() < self.error_rate / 2:
+                    # a typo
+                    value += 'х'
+                lines.append('{} : {}'.format(name, value.lower()))
+            task2.append('\n'.join(lines))
+
+        task3 = []
+        for f in facts:
+            if err.random() < self.error_rate / 2:
+                continue
+            lines = [f['type'].lower()]
+            args = [(name.lower(), self._entityName(e).lower()) for name, e in f['args']]
+            if 'job' in f:
+                args.append( ('position', f['job']) )
+            for arg in args:
+                if err.random() < self.error_rate / 2:
+                    # a missed argument
+                    continue
+                lines.append('{} : {}'.format(*arg))
+            task3.append('\n'.join(lines))
+
+        return { '.task1' : task1, '.task2' : '\n\n'.join(task2) + '\n',
+                 '.task3' : '\n\n'.join(task3) + '\n' }
+
+    def _entityName(self, entity):
+        """Returns the name of the entity as used in the facts"""
+        if entity['tag'] == 'per':
+            return '{} {}'.format(entity['words'][1], entity['words'][0])
+        return ' '.join(entity['words'])
+
+    def _token(self, id_base, tokens, position, word):
+        """Create a token"""
+        return { 'id' : str(id_base + 50000 + len(tokens)), 'start' : position,
+                 'text' : word }
+
+    def _word(self, rng):
+        """Generate a random word"""
+        return ''.join(rng.choice(SyntheticCorpus.consonants) +
+                       rng.choice(SyntheticCorpus.vowels)
+                       for i in range(rng.randint(1, 4)))
+
+class DenseCorpus(SyntheticCorpus):
+    """Generator of valid documents that are hard to match. Every document consists of
+    groups of adjacent organization mentions and of meetings of two persons each. The
+    response objects of a group overlap several standard objects at once, the higher the
+    density, the more of them:
+
+        task 1 - a mention covers parts of density + 1 standard mentions
+        task 2 - an organization has the names of density + 1 standard organizations
+        task 3 - a meeting has the participants of a standard meeting and the first
+                 participants of the next density meetings, so it is compatible with
+                 density + 1 standard meetings
+
+    Density 0 gives a response equal to the standard"""
+
+    def __init__(self, n_documents=3, n_groups=1, group_size=6, density=1, seed=1):
+        """Set up the generator. Every document has n_groups groups of group_size
+        organizations and meetings"""
+        self.n_documents = n_documents
+        self.n_groups = n_groups
+        self.group_size = group_size
+        self.density = density
+        self.seed = seed
+
+    def parameters(self):
+        """Returns a dictionary of the generator parameters"""
+        return {
+            'documents' : self.n_documents,
+            'groups' : self.n_groups,
+            'group_size' : self.group_size,
+            'density' : self.density,
+            'seed' : self.seed
+        }
+
+    def generateDocument(self, index):
+        """Generate the document with the given index (from 0)"""
+        rng = random.Random('{}:{}:dense'.format(self.seed, index))
+        doc = SyntheticDocument('book_{}'.format(index + 1))
+        id_base = (index + 1) * 100000
+
+        entities = []
+        mentions = []
+        facts = []
+        tokens = []
+        position = 0
+        groups = []
+
+        def addEntity(std_type, tag, words):
+            nonlocal position
+            entity = { 'id' : str(id_base + len(entities)), 'type' : std_type,
+                       'tag' : tag, 'words' : words, 'mentions' : [] }
+            mention = { 'id' : str(id_base + 20000 + len(mentions)), 'entity' : entity,
+                        'tokens' : [] }
+            for word in words:
+                mention['tokens'].append(self._token(id_base, tokens, position, word))
+                tokens.append(mention['tokens'][-1])
+                position += len(word) + 1
+            entity['mentions'].append(mention)
+            entities.append(entity)
+            mentions.append(mention)
+            return entity
+
+        def addFillers(count):
+            nonlocal position
+            for i in range(count):
+                tokens.append(self._token(id_base, tokens, position, self._word(rng)))
+                position += len(tokens[-1]['text']) + 1
+
+        for k in range(self.n_groups):
+            addFillers(5)
+            # adjacent organizations of two words each
+            orgs = [addEntity('Org', 'org', [self._word(rng).capitalize()
+                                             for i in range(2)])
+                    for j in range(self.group_size)]
+            persons = []
+            for j in range(2 * self.group_size):
+                addFillers(2)
+                persons.append(addEntity('Person', 'per',
+                    [self._word(rng).capitalize() for i in range(2)]))
+            for j in range(self.group_size):
+                facts.append( { 'type' : 'Meeting', 'args' : [
+                    ('Participant', persons[2 * j]),
+                    ('Participant', persons[2 * j + 1])] } )
+            groups.append( (orgs, persons) )
+        addFillers(5)
+
+        doc.n_mentions = len(mentions)
+        doc.n_entities = len(entities)
+        doc.n_facts = len(facts)
+        doc.files['.txt'] = ' '.join(t['text'] for t in tokens)
+        doc.files['.tokens'] = ''.join('{} {} {} {}\n'.format(
+            t['id'], t['start'], len(t['text']), t['text']) for t in tokens)
+        doc.files.update(self._makeStandard(id_base, mentions, entities, facts, index))
+        doc.files.update(self._makeDenseResponse(groups))
+
+        return doc
+
+    def _makeDenseResponse(self, groups):
+        """Returns the contents of the .task1, .task2 and .task3 response files of the
+        given (organizations, persons) groups"""
+        d = self.density
+        task1 = ''
+        task2 = []
+        task3 = []
+        for orgs, persons in groups:
+            org_tokens = sum((x['mentions'][0]['tokens'] for x in orgs), [])
+            for i, org in enumerate(orgs):
+                # starts in the middle of the i-th organization and spans d others
+                first = 2 * i + (1 if d > 0 else 0)
+                last = min(first + max(2 * d, 2), len(org_tokens)) - 1
+                start = org_tokens[first]['start']
+                end = org_tokens[last]['start'] + len(org_tokens[last]['text'])
+                task1 += 'org {} {}\n'.format(start, end - start)
+
+                names = [' '.join(x['words']).lower() for x in orgs[i:i + d + 1]]
+                task2.append('\n'.join(['org'] + ['name : ' + x for x in names]))
+
+            for person in persons:
+                tokens = person['mentions'][0]['tokens']
+                task1 += 'per {} {}\n'.format(tokens[0]['start'],
+                    tokens[-1]['start'] + len(tokens[-1]['text']) - tokens[0]['start'])
+                task2.append('per\nfirstname : {}\nlastname : {}'.format(
+                    *[x.lower() for x in person['words']]))
+
+            for i in range(len(orgs)):
+                participants = persons[2 * i:2 * i + 2] + persons[2 * i + 2::2][:d]
+                task3.append('\n'.join(['meeting'] + ['participant : ' +
+                    self._entityName(x).lower() for x in participants]))
+
+        return { '.task1' : task1, '.task2' : '\n\n'.join(task2) + '\n',
+                 '.task3' : '\n\n'.join(task3) + '\n' }
+
+#########################################################################################
+
+def usage():
+    print('Usage:')
+    print('<Python3 executable> -m benchmarks.synthetic <std_dir> <test_dir> [-n <documents>]')
+    print('                         [-t <tokens>] [-m <mentions>] [-e <entities>] [-f <facts>]')
+    print('                         [-r <error_rate>] [-s <seed>]')
+
+def main():
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], 'n:t:m:e:f:r:s:h')
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+        sys.exit(2)
+
+    params = {}
+    names = { '-n' : 'n_documents', '-t' : 'n_tokens', '-m' : 'n_mentions',
+              '-e' : 'n_entities', '-f' : 'n_facts', '-s' : 'seed' }
+    for o, a in opts:
+        if o == '-h':
+            usage()
+            sys.exit()
+        elif o == '-r':
+            params['error_rate'] = float(a)
+        else:
+            params[names[o]] = int(a)
+
+    if len(args) != 2:
+        usage()
+        sys.exit(2)
+
+    docs = SyntheticCorpus(**params).write(args[0], args[1])
+    print('{} documents, {} mentions, {} entities, {} facts'.format(
+        len(docs), sum(x.n_mentions for x in docs), sum(x.n_entities for x in docs),
+        sum(x.n_facts for x in docs)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# This module implements the on-disk cache of the per-document evaluation results.
+#
+# A result is stored under a key made of the hash of the standard document layers, the
+# hash of the submission document, the evaluation mode and Config.EVALUATOR_VERSION, so
+# a document is only evaluated again when any of those changes. Identical submission
+# documents share the cache entries regardless of the submission they come from.
+#
+# Cache layout: <cache_dir>/<first 2 key symbols>/<key>.json, where each file holds
+# the metrics by tag and the report text
+
+import os
+import json
+import hashlib
+import tempfile
+
+from dialent.config import Config
+from dialent.common.metrics import Metrics
+
+#########################################################################################
+
+class ResultCache:
+    """On-disk cache of the per-document evaluation results"""
+
+    def __init__(self, path):
+        """Open the cache in the given directory, it is created if necessary"""
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+
+    def makeKey(self, mode, std, test):
+        """Returns the cache key of the evaluation of the test markup against the standard
+        markup in the given mode. Returns None if the key can not be built (e.g. the
+        test file could not be read)"""
+        if std.digest == None or test.digest == None:
+            return None
+
+        parts = [Config.EVALUATOR_VERSION, mode, std.digest, test.digest]
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+    def load(self, key):
+        """Returns the (metrics dictionary, report) tuple stored under the given key or
+        None if there is no such entry"""
+        try:
+            with open(self._filename(key), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        metrics = dict((tag, Metrics.create(*values))
+                       for tag, values in data['metrics'].items())
+        return metrics, data['report']
+
+    def save(self, key, metrics, report):
+        """Store the metrics dictionary and the report under the given key"""
+        data = {
+            'metrics' : dict((tag, [m.tp_std, m.tp_test, m.n_std, m.n_test])
+                             for tag, m in metrics.items()),
+            'report' : report
+        }
+
+        filename = self._filename(key)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        # write to a temporary file first, so that concurrent evaluations never see
+        # a partially written entry
+        fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_name, filename)
+
+    def _filename(self, key):
+        return os.path.join(self.path, key[:2], key + '.json')
@@ -1,7 +1,10 @@
 ﻿
+import time
+
 import numpy as np
 
 from dialent.common.metrics import Metrics
+from dialent.common.stats import SearchStats
 
 #########################################################################################
 
@@ -40,6 +43,7 @@ class EvaluationMatrix:
         assert(mode == 'regular' or mode == 'simple')
         self.mode = mode
         self.metrics = {}
+        self.stats = SearchStats()
 
         self.s = {}
         self.t = {}
@@ -73,11 +77,13 @@ class EvaluationMatrix:
     def findSolution(self):
         """Runs the recursive search to find an optimal matching"""
         
+        start = time.perf_counter()
         q, pairs = self._recursiveSearch(
             [i for i in range(self.n_std)],
             [j for j in range(self.n_test)],
             []
             )
+        self.stats.time += time.perf_counter() - start
 
         self.metrics['overall'] = self._evaluate(pairs)
         for tag in EvaluationMatrix.allowed_tags:
@@ -90,51 +96,15 @@ class EvaluationMatrix:
 
     def logMatching(self, pairs):
         """Saves matching data"""
-        self.matching = {}
-        self.matched_std = []
-        self.matched_test = []
-        for i, j in pairs:
-            s = self.std[i]
-            t = self.test[j]
-            self.matching[s] = t
-            self.matching[t] = s
-            self.matched_std.append(s)
-            self.matched_test.append(t)
-        self.unmatched_std = [s for s in self.std if not s in self.matched_std]
-        self.unmatched_test = [t for t in self.test if not t in self.matched_test]
+        self.record = MatchingRecord(self.std, self.test, pairs, self.calc)
 
     def describeMatchingStd(self):
         """Builds a detailed matching description for standard objects"""
-        return self._doDescribeMatching(self.matched_std, self.unmatched_std, False)
+        return ''.join(self.record.describeStd())
 
     def describeMatchingTest(self):
         """Builds a detailed matching description for test objects"""
-        return self._doDescribeMatching(self.matched_test, self.unmatched_test, True)
-
-    def _doDescribeMatching(self, matched, unmatched, is_swapped):
-        """Builds a detailed matching description with the given lookup tables"""
-        res = ''
-        for x in matched:
-            y = self.matching[x]
-            pair = (y, x) if is_swapped else (x, y)
-            is_ignored = self.calc.isIgnored(pair[0], pair[1], self.matching)
-            q = self.calc.quality(*pair)
-            res += '{}\t{}\t=\t{}\n'.format('{:7.2f}'.format(q)
-                                            if not is_ignored
-                                            else 'IGNORED',
-                    x.toInlineString(), y.toInlineString())
-
-        res += '\n'
-        for x in unmatched:
-            is_ignored = (self.calc.isTestIgnored(x, self.matching)
-                          if is_swapped
-                          else self.calc.isStandardIgnored(x, self.matching))
-            res += '{} {}\n'.format('{:7.2f}'.format(0.0)
-                                    if not is_ignored
-                                    else 'IGNORED',
-                    x.toInlineString())
-
-        return res
+        return ''.join(self.record.describeTest())
 
     def _recursiveSearch(self, std, test, pairs):
         """
@@ -148,9 +118,12 @@ class EvaluationMatrix:
         """
         if len(std) == 0 or len(test) == 0:
             # final step, evaluate the matching
+            self.stats.leaves += 1
+            self.stats.max_depth = max(self.stats.max_depth, self.n_std - len(std))
             metrics = self._evaluate(pairs)
             return metrics.f1, pairs
 
+        self.stats.nodes += 1
         curr = std[0]
         max_res = None
 
@@ -175,6 +148,7 @@ class EvaluationMatrix:
                     pair_max_alternatives = alt_count
                 
             if skip_test_object:
+                self.stats.pruned += 1
                 continue
             else:
                 possible_pairs_count += 1
@@ -212,6 +186,7 @@ class EvaluationMatrix:
         perfect_matches = [t for t in test if self.m[s_index, t] == 1.0]
         matches = [t for t in test if self.m[s_index, t] > 0.0] 
         if len(perfect_matches) > 0:
+            self.stats.pruned += len(matches) - len(perfect_matches)
             return perfect_matches, True
         else:
             return matches, False
@@ -245,4 +220,69 @@ class EvaluationMatrix:
         for _s, _t in matching:
             if _s >= self.s[tag].start() and _s < self.s[tag].end():
                 res.append((_s, _t))
-        return res
\ No newline at end of file
+        return res
+
+
+#########################################################################################
+
+class MatchingRecord:
+    """Compact record of the matching found by EvaluationMatrix. The matching
+    descriptions of the reports are rendered out of it on demand"""
+
+    def __init__(self, std, test, pairs, calc):
+        """Save the matching. pairs is a list of (standard index, test index) pairs
+        within the std and test object lists, calc is the quality calculator of the
+        matrix"""
+        self.pairs = [(std[i], test[j]) for i, j in pairs]
+        matched_std = set(i for i, j in pairs)
+        matched_test = set(j for i, j in pairs)
+        self.unmatched_std = [s for i, s in enumerate(std) if not i in matched_std]
+        self.unmatched_test = [t for j, t in enumerate(test) if not j in matched_test]
+        self.calc = calc
+        # quality labels of the pairs, built with the first description
+        self.labels = None
+
+    def matching(self):
+        """Returns the matching as a dictionary {object : matched object}"""
+        res = {}
+        for s, t in self.pairs:
+            res[s] = t
+            res[t] = s
+        return res
+
+    def describeStd(self):
+        """Yields the lines of the detailed matching description for standard objects"""
+        matching = self.matching()
+        for (s, t), label in zip(self.pairs, self._pairLabels(matching)):
+            yield '{}\t{}\t=\t{}\n'.format(label, s.toInlineString(), t.toInlineString())
+
+        yield '\n'
+        for s in self.unmatched_std:
+            yield '{} {}\n'.format(
+                self._label(0.0, self.calc.isStandardIgnored(s, matching)),
+                s.toInlineString())
+
+    def describeTest(self):
+        """Yields the lines of the detailed matching description for test objects"""
+        matching = self.matching()
+        for (s, t), label in zip(self.pairs, self._pairLabels(matching)):
+            yield '{}\t{}\t=\t{}\n'.format(label, t.toInlineString(), s.toInlineString())
+
+        yield '\n'
+        for t in self.unmatched_test:
+            yield '{} {}\n'.format(
+                self._label(0.0, self.calc.isTestIgnored(t, matching)),
+                t.toInlineString())
+
+    def _pairLabels(self, matching):
+        """Returns the list of the quality labels of the pairs. The quality of a pair
+        is calculated once for both descriptions"""
+        if self.labels == None:
+            self.labels = []
+            for s, t in self.pairs:
+                is_ignored = self.calc.isIgnored(s, t, matching)
+                self.labels.append(self._label(self.calc.quality(s, t), is_ignored))
+        return self.labels
+
+    def _label(self, quality, is_ignored):
+        return '{:7.2f}'.format(quality) if not is_ignored else 'IGNORED'
@@ -1,4 +1,5 @@
 ﻿
+import numpy as np
 
 #########################################################################################
 
@@ -50,6 +51,27 @@ class Metrics:
         self.n_test += other.n_test
         self.recalculate()
 
+    def subtract(self, other):
+        """Remove the metrics previously added with add (e.g. the old results of a
+        document that was evaluated again)"""
+        self.tp_std -= other.tp_std
+        self.tp_test -= other.tp_test
+        self.n_std -= other.n_std
+        self.n_test -= other.n_test
+        self.recalculate()
+
+    def toDict(self):
+        """Returns a dictionary of all the values (e.g. for the JSON output)"""
+        return {
+            'precision' : self.precision,
+            'recall' : self.recall,
+            'f1' : self.f1,
+            'tp_std' : self.tp_std,
+            'tp_test' : self.tp_test,
+            'n_std' : self.n_std,
+            'n_test' : self.n_test
+        }
+
     def toLine(self):
         """Returns a line for the stats table"""
         return Metrics.line_template.format(
@@ -88,4 +110,99 @@ class Metrics:
 
         m.recalculate()
 
-        return m
\ No newline at end of file
+        return m
+
+#########################################################################################
+
+class MetricsTable:
+    """Columnar store of the per-document metrics: a (documents x tags x 4) array of the
+    tp_std, tp_test, n_std and n_test counters. The totals, the subset totals and the
+    macro-averages of any slice of the corpus are computed out of it with no
+    re-evaluation"""
+
+    # counters in the order of the last axis
+    columns = ['tp_std', 'tp_test', 'n_std', 'n_test']
+
+    def __init__(self, tags, capacity=64):
+        """Create an empty table with the given tags"""
+        self.tags = list(tags)
+        self.tag_index = dict((tag, i) for i, tag in enumerate(self.tags))
+        self.names = []
+        # {document name : row}
+        self.rows = {}
+        self.data = np.zeros((capacity, len(self.tags), 4))
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, metrics_dict):
+        """Add the {tag : Metrics} dictionary of the document with the given name. The
+        metrics of a document that was already added are replaced"""
+        row = self.rows.get(name)
+        if row == None:
+            row = len(self.names)
+            if row == self.data.shape[0]:
+                self.data = np.concatenate([self.data, np.zeros_like(self.data)])
+            self.rows[name] = row
+            self.names.append(name)
+
+        counters = self.data[row]
+        for tag, i in self.tag_index.items():
+            m = metrics_dict[tag]
+            counters[i] = (m.tp_std, m.tp_test, m.n_std, m.n_test)
+
+    def counters(self, names=None, tags=None):
+        """Returns the (documents x tags x 4) array of the counters of the given
+        documents and tags (all of them by default), in the order the documents were
+        added"""
+        res = self.data[:len(self.names)]
+        if names != None:
+            res = res[sorted(self.rows[x] for x in names)]
+        if tags != None:
+            res = res[:, [self.tag_index[x] for x in tags]]
+        return res
+
+    def total(self, names=None, tags=None):
+        """Returns the {tag : Metrics} dictionary of the totals of the given documents
+        and tags (all of them by default)"""
+        tags = tags if tags != None else self.tags
+        counters = self.counters(names, tags)
+        if counters.shape[0] == 0:
+            return dict((tag, Metrics()) for tag in tags)
+
+        # the documents are summed one after another, like Metrics.add does, so that
+        # even the floating point totals are the same
+        sums = np.cumsum(counters, axis=0)[-1]
+        return dict((tag, Metrics.create(float(x[0]), float(x[1]), int(x[2]), int(x[3])))
+                    for tag, x in zip(tags, sums))
+
+    def scores(self, names=None, tags=None):
+        """Returns the (documents x tags x 3) array of the precision, recall and F1 of
+        every given document and tag, calculated the same way as in Metrics"""
+        counters = self.counters(names, tags)
+        tp_std, tp_test, n_std, n_test = np.moveaxis(counters, -1, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.where(n_test > 0, tp_test / n_test, 1.0)
+            recall = np.where(n_std > 0, tp_std / n_std, 1.0)
+            denominator = precision + recall
+            f1 = np.where(denominator > 0, 2 * precision * recall / denominator, 0.0)
+        f1 = np.where(n_std + n_test == 0, 1.0, f1)
+        return np.stack([precision, recall, f1], axis=-1)
+
+    def macroAverage(self, names=None, tags=None):
+        """Returns the dictionary {tag : (precision, recall, F1)} of the averages of the
+        per-document scores of the given documents and tags"""
+        tags = tags if tags != None else self.tags
+        scores = self.scores(names, tags)
+        if scores.shape[0] == 0:
+            return dict((tag, (1.0, 1.0, 1.0)) for tag in tags)
+        return dict((tag, tuple(float(v) for v in x))
+                    for tag, x in zip(tags, scores.mean(axis=0)))
+
+    @classmethod
+    def fromDocuments(cls, documents, tags):
+        """Build a table out of the dictionary {document name : metrics dictionary}"""
+        res = cls(tags, max(len(documents), 1))
+        for name, metrics_dict in documents.items():
+            res.add(name, metrics_dict)
+        return res
@@ -0,0 +1,96 @@
+# This module implements the packed corpus format: all layers of all documents of a
+# markup directory stored in a single file along with an offset index.
+#
+# File layout:
+#   header - magic bytes, index offset and index size (see PackedCorpus.header)
+#   data   - raw contents of every layer file, concatenated
+#   index  - utf-8 JSON object: {document name : {extension : [offset, size]}}
+
+import os
+import json
+import mmap
+import struct
+
+#########################################################################################
+
+class PackedCorpus:
+    """Markup collection packed into a single memory-mapped file"""
+
+    magic = b'FRE2016P'
+    header = struct.Struct('<8sQQ')
+
+    def __init__(self, filename):
+        """Open the packed corpus file and load its index"""
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, offset, size = PackedCorpus.header.unpack_from(self._map, 0)
+        if magic != PackedCorpus.magic:
+            raise Exception('Not a packed corpus: {}'.format(filename))
+
+        self._index = json.loads(self._map[offset:offset + size].decode('utf-8'))
+
+    def names(self, ext=None):
+        """Returns a set of document names found in the collection. If ext is provided,
+        only the documents with this layer are returned"""
+        return set([name for name, layers in self._index.items()
+                    if ext == None or ext in layers])
+
+    def has(self, name, ext):
+        """Check if the collection has the given layer of the given document"""
+        return name in self._index and ext in self._index[name]
+
+    def read(self, name, ext):
+        """Returns raw contents of the given layer of the given document"""
+        if not self.has(name, ext):
+            raise FileNotFoundError(
+                'No such file in the packed corpus: {}'.format(self.location(name, ext)))
+
+        offset, size = self._index[name][ext]
+        return self._map[offset:offset + size]
+
+    def location(self, name, ext):
+        """Returns a human-readable location of the given layer used in messages"""
+        return '{}:{}'.format(self.filename, name + ext)
+
+    def close(self):
+        self._map.close()
+
+    @classmethod
+    def isPacked(cls, filename):
+        """Check if the given file is a packed corpus"""
+        with open(filename, 'rb') as f:
+            return f.read(len(cls.magic)) == cls.magic
+
+#########################################################################################
+
+def packDirectory(path, filename):
+    """Pack all document files from the given directory into a single file.
+    Returns the number of packed documents"""
+
+    index = {}
+    with open(filename, 'wb') as out:
+        out.write(PackedCorpus.header.pack(PackedCorpus.magic, 0, 0))
+
+        for file_name in sorted(os.listdir(path)):
+            full_name = os.path.join(path, file_name)
+            if not os.path.isfile(full_name):
+                continue
+
+            name = file_name.split('.')[0]
+            ext = file_name[len(name):]
+            with open(full_name, 'rb') as f:
+                data = f.read()
+
+            index.setdefault(name, {})[ext] = [out.tell(), len(data)]
+            out.write(data)
+
+        raw_index = json.dumps(index, ensure_ascii=False).encode('utf-8')
+        offset = out.tell()
+        out.write(raw_index)
+
+        out.seek(0)
+        out.write(PackedCorpus.header.pack(PackedCorpus.magic, offset, len(raw_index)))
+
+    return len(index)
@@ -0,0 +1,179 @@
+# This module contains fast parsers of the standard markup layers. Each parser takes the
+# whole contents of a layer file and returns a list of tuples with the parsed fields.
+#
+# Well-formed files are parsed in bulk with string methods and regular expressions. If a
+# file has anything unusual (quoted fields, malformed lines, etc.), it is parsed with the
+# original csv-based code instead, so the results and error messages stay the same
+
+import io
+import re
+import csv
+
+from dialent.config import Config
+
+#########################################################################################
+
+# matches a well-formed line of a '.spans' file
+span_pattern = re.compile(
+    '^ *(\\S+) +(\\S+) +(\\d+) +(\\d+) +(\\S+) +(\\d+) *{}(.*)$'.format(
+        re.escape(Config.SPAN_FILE_SEPARATOR)),
+    re.MULTILINE)
+
+def countLines(text):
+    """Returns the number of lines in the file contents"""
+    n = text.count('\n')
+    if len(text) > 0 and not text.endswith('\n'):
+        n += 1
+    return n
+
+#########################################################################################
+
+def parseTokens(text, filename):
+    """Parse the contents of a '.tokens' file.
+
+    Returns a list of tuples (token_id, start, length, text)"""
+    if Config.QUOTECHAR not in text:
+        rows = [line.split(Config.DEFAULT_DELIMITER)
+                for line in filter(None, text.split('\n'))]
+        if set(map(len, rows)) <= {Config.TOKEN_LINE_LENGTH}:
+            return [(token_id, int(start), int(length), token_text)
+                    for token_id, start, length, token_text in rows]
+
+    return csvTokens(text, filename)
+
+def parseSpans(text, filename):
+    """Parse the contents of a '.spans' file. Expected format:
+
+    line = <left> SPAN_FILE_SEPARATOR <right>
+    left = <span_id> <tag_name> <start_pos> <nchars> <start_token> <ntokens>
+    right ::= [ <token>]+ [ <token_text>]+     // <ntokens> of each
+
+    Returns a list of tuples
+    (span_id, tag_name, start_pos, nchars, start_token, ntokens, token_ids, text),
+    where text consists of the token texts joined with spaces (it may end with a line
+    break)"""
+    rows = span_pattern.findall(text)
+    n_lines = countLines(text)
+    if len(rows) != n_lines or text.count(Config.SPAN_FILE_SEPARATOR) != n_lines:
+        return csvSpans(text, filename)
+
+    res = []
+    for span_id, tag, start, nchars, token_start, ntokens, right in rows:
+        ntokens = int(ntokens)
+        right_fields = right.split(Config.DEFAULT_DELIMITER)
+        if '' in right_fields or len(right_fields) != 2*ntokens:
+            return csvSpans(text, filename)
+
+        res.append( (span_id, tag, int(start), int(nchars), int(token_start), ntokens,
+                     [x.strip() for x in right_fields[:ntokens]],
+                     ' '.join(right_fields[ntokens:])) )
+
+    return res
+
+def parseMentions(text, filename):
+    """Parse the contents of an '.objects' file. Expected format:
+
+    line = <object_id> <type> <span_id> # <comment>
+
+    Returns a list of tuples (object_id, type, span_ids)"""
+    separator = (Config.DEFAULT_DELIMITER + Config.COMMENT_SEPARATOR +
+                 Config.DEFAULT_DELIMITER)
+    if Config.QUOTECHAR in text or text.count(separator) != countLines(text):
+        return csvMentions(text, filename)
+
+    res = []
+    for line in text.split('\n'):
+        end = line.find(separator)
+        if end < 0:
+            if len(line) == 0:
+                # the line break at the end of the file
+                continue
+            return csvMentions(text, filename)
+        if line.startswith(Config.COMMENT_SEPARATOR + Config.DEFAULT_DELIMITER):
+            return csvMentions(text, filename)
+
+        fields = line[:end].split(Config.DEFAULT_DELIMITER)
+        if len(fields) <= 2:
+            return csvMentions(text, filename)
+
+        res.append( (fields[0].strip(), fields[1], [x.strip() for x in fields[2:]]) )
+
+    return res
+
+#########################################################################################
+# The original csv-based parsing code. It handles the files the fast paths above refuse
+
+def csvTokens(text, filename):
+    """Parse the contents of a '.tokens' file with the csv module"""
+    res = []
+    with io.StringIO(text) as f:
+        rdr = csv.reader(f, delimiter=Config.DEFAULT_DELIMITER, quotechar=Config.QUOTECHAR)
+        for index, line in enumerate(rdr):
+            if len(line) == 0:
+                # skip the empty lines
+                continue
+
+            if len(line) != Config.TOKEN_LINE_LENGTH:
+                # bad non-empty line
+                raise Exception(
+                    'Wrong length in line {} of file {}'.format(
+                        index, filename))
+
+            res.append( (line[0], int(line[1]), int(line[2]), line[3]) )
+
+    return res
+
+def csvSpans(text, filename):
+    """Parse the contents of a '.spans' file line by line"""
+    res = []
+    with io.StringIO(text) as f:
+        for index, line in enumerate(f):
+            if len(line) == 0:
+                continue
+
+            parts = line.split(Config.SPAN_FILE_SEPARATOR)
+            if len(parts) != 2:
+                # bad non-empty line
+                raise Exception(
+                    'Expected symbol "{}" missing in line {} of file {}'.format(
+                        Config.SPAN_FILE_SEPARATOR, index, filename))
+
+            left = [x for x in parts[0].split(Config.DEFAULT_DELIMITER) if len(x) > 0]
+            if len(left) < 6:
+                raise Exception(
+                    'Missing left parts in line {} of file {}'.format(
+                        index, filename))
+
+            ntokens = int(left[5])
+            right = [x for x in parts[1].split(Config.DEFAULT_DELIMITER) if len(x) > 0]
+            if len(right) != 2*ntokens:
+                raise Exception(
+                    'Missing right parts in line {} of file {}'.format(
+                        index, filename))
+
+            res.append( (left[0], left[1], int(left[2]), int(left[3]), int(left[4]),
+                         ntokens, [x.strip() for x in right[:ntokens]],
+                         ' '.join(right[ntokens:])) )
+
+    return res
+
+def csvMentions(text, filename):
+    """Parse the contents of an '.objects' file with the csv module"""
+    res = []
+    with io.StringIO(text) as f:
+        r = csv.reader(f, delimiter=Config.DEFAULT_DELIMITER, quotechar=Config.QUOTECHAR)
+        for index, line in enumerate(r):
+            if Config.COMMENT_SEPARATOR in line:
+                line = line[:line.index(Config.COMMENT_SEPARATOR)]
+
+            if len(line) == 0:
+                continue
+
+            if len(line) <= 2:
+                raise Exception(
+                    'Missing spans in object description: line {} of file {}'.format(
+                        index, filename))
+
+            res.append( (line[0].strip(), line[1], [x.strip() for x in line[2:]]) )
+
+    return res
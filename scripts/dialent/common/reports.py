@@ -0,0 +1,362 @@
+# This module writes the per-document evaluation reports. A report is passed around as
+# an iterable of text lines rendered on demand (see renderReport of the evaluators), so
+# it is streamed to the output and never has to be held in memory as a whole.
+#
+# The reports of an evaluation are written either to a folder, one file per document,
+# or to a single .zip or .tar.gz archive (when the output path has such an extension).
+# An archive holds the report files and index.json, the index
+# {document name : report file name}, so that a report can be looked up by the document
+# name alone (see ReportArchiveReader). Writing to an existing archive replaces the
+# reports of the written documents and keeps the rest, the same way writing to an
+# existing folder does.
+#
+# ReportWriter renders and writes the reports in a background thread, while the
+# evaluation goes on with the next documents.
+
+import io
+import os
+import json
+import queue
+import tarfile
+import zipfile
+import threading
+import contextlib
+
+#########################################################################################
+
+# extensions of the report archives
+archive_extensions = ['.zip', '.tar.gz', '.tgz']
+
+# name of the index file of an archive
+index_name = 'index.json'
+
+def isArchivePath(path):
+    """Check if the reports written to the given path go to an archive"""
+    return any(path.endswith(x) for x in archive_extensions)
+
+def openReports(path):
+    """Open the report output with the given path, a folder or an archive"""
+    if isArchivePath(path):
+        return ReportArchive(path)
+    return ReportDirectory(path)
+
+def reportLocation(path, filename):
+    """Returns the location of the report file written to the given output path: the
+    file path, or <archive path>:<file name> for an archive"""
+    if isArchivePath(path):
+        return '{}:{}'.format(path, filename)
+    return os.path.join(path, filename)
+
+def findMissing(locations):
+    """Returns the list of the report locations (see reportLocation) with no reports"""
+    archives = {}
+    res = []
+    for location in locations:
+        path, sep, filename = location.rpartition(':')
+        if len(sep) == 0 or not isArchivePath(path):
+            if not os.path.exists(location):
+                res.append(location)
+            continue
+
+        if not path in archives:
+            archives[path] = set()
+            if os.path.isfile(path):
+                with ReportArchiveReader(path) as reader:
+                    archives[path] = set(reader.filenames())
+        if not filename in archives[path]:
+            res.append(location)
+    return res
+
+def writeReport(path, lines):
+    """Write the report lines to the file, its folder is created if necessary"""
+    if len(os.path.dirname(path)) > 0:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+
+#########################################################################################
+
+class ReportDirectory:
+    """Report output to a folder, one file per document"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, name, filename, lines):
+        """Write the report lines of the document with the given name to the file"""
+        writeReport(os.path.join(self.path, filename), lines)
+
+    def remove(self, name, filenames):
+        """Remove the report of the document, filenames are its possible file names"""
+        for filename in filenames:
+            if os.path.exists(os.path.join(self.path, filename)):
+                os.remove(os.path.join(self.path, filename))
+
+    def close(self, is_complete=True):
+        pass
+
+
+class ReportArchive:
+    """Report output to a .zip or .tar.gz archive. The reports are written to
+    <archive path>.tmp, it replaces the archive on close"""
+
+    def __init__(self, path):
+        self.path = path
+        self.is_zip = path.endswith('.zip')
+        # {document name : report file name}
+        self.index = {}
+        self.removed = set()
+
+        if len(os.path.dirname(path)) > 0:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.tmp_path = path + '.tmp'
+        if self.is_zip:
+            self._archive = zipfile.ZipFile(self.tmp_path, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            self._archive = tarfile.open(self.tmp_path, 'w:gz')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(exc_type == None)
+
+    def write(self, name, filename, lines):
+        """Write the report lines of the document with the given name to the archive"""
+        if name in self.index or filename == index_name:
+            raise Exception('Duplicate report in {}: {}'.format(self.path, filename))
+        self.index[name] = filename
+        if self.is_zip:
+            with self._archive.open(filename, 'w') as f:
+                for line in lines:
+                    f.write(line.encode('utf-8'))
+        else:
+            self._addTarFile(filename, ''.join(lines).encode('utf-8'))
+
+    def remove(self, name, filenames):
+        """Remove the report of the document, filenames are its possible file names"""
+        self.removed.add(name)
+
+    def close(self, is_complete=True):
+        """Finish the archive: copy the reports of the other documents from the old
+        archive, write the index and replace the old archive. If is_complete is False,
+        the archive is left as it was"""
+        if self._archive == None:
+            return
+        try:
+            if is_complete:
+                if os.path.isfile(self.path):
+                    self._copyOld()
+                data = json.dumps(self.index, ensure_ascii=False, sort_keys=True,
+                                  indent=0).encode('utf-8')
+                if self.is_zip:
+                    self._archive.writestr(index_name, data)
+                else:
+                    self._addTarFile(index_name, data)
+            self._archive.close()
+            self._archive = None
+            if is_complete:
+                os.replace(self.tmp_path, self.path)
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+    def _copyOld(self):
+        """Copy the reports of the documents that were neither written nor removed from
+        the old archive"""
+        skipped = self.removed.union(self.index.keys())
+        with ReportArchiveReader(self.path) as reader:
+            for name, filename, data in reader.reports(skipped):
+                self.index[name] = filename
+                if self.is_zip:
+                    self._archive.writestr(filename, data)
+                else:
+                    self._addTarFile(filename, data)
+
+    def _addTarFile(self, filename, data):
+        info = tarfile.TarInfo(filename)
+        info.size = len(data)
+        self._archive.addfile(info, io.BytesIO(data))
+
+
+class ReportArchiveReader:
+    """Reads the reports of a .zip or .tar.gz archive by the document names. Zip members
+    are read directly, a compressed tar archive is decompressed up to the member"""
+
+    def __init__(self, path):
+        self.path = path
+        if zipfile.is_zipfile(path):
+            self._zip = zipfile.ZipFile(path)
+            self._tar = None
+        else:
+            self._zip = None
+            self._tar = tarfile.open(path, 'r:*')
+        # {document name : report file name}
+        self.index = json.loads(self._readMember(index_name).decode('utf-8'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def names(self):
+        """Returns a sorted list of the names of the documents with reports"""
+        return sorted(self.index.keys())
+
+    def filename(self, name):
+        """Returns the report file name of the document, e.g. to see if it starts
+        with '_'"""
+        return self.index[name]
+
+    def filenames(self):
+        """Returns a list of the report file names the archive has"""
+        if self._zip != None:
+            members = self._zip.namelist()
+        else:
+            members = self._tar.getnames()
+        return [x for x in members if x != index_name]
+
+    def read(self, name):
+        """Returns the report text of the document with the given name"""
+        if not name in self.index:
+            raise FileNotFoundError(
+                'No report in the archive: {}:{}'.format(self.path, name))
+        return self._readMember(self.index[name]).decode('utf-8')
+
+    def reports(self, skipped=()):
+        """Yields (document name, report file name, report data) tuples of all the
+        documents except the skipped ones in the order of the archive"""
+        names = dict((filename, name) for name, filename in self.index.items()
+                     if not name in skipped)
+        for member in self.filenames():
+            if member in names:
+                yield names[member], member, self._readMember(member)
+
+    def close(self):
+        if self._zip != None:
+            self._zip.close()
+        else:
+            self._tar.close()
+
+    def _readMember(self, member):
+        if self._zip != None:
+            return self._zip.read(member)
+        return self._tar.extractfile(member).read()
+
+#########################################################################################
+
+class ReportWriter:
+    """Writes the submitted reports in a background thread. The lines of a report must
+    not depend on the state of the evaluator, since they are rendered after the
+    evaluation has moved on. An error of the thread is raised by the next submit or by
+    close"""
+
+    def __init__(self, max_pending=64):
+        """Start the thread. At most max_pending reports wait to be written, submit
+        blocks when there are more"""
+        self.queue = queue.Queue(max_pending)
+        self.error = None
+        self.count = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(exc_type == None)
+
+    def submit(self, output, name, filename, lines):
+        """Queue the report lines of the document to be written to the output (see
+        openReports)"""
+        self._check()
+        self.queue.put( (output, name, filename, lines) )
+
+    def close(self, is_checked=True):
+        """Wait until all the submitted reports are written and stop the thread. If
+        is_checked is True, the error of the thread is raised"""
+        if self.thread == None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        if is_checked:
+            self._check()
+
+    def _check(self):
+        """Raise the error of the thread, if any"""
+        if self.error != None:
+            error, self.error = self.error, None
+            raise error
+
+    def _run(self):
+        """Write the queued reports until close is called. Once a report fails, the rest
+        are skipped"""
+        while True:
+            item = self.queue.get()
+            if item == None:
+                break
+            if self.error != None:
+                continue
+            output, name, filename, lines = item
+            try:
+                output.write(name, filename, lines)
+                self.count += 1
+            except Exception as e:
+                self.error = e
+
+
+class QueuedReports:
+    """Report output that passes the reports to a ReportWriter"""
+
+    def __init__(self, writer, output):
+        self.writer = writer
+        self.output = output
+        self.path = output.path
+
+    def write(self, name, filename, lines):
+        self.writer.submit(self.output, name, filename, lines)
+
+#########################################################################################
+
+@contextlib.contextmanager
+def reportOutput(evaluators, output_paths):
+    """Context of an evaluation pass of the evaluators. The report output of each
+    evaluator is opened while in it (as its report_output), the archives are finished
+    on leaving it. The evaluators that have report_thread set write their reports with
+    a shared ReportWriter"""
+    outputs = {}
+    writer = None
+    is_complete = False
+    try:
+        for e, path in zip(evaluators, output_paths):
+            if len(path) == 0:
+                continue
+            if not path in outputs:
+                outputs[path] = openReports(path)
+            e.report_output = outputs[path]
+            if e.report_thread:
+                if writer == None:
+                    writer = ReportWriter()
+                e.report_output = QueuedReports(writer, outputs[path])
+        yield
+        is_complete = True
+    finally:
+        for e in evaluators:
+            e.report_output = None
+        try:
+            if writer != None:
+                writer.close(is_complete)
+        except Exception:
+            is_complete = False
+            raise
+        finally:
+            for output in outputs.values():
+                output.close(is_complete)
@@ -0,0 +1,149 @@
+# This module implements the sharded evaluation. The documents of a set are split into
+# N shards that can be evaluated separately, e.g. on several machines sharing the
+# storage. Each shard saves the per-document results to a partial results file, and
+# merge combines any set of such files into the final metrics. The metrics only hold
+# additive counters, so the merged result is exactly the same as the one of a single
+# run.
+#
+# Partial results file (JSON):
+#
+#   { 'version' : Config.EVALUATOR_VERSION, 'mode' : <mode>, 'shard' : 'i/N',
+#     'documents' : { <name> : { 'metrics' : { <tag> : [tp_std, tp_test,
+#                                                       n_std, n_test] },
+#                                'report' : <report location or null> } } }
+#
+# The report location is the report file path, or <archive path>:<file name> if the
+# reports are written to an archive (see dialent.common.reports)
+#
+# Modes are named as in dialent.leaderboard: t1, t1-l, t2, t2-m, t3, t3-m
+
+import os
+import json
+import zlib
+
+from dialent.config import Config
+from dialent.common.metrics import Metrics
+from dialent.common.reports import isArchivePath, reportLocation, archive_extensions
+from dialent.leaderboard import Leaderboard
+
+#########################################################################################
+
+class Shard:
+    """A deterministic subset of the documents of a set"""
+
+    def __init__(self, index, count):
+        """Create the shard with the given 1-based index out of count shards"""
+        if count < 1 or index < 1 or index > count:
+            raise Exception('Invalid shard: {}/{}'.format(index, count))
+        self.index = index
+        self.count = count
+
+    def contains(self, name):
+        """Check if the document with the given name belongs to the shard. A document
+        always belongs to the same shard, whatever other documents the set has"""
+        return zlib.crc32(name.encode('utf-8')) % self.count == self.index - 1
+
+    def defaultPath(self, output_path=''):
+        """Returns the default partial results file path: partial.<i>-of-<N>.json in
+        the output folder, or in the folder of the report archive"""
+        if isArchivePath(output_path):
+            output_path = os.path.dirname(output_path)
+        return os.path.join(output_path,
+                            'partial.{}-of-{}.json'.format(self.index, self.count))
+
+    def reportPath(self, output_path):
+        """Returns the report output path of the shard. The shards share a report
+        folder, but an archive can only be written by a single shard, so each of them
+        writes its own one: <name>.<i>-of-<N><extension>"""
+        if not isArchivePath(output_path):
+            return output_path
+        ext = [x for x in archive_extensions if output_path.endswith(x)][0]
+        return '{}.{}-of-{}{}'.format(output_path[:-len(ext)], self.index, self.count, ext)
+
+    def save(self, path, evaluator, documents, output_path=''):
+        """Save the partial results file of the shard. documents is a dictionary
+        {document name : metrics dictionary} built by the evaluator, the reports are
+        referenced if they were written to output_path"""
+        res = {}
+        for name, metrics in documents.items():
+            report = None
+            if len(output_path) > 0 and evaluator.isReported(metrics):
+                report = reportLocation(output_path, evaluator.reportName(name, metrics))
+            res[name] = {
+                'metrics' : dict((tag, [m.tp_std, m.tp_test, m.n_std, m.n_test])
+                                 for tag, m in metrics.items()),
+                'report' : report
+            }
+
+        data = {
+            'version' : Config.EVALUATOR_VERSION,
+            'mode' : evaluator.modeName(),
+            'shard' : '{}/{}'.format(self.index, self.count),
+            'documents' : res
+        }
+
+        if len(os.path.dirname(path)) > 0:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def parse(cls, text):
+        """Create the shard from its 'i/N' description"""
+        parts = text.split('/')
+        if len(parts) != 2 or not parts[0].isdigit() or not parts[1].isdigit():
+            raise Exception('Shards must be given as i/N: {}'.format(text))
+        return cls(int(parts[0]), int(parts[1]))
+
+    @classmethod
+    def merge(cls, paths):
+        """Combine the partial results files. Returns a tuple (mode, metrics dictionary,
+        {document name : report path}). Prints a warning if some of the shards are
+        missing. If the files have no documents (e.g. the shards are empty), all the
+        metrics are zero, as in a single run over no documents"""
+        if len(paths) == 0:
+            raise Exception('No partial results files to merge')
+
+        mode = None
+        count = None
+        shards = set()
+        documents = {}
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+
+            if data['version'] != Config.EVALUATOR_VERSION:
+                raise Exception('"{}" was made by another evaluator version: {}'.format(
+                    path, data['version']))
+            if mode == None:
+                mode = data['mode']
+            if data['mode'] != mode:
+                raise Exception('"{}" has the results of another mode: {} instead of {}'
+                    .format(path, data['mode'], mode))
+
+            shard = Shard.parse(data['shard'])
+            if count != None and shard.count != count:
+                raise Exception('"{}" belongs to a split into {} shards instead of {}'
+                    .format(path, shard.count, count))
+            count = shard.count
+            if shard.index in shards:
+                raise Exception('Shard {}/{} is given twice'.format(shard.index, count))
+            shards.add(shard.index)
+
+            documents.update(data['documents'])
+
+        missing = [str(x) for x in range(1, count + 1) if not x in shards]
+        if len(missing) > 0:
+            print('WARNING: missing shards: {} (out of {})'.format(
+                ', '.join(missing), count))
+
+        # the documents are added in the same order as in a single run, so that even the
+        # floating point totals are the same
+        names = sorted(documents.keys(), key=lambda x: int(x[5:]))
+        tags = Leaderboard.createEvaluator(mode).metricTags()
+        res = dict((tag, Metrics()) for tag in tags)
+        for name in names:
+            for tag, values in documents[name]['metrics'].items():
+                res.setdefault(tag, Metrics()).add(Metrics.create(*values))
+
+        return mode, res, dict((x, documents[x]['report']) for x in names)
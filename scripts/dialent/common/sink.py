@@ -0,0 +1,64 @@
+# This module writes the per-document results of an evaluation in a machine-readable
+# form, for the dashboards that aggregate large leaderboard runs. Every evaluated
+# document produces one record per tag:
+#
+#   run, mode, document, tag - where the result comes from (run is only set by
+#                              dialent.leaderboard, it is empty otherwise)
+#   tp_std, tp_test, n_std, n_test - the additive counters of dialent.common.metrics
+#   time                     - wall time of the document evaluation in the mode,
+#                              seconds
+#   search_time, nodes, leaves, max_depth, pruned - the matching search counters of
+#                              dialent.common.stats (empty if the result was cached)
+#
+# The records are written as JSON Lines, or as CSV if the file name ends with .csv.
+# The file is flushed after every document, so it can be followed while the evaluation
+# is running.
+
+import csv
+import json
+
+#########################################################################################
+
+class MetricsSink:
+    """Writes the per-document, per-tag records of the evaluation to a file"""
+
+    fields = ['run', 'mode', 'document', 'tag', 'tp_std', 'tp_test', 'n_std', 'n_test',
+              'time', 'search_time', 'nodes', 'leaves', 'max_depth', 'pruned']
+
+    def __init__(self, path):
+        """Open the file with the given path, it is overwritten"""
+        self.path = path
+        self.is_csv = path.endswith('.csv')
+        # name of the evaluated run written to the records
+        self.run = None
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._csv = None
+        if self.is_csv:
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(MetricsSink.fields)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, mode, name, metrics_dict, stats=None, elapsed=None):
+        """Write the records of a document evaluated in the mode. metrics_dict is the
+        {tag : Metrics} dictionary of the document, stats is its SearchStats (None if
+        the result was cached), elapsed is its evaluation time"""
+        search = ([stats.time, stats.nodes, stats.leaves, stats.max_depth, stats.pruned]
+                  if stats != None else [None] * 5)
+        for tag, m in metrics_dict.items():
+            values = ([self.run, mode, name, tag, m.tp_std, m.tp_test, m.n_std, m.n_test,
+                       elapsed] + search)
+            if self.is_csv:
+                self._csv.writerow(['' if x == None else x for x in values])
+            else:
+                self._file.write(json.dumps(dict(zip(MetricsSink.fields, values)),
+                                            ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
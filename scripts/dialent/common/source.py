@@ -0,0 +1,160 @@
+# This module provides uniform access to the document files of a markup collection,
+# regardless of the way the collection is stored
+
+import os
+import posixpath
+import tarfile
+import zipfile
+
+from dialent.common.packed import PackedCorpus
+
+#########################################################################################
+
+def selectNames(filenames, ext=None):
+    """Returns a set of document names from the given file names. If ext is provided,
+    only the files with this extension are considered"""
+    return set([x.split('.')[0] for x in filenames if ext == None or ext in x])
+
+#########################################################################################
+
+class DirectorySource:
+    """Markup collection stored as a plain directory with one file per document layer"""
+
+    def __init__(self, path):
+        """Open the collection in the given directory"""
+        self.path = path
+
+    def names(self, ext=None):
+        """Returns a set of document names found in the collection. If ext is provided,
+        only the documents with this layer are returned"""
+        return selectNames(os.listdir(self.path), ext)
+
+    def has(self, name, ext):
+        """Check if the collection has the given layer of the given document"""
+        return os.path.isfile(self.location(name, ext))
+
+    def read(self, name, ext):
+        """Returns raw contents of the given layer of the given document"""
+        with open(self.location(name, ext), 'rb') as f:
+            return f.read()
+
+    def location(self, name, ext):
+        """Returns a human-readable location of the given layer used in messages"""
+        return os.path.join(self.path, name + ext)
+
+#########################################################################################
+
+class ArchiveSource:
+    """Markup collection stored in a .zip or .tar(.gz) archive. Directories inside the
+    archive are ignored, so the files are looked up by their base names, and two files
+    with the same base name are an error.
+
+    Zip members are read on demand. Tar archives have no random access (especially when
+    compressed), so they are streamed through once and all the members are read into
+    memory when the archive is opened: a tar collection takes as much memory as its
+    uncompressed size for as long as the source object is alive"""
+
+    def __init__(self, path):
+        """Open the archive with the given path. A tar archive is read in full"""
+        self.path = path
+        self._files = {}
+        if zipfile.is_zipfile(path):
+            self._zip = zipfile.ZipFile(path)
+            for info in self._zip.infolist():
+                if not info.is_dir():
+                    self._addMember(info.filename, info)
+        else:
+            self._zip = None
+            with tarfile.open(path, 'r|*') as tar:
+                for info in tar:
+                    if info.isfile():
+                        self._addMember(info.name, tar.extractfile(info).read())
+
+    def _addMember(self, member_name, data):
+        """Register the archive member under its base name"""
+        filename = posixpath.basename(member_name)
+        if filename.startswith('.'):
+            # skip service files such as the ones created by macOS
+            return
+        if filename in self._files:
+            raise Exception('Duplicate file name in {}: {}'.format(
+                self.path, member_name))
+        self._files[filename] = data
+
+    def names(self, ext=None):
+        """Returns a set of document names found in the collection. If ext is provided,
+        only the documents with this layer are returned"""
+        return selectNames(self._files.keys(), ext)
+
+    def has(self, name, ext):
+        """Check if the collection has the given layer of the given document"""
+        return (name + ext) in self._files
+
+    def read(self, name, ext):
+        """Returns raw contents of the given layer of the given document"""
+        if not self.has(name, ext):
+            raise FileNotFoundError(
+                'No such file in the archive: {}'.format(self.location(name, ext)))
+
+        data = self._files[name + ext]
+        return self._zip.read(data) if self._zip != None else data
+
+    def location(self, name, ext):
+        """Returns a human-readable location of the given layer used in messages"""
+        return '{}:{}'.format(self.path, name + ext)
+
+    @classmethod
+    def isArchive(cls, path):
+        """Check if the given file is a supported archive"""
+        return zipfile.is_zipfile(path) or tarfile.is_tarfile(path)
+
+#########################################################################################
+
+class MemorySource:
+    """Markup collection held in memory as a dictionary {file name : contents}, e.g.
+    a submission sent to the evaluation service"""
+
+    def __init__(self, files, path='<memory>'):
+        """Create the collection from the given dictionary. The contents can be either
+        bytes or strings (strings are utf-8 encoded)"""
+        self.path = path
+        self._files = dict((name, data.encode('utf-8') if isinstance(data, str) else data)
+                           for name, data in files.items())
+
+    def names(self, ext=None):
+        """Returns a set of document names found in the collection. If ext is provided,
+        only the documents with this layer are returned"""
+        return selectNames(self._files.keys(), ext)
+
+    def has(self, name, ext):
+        """Check if the collection has the given layer of the given document"""
+        return (name + ext) in self._files
+
+    def read(self, name, ext):
+        """Returns raw contents of the given layer of the given document"""
+        if not self.has(name, ext):
+            raise FileNotFoundError(
+                'No such file in the collection: {}'.format(self.location(name, ext)))
+
+        return self._files[name + ext]
+
+    def location(self, name, ext):
+        """Returns a human-readable location of the given layer used in messages"""
+        return '{}:{}'.format(self.path, name + ext)
+
+#########################################################################################
+
+def openSource(path):
+    """Open a markup collection. path can be a directory, a packed corpus file, a .zip or
+    .tar(.gz) archive (a tar archive is read into memory, see ArchiveSource) or an
+    already opened collection object"""
+    if not isinstance(path, str):
+        return path
+
+    if os.path.isfile(path):
+        if PackedCorpus.isPacked(path):
+            return PackedCorpus(path)
+        if ArchiveSource.isArchive(path):
+            return ArchiveSource(path)
+
+    return DirectorySource(path)
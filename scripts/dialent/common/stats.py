@@ -0,0 +1,63 @@
+#########################################################################################
+
+class SearchStats:
+    """Counters of a matching search, used to find the documents that are expensive to
+    evaluate"""
+
+    header_template = '{:>10} {:>10} {:>6} {:>10} {:>9}'
+    line_template = '{:10d} {:10d} {:6d} {:10d} {:9.3f}'
+
+    def __init__(self):
+        """Initialize the empty counters"""
+        # Search tree nodes expanded (not counting the leaves)
+        self.nodes = 0
+        # Complete matchings evaluated
+        self.leaves = 0
+        # Maximum depth of the search tree
+        self.max_depth = 0
+        # Branches cut off by the rule that perfectly fitting objects must be matched
+        self.pruned = 0
+        # Time spent in the search, seconds
+        self.time = 0.0
+
+    def add(self, other):
+        """Add the counters of another search (e.g. of another tag of the document)"""
+        self.nodes += other.nodes
+        self.leaves += other.leaves
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.pruned += other.pruned
+        self.time += other.time
+
+    def toDict(self):
+        """Returns a dictionary of all the values (e.g. for the JSON output)"""
+        return {
+            'nodes' : self.nodes,
+            'leaves' : self.leaves,
+            'max_depth' : self.max_depth,
+            'pruned' : self.pruned,
+            'time' : self.time
+        }
+
+    def toLine(self):
+        """Returns a line for the stats table"""
+        return SearchStats.line_template.format(
+            self.nodes, self.leaves, self.max_depth, self.pruned, self.time)
+
+    @classmethod
+    def header(cls):
+        """Returns the header of the stats table"""
+        return SearchStats.header_template.format(
+            'Nodes', 'Leaves', 'Depth', 'Pruned', 'Time, s')
+
+    @classmethod
+    def buildTable(cls, stats_by_name):
+        """Build a table of the documents given as a dictionary {document name :
+        SearchStats}, ranked by the time spent, with the totals in the last line"""
+        total = SearchStats()
+        res = '{:15} '.format('Document') + SearchStats.header() + '\n'
+        for name, stats in sorted(stats_by_name.items(),
+                                  key=lambda x: (-x[1].time, x[0])):
+            res += '{:15} '.format(name) + stats.toLine() + '\n'
+            total.add(stats)
+        res += '{:15} '.format('total') + total.toLine()
+        return res
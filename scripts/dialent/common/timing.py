@@ -0,0 +1,164 @@
+# This module measures the time spent in the stages of an evaluation (the --profile
+# option of the evaluation scripts). The evaluation code marks its stages with
+#
+#   with stage('search', document_name):
+#       ...
+#
+# which does nothing unless a StageProfiler is started. Stages must not be nested.
+
+import time
+import datetime
+import cProfile
+import contextlib
+import tracemalloc
+
+#########################################################################################
+
+# profiler the stages are reported to, set by StageProfiler.start
+active = None
+
+_null_context = contextlib.nullcontext()
+
+def stage(name, document=None):
+    """Returns the context of the given evaluation stage of the document"""
+    if active == None:
+        return _null_context
+    return active.stage(name, document)
+
+def progress(done, total):
+    """Report that done out of total documents are evaluated. Call it with done = 0
+    before the first document, the estimate is based on the time since then"""
+    if active != None:
+        active.progress(done, total)
+
+#########################################################################################
+
+class StageProfiler:
+    """Collects the wall and CPU time of every evaluation stage, in total and per
+    document"""
+
+    # stages in the order they are reported
+    stages = ['std load', 'test load', 'token sets', 'matrix', 'search', 'reports']
+
+    # minimal time between two progress lines, seconds
+    progress_interval = 5.0
+
+    def __init__(self, is_memory=False, cprofile_path=None):
+        """Create the profiler. If is_memory is True, the peak of the memory allocated
+        in every stage is traced (this slows the evaluation down). If cprofile_path is
+        provided, the cProfile statistics of the whole run are saved there"""
+        self.is_memory = is_memory
+        self.cprofile_path = cprofile_path
+        # {stage : [wall, cpu]}
+        self.totals = dict((x, [0.0, 0.0]) for x in StageProfiler.stages)
+        # {document name : {stage : [wall, cpu]}}
+        self.documents = {}
+        # {stage : peak size, bytes}
+        self.peaks = dict((x, 0) for x in StageProfiler.stages)
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.profile = None
+
+    def start(self):
+        """Start the profiling and make the profiler active"""
+        global active
+        active = self
+        if self.is_memory:
+            tracemalloc.start()
+        if self.cprofile_path != None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._start_progress = self._start_wall
+        self._last_progress = self._start_wall
+
+    def stop(self):
+        """Stop the profiling and save the cProfile statistics"""
+        global active
+        self.wall += time.perf_counter() - self._start_wall
+        self.cpu += time.process_time() - self._start_cpu
+        if self.profile != None:
+            self.profile.disable()
+            self.profile.dump_stats(self.cprofile_path)
+            self.profile = None
+        if self.is_memory:
+            tracemalloc.stop()
+        active = None
+
+    @contextlib.contextmanager
+    def stage(self, name, document=None):
+        """Measure the given stage of the document"""
+        if self.is_memory:
+            tracemalloc.reset_peak()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.process_time() - start_cpu
+            self.totals[name][0] += wall
+            self.totals[name][1] += cpu
+            if document != None:
+                values = self.documents.setdefault(document, {}).setdefault(
+                    name, [0.0, 0.0])
+                values[0] += wall
+                values[1] += cpu
+            if self.is_memory:
+                self.peaks[name] = max(self.peaks[name],
+                                       tracemalloc.get_traced_memory()[1])
+
+    def progress(self, done, total):
+        """Print the progress line with the estimated time left, at most once in
+        progress_interval seconds and when the last document is done"""
+        now = time.perf_counter()
+        if done == 0:
+            self._start_progress = now
+            self._last_progress = now
+            return
+        if done < total and now - self._last_progress < StageProfiler.progress_interval:
+            return
+        self._last_progress = now
+        elapsed = now - self._start_progress
+        eta = elapsed / done * (total - done)
+        print('{}/{} documents evaluated, elapsed {}, ETA {}'.format(
+            done, total, self._formatTime(elapsed), self._formatTime(eta)), flush=True)
+
+    def buildReport(self, n_slowest=10):
+        """Build the table of the stage totals and the table of the n_slowest documents
+        with the largest wall time"""
+        res = '{:12} {:>10} {:>10}'.format('Stage', 'Wall, s', 'CPU, s')
+        if self.is_memory:
+            res += ' {:>10}'.format('Peak, MB')
+        res += '\n'
+        for name in StageProfiler.stages:
+            wall, cpu = self.totals[name]
+            res += '{:12} {:10.3f} {:10.3f}'.format(name, wall, cpu)
+            if self.is_memory:
+                res += ' {:10.1f}'.format(self.peaks[name] / 2**20)
+            res += '\n'
+        res += '{:12} {:10.3f} {:10.3f}\n'.format(
+            'other', self.wall - sum(x[0] for x in self.totals.values()),
+            self.cpu - sum(x[1] for x in self.totals.values()))
+        res += '{:12} {:10.3f} {:10.3f}\n'.format('total', self.wall, self.cpu)
+
+        walls = dict((name, sum(x[0] for x in values.values()))
+                     for name, values in self.documents.items())
+        slowest = sorted(walls.keys(), key=lambda x: (-walls[x], x))[:n_slowest]
+        res += '\nSlowest documents, wall time, s\n'
+        res += '{:15}'.format('Document')
+        res += ''.join(' {:>10}'.format(x) for x in StageProfiler.stages + ['total'])
+        res += '\n'
+        for name in slowest:
+            values = self.documents[name]
+            res += '{:15}'.format(name)
+            res += ''.join(' {:10.3f}'.format(values.get(x, [0.0, 0.0])[0])
+                           for x in StageProfiler.stages)
+            res += ' {:10.3f}\n'.format(walls[name])
+
+        return res.rstrip('\n')
+
+    def _formatTime(self, seconds):
+        """Format the time as h:mm:ss"""
+        return str(datetime.timedelta(seconds=int(seconds)))
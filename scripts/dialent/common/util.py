@@ -1,5 +1,13 @@
 ﻿# This module contains various functions used throughout all the tasks
 
+import io
+import re
+import sys
+import gc
+import json
+import hashlib
+import contextlib
+
 #########################################################################################
 
 def safeOpen(filename):
@@ -14,6 +22,56 @@ def safeOpen(filename):
         if f != None:
             return f
 
+def decodeText(data, encoding='utf-8'):
+    """Decode raw file contents the same way a file opened in text mode would be read"""
+    return io.TextIOWrapper(io.BytesIO(data), encoding=encoding, newline=None).read()
+
+class Normalizer:
+    """Precompiled tables used by safeNormalize and normalize. The results for short
+    strings are cached, since the same tokens and values get normalized over and over.
+    The caches are bounded: a cache that reaches max_cache_size entries is emptied, so
+    that a long-running process (e.g. the eval service or a distributed worker) does
+    not keep the strings of every submission it has seen"""
+
+    # symbols trimmed from both ends of the string
+    whitespace = ' \r\n\t'
+
+    # unify all quote symbols, single quotes, ё/е and dashes
+    symbols = dict(
+        [(s, '"') for s in '«»“”„'] +
+        [(s, "'") for s in '’`'] +
+        [('ё', 'е')] +
+        [(s, '-') for s in '‐−‒–—―'])
+
+    # matches any of the symbols above. str.translate is much slower on long texts
+    symbol_pattern = re.compile('[{}]'.format(''.join(symbols)))
+
+    # in standard strings are generated from tokens, and sometimes have 1 extra space
+    # before or after puntuation symbols: ' ,', ' .', ' -', '- ', '( ', ' )'
+    spacing = re.compile(' (?=[,.)-])|(?<=[-(]) ')
+
+    @classmethod
+    def unifySymbols(cls, string):
+        """Replace the symbols from Normalizer.symbols in the given string"""
+        if cls.symbol_pattern.search(string) == None:
+            return string
+        return cls.symbol_pattern.sub(lambda x: cls.symbols[x.group()], string)
+
+    # only the strings not longer than this are cached
+    max_cached_length = 32
+
+    # maximum number of the entries of each cache
+    max_cache_size = 2**16
+
+    safe_cache = {
+
+        }
+
+    cache = {
+
+        }
+
+
 def safeNormalize(string):
     """Run a number of normalization operations on the given string.
     The string is normalized not in the linguistic sense, but rather in such a way that
@@ -21,28 +79,16 @@ def safeNormalize(string):
     
     All unique non-letter chars:  !"$%()*+,-./0123456789:;<=>?«»–—’“”„•…№
     """
+    is_cached = len(string) <= Normalizer.max_cached_length
+    if is_cached and string in Normalizer.safe_cache:
+        return Normalizer.safe_cache[string]
 
-    # force lower case
-    res = string.lower()
-
-    # trim the string
-    res =  res.strip(' \r\n\t')
-
-    # unify all quote symbols
-    for s in '«»“”„':
-        res = res.replace(s, '"')
-
-    # unify all single quotes
-    for s in '’`':
-        res = res.replace(s, "'")
-
-    # unify all ё/е
-    res = res.replace('ё', 'е')
-
-    # unify all dashes
-    for s in '-‐−‒–—―':
-        res = res.replace(s, '-')
+    res = Normalizer.unifySymbols(string.lower().strip(Normalizer.whitespace))
 
+    if is_cached:
+        if len(Normalizer.safe_cache) >= Normalizer.max_cache_size:
+            Normalizer.safe_cache.clear()
+        Normalizer.safe_cache[string] = res
     return res
 
 def normalize(string):
@@ -52,21 +98,136 @@ def normalize(string):
     
     Unlike safeNormalize, this function also attempts to get rid of extra spaces before
     punctuation"""
+    is_cached = len(string) <= Normalizer.max_cached_length
+    if is_cached and string in Normalizer.cache:
+        return Normalizer.cache[string]
 
-    res = safeNormalize(string)
+    res = Normalizer.unifySymbols(string.lower().strip(Normalizer.whitespace))
+    res = Normalizer.spacing.sub('', res)
 
-    # in standard strings are generated from tokens, and sometimes have 1 extra space
-    # before or after puntuation symbols
+    if is_cached:
+        if len(Normalizer.cache) >= Normalizer.max_cache_size:
+            Normalizer.cache.clear()
+        Normalizer.cache[string] = res
+    return res
 
-    res = res.replace(' ,', ',')
-    res = res.replace(' .', '.')
-    res = res.replace(' -', '-')
-    res = res.replace('- ', '-')
+def normalizeMany(strings):
+    """Normalize a list of strings (e.g. all lines of a file) at once. The result is the
+    same as calling normalize for each of them"""
+    text = '\n'.join(strings)
+    if text.count('\n') != len(strings) - 1:
+        # some of the strings contain line breaks themselves
+        return [normalize(x) for x in strings]
 
-    res = res.replace('( ', '(')
-    res = res.replace(' )', ')')
+    res = Normalizer.unifySymbols(text.lower())
+    res = '\n'.join([x.strip(Normalizer.whitespace) for x in res.split('\n')])
+    return Normalizer.spacing.sub('', res).split('\n')
+
+class FreezeState:
+    """Nesting depth of freezeObjects calls"""
+    depth = 0
+
+def digestPredictions(predictions):
+    """Returns the hash of the in-memory predictions of a document (see fromPredictions
+    of the test markup classes). It identifies them in the result cache the way the
+    hash of the file contents identifies a response file"""
+    data = json.dumps(['predictions', predictions], ensure_ascii=False, sort_keys=True,
+                      default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def freezeObjects():
+    """Exclude all the existing objects from the cyclic garbage collection. This is done
+    after the markup is loaded: the markup has no reference cycles, so it is still freed
+    by reference counting, but the collector no longer walks it over and over.
+    Call unfreezeObjects when done, so that any frozen garbage is collected after all.
+    The calls nest: only the outermost ones freeze and unfreeze the objects, so that
+    an evaluation does not unfreeze the markup frozen by a long-running process"""
+    FreezeState.depth += 1
+    if FreezeState.depth == 1:
+        gc.freeze()
+
+def unfreezeObjects():
+    """Return the objects excluded by freezeObjects to the garbage collection"""
+    if FreezeState.depth == 0:
+        raise Exception('unfreezeObjects called without freezeObjects')
+    FreezeState.depth -= 1
+    if FreezeState.depth == 0:
+        gc.unfreeze()
+
+@contextlib.contextmanager
+def frozenObjects():
+    """Context in which the objects are frozen by freezeObjects, they are unfrozen on
+    leaving it even if an exception is raised"""
+    freezeObjects()
+    try:
+        yield
+    finally:
+        unfreezeObjects()
+
+class StringPool:
+    """Pool of unique strings shared by the standard documents loaded together. Tags,
+    token texts and attribute names and values repeat a lot, so only one copy of each is
+    kept. Besides saving memory, this makes the dictionary lookups on such strings
+    faster, since equal strings are also identical.
+    The strings are only pooled inside a scope (see scope), the test markup is not"""
+    table = {
+
+        }
+
+    # number of the open scopes
+    depth = 0
+
+    # usage statistics
+    requests = 0
+    hits = 0
+    saved_bytes = 0
+
+    @classmethod
+    def get(cls, string):
+        """Returns the pooled string equal to the given one, or the string itself outside
+        of a scope"""
+        if cls.depth == 0:
+            return string
+        cls.requests += 1
+        res = cls.table.setdefault(string, string)
+        if res is not string:
+            cls.hits += 1
+            cls.saved_bytes += sys.getsizeof(string)
+        return res
+
+    @classmethod
+    def getStats(cls):
+        """Returns a dictionary with the pool memory statistics"""
+        return {
+            'strings' : len(cls.table),
+            'requests' : cls.requests,
+            'hits' : cls.hits,
+            'pool_bytes' : sum(sys.getsizeof(x) for x in cls.table),
+            'saved_bytes' : cls.saved_bytes
+            }
+
+    @classmethod
+    @contextlib.contextmanager
+    def scope(cls):
+        """Context in which the strings are pooled, e.g. while the standard markup is
+        loaded. The pool is emptied on leaving the outermost scope: the loaded documents
+        still share the strings, but the pool does not keep them alive"""
+        cls.depth += 1
+        try:
+            yield
+        finally:
+            cls.depth -= 1
+            if cls.depth == 0:
+                cls.table.clear()
+
+    @classmethod
+    def clear(cls):
+        """Remove all the strings from the pool and reset the statistics"""
+        cls.table.clear()
+        cls.requests = 0
+        cls.hits = 0
+        cls.saved_bytes = 0
 
-    return res
 
 class DistCache:
     """Cache for Levenstein distance calculations"""
@@ -9,6 +9,9 @@ class Config:
     TOKEN_LINE_LENGTH = 4
     SPAN_FILE_SEPARATOR = '  # '
     COMMENT_SEPARATOR = '#'
+    # version of the evaluation logic, it is a part of the result cache keys
+    # (see dialent.common.cache), so it must be changed whenever the results may change
+    EVALUATOR_VERSION = '1'
     STANDARD_TYPES = {
         'Person' : 'per',
         'Organization' : 'org',
@@ -0,0 +1,342 @@
+# This module implements the distributed evaluation. Worker processes, possibly on
+# several hosts, load the standard markup once and evaluate single documents on request.
+# The coordinator reads a submission, splits its documents between the workers, retries
+# the documents that failed on another worker, and merges the per-document metrics and
+# reports. Several workers on localhost can stand in for the hosts (see
+# startLocalWorkers).
+#
+# The coordinator connects to each worker over TCP. The messages are lines of utf-8
+# JSON:
+#
+#   worker  = { 'status' : 'ready', 'documents' : [<standard document name>, ...] }
+#   request = { 'name' : <document name>, 'modes' : [<mode>, ...],
+#               'test' : <base64 contents of the response file>,
+#               'reports' : <True if the reports are needed> }
+#   reply   = { 'status' : 'ok', 'results' : [{ 'metrics' : { <tag> : [tp_std, tp_test,
+#                                                                   n_std, n_test] },
+#                                                'report_name' : <report file name>,
+#                                                'report' : <report text or null> }] }
+#                                                             (one per requested mode)
+#             { 'status' : 'skipped' }     (the document is not evaluated in the track)
+#             { 'status' : 'error', 'message' : <text> }
+#
+# Modes are named as in dialent.leaderboard: t1, t1-l, t2, t2-m, t3, t3-m
+
+import os
+import sys
+import json
+import queue
+import base64
+import socket
+import threading
+import subprocess
+
+from dialent.leaderboard import Leaderboard
+from dialent.common.metrics import Metrics
+from dialent.common.source import MemorySource, openSource
+from dialent.common.util import freezeObjects
+
+from dialent.task1.test import Test as Test1
+from dialent.task2.test import Test as Test2
+from dialent.task3.test import Test as Test3
+
+from dialent.task2.util import loadAllStandard
+
+#########################################################################################
+
+default_port = 8017
+
+def trackOf(modes):
+    """Returns the track of the given modes, they must all belong to the same track"""
+    unknown = [x for x in modes if not x in Leaderboard.modes]
+    if len(unknown) > 0:
+        raise Exception('Unknown modes: {}'.format(', '.join(unknown)))
+
+    tracks = set([int(x[1]) for x in modes])
+    if len(tracks) != 1:
+        raise Exception('All the modes must belong to the same track: {}'.format(
+            ', '.join(modes)))
+    return tracks.pop()
+
+def startLocalWorkers(std_path, count):
+    """Start count worker processes on localhost, each listening on a free port.
+    Returns a tuple (list of the processes, list of their (host, port) addresses)"""
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                          'eval_worker.py')
+    processes = [subprocess.Popen([sys.executable, script, '-s', std_path, '-p', '0'],
+                                  stdout=subprocess.PIPE, universal_newlines=True)
+                 for i in range(count)]
+
+    addresses = []
+    for p in processes:
+        # the worker announces its port once the standard is loaded
+        line = p.stdout.readline()
+        while len(line) > 0 and not line.startswith('Listening on '):
+            line = p.stdout.readline()
+        if len(line) == 0:
+            raise Exception('A local worker failed to start')
+        host, port = line.split()[-1].rsplit(':', 1)
+        addresses.append( (host, int(port)) )
+        # the rest of the worker output is passed through
+        threading.Thread(target=passOutput, args=(p.stdout,), daemon=True).start()
+
+    return processes, addresses
+
+def passOutput(f):
+    """Print the lines read from f until it is closed"""
+    for line in f:
+        print(line, end='', flush=True)
+
+#########################################################################################
+
+class Worker:
+    """Evaluation worker. Loads the standard markup once and evaluates the documents the
+    coordinator sends, one connection at a time"""
+
+    # test markup class of each track
+    tests = { 1 : Test1, 2 : Test2, 3 : Test3 }
+
+    def __init__(self, std_path):
+        """Load the standard markup from std_path"""
+        self.std = dict((x.name, x) for x in loadAllStandard(std_path))
+        # evaluators of each requested list of modes, reused between the documents
+        self.evaluators = {}
+        freezeObjects()
+
+    def serve(self, host='localhost', port=default_port):
+        """Accept the coordinator connections forever. Port 0 selects a free port"""
+        with socket.create_server((host, port)) as server:
+            host, port = server.getsockname()[:2]
+            print('Listening on {}:{}'.format(host, port), flush=True)
+            while True:
+                conn, address = server.accept()
+                with conn:
+                    try:
+                        self._handleConnection(conn)
+                    except (ConnectionError, OSError) as e:
+                        print('Connection from {} lost: {}'.format(address[0], e),
+                              flush=True)
+
+    def evaluateRequest(self, request):
+        """Evaluate a single document request. Returns the reply"""
+        name = request['name']
+        modes = request['modes']
+        if not name in self.std:
+            raise Exception('Unknown standard document: {}'.format(name))
+
+        track = trackOf(modes)
+        files = { name + '.task{}'.format(track) : base64.b64decode(request['test']) }
+        test = Worker.tests[track](name, MemorySource(files))
+        key = tuple(modes)
+        if not key in self.evaluators:
+            self.evaluators[key] = [Leaderboard.createEvaluator(x) for x in modes]
+        evaluators = self.evaluators[key]
+
+        res = Leaderboard.evaluators[track].evaluateDocumentModes(
+            evaluators, self.std[name], test, request.get('reports', False))
+        if res == None:
+            return { 'status' : 'skipped' }
+
+        results = []
+        for e, (metrics, report) in zip(evaluators, res):
+            results.append({
+                'metrics' : dict((tag, [m.tp_std, m.tp_test, m.n_std, m.n_test])
+                                 for tag, m in metrics.items()),
+                'report_name' : e.reportName(name, metrics),
+                'report' : report
+            })
+        return { 'status' : 'ok', 'results' : results }
+
+    def _handleConnection(self, conn):
+        """Serve the requests of a single coordinator until it disconnects"""
+        f = conn.makefile('rwb')
+        self._send(f, { 'status' : 'ready', 'documents' : sorted(self.std.keys()) })
+        for line in f:
+            try:
+                reply = self.evaluateRequest(json.loads(line.decode('utf-8')))
+            except Exception as e:
+                reply = { 'status' : 'error', 'message' : str(e) }
+            self._send(f, reply)
+
+    def _send(self, f, message):
+        """Send a single message line"""
+        f.write((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+        f.flush()
+
+#########################################################################################
+
+class Coordinator:
+    """Splits the documents of a submission between the workers and merges the results"""
+
+    def __init__(self, addresses, retries=2, timeout=600):
+        """Create the coordinator of the workers at the given (host, port) addresses.
+        A document is sent to another worker at most retries times after a failure.
+        A worker that does not reply within timeout seconds is considered failed"""
+        self.addresses = addresses
+        self.retries = retries
+        self.timeout = timeout
+
+    def evaluate(self, test_path, modes, output_path=''):
+        """Evaluate the submission from test_path in several modes of the same track.
+        If output_path is provided, reports are written there (to a subfolder named
+        by the mode if there are several modes). Returns a dictionary
+        {mode : metrics dictionary}"""
+        track = trackOf(modes)
+        source = openSource(test_path)
+        ext = '.task{}'.format(track)
+
+        connections = self._connect()
+        names = set(source.names(ext))
+        std_names = set(connections[0][2])
+        diff = names.symmetric_difference(std_names)
+        if len(diff) > 0:
+            print('Warning: missing files :\n  {}'.format('\n  '.join(diff)))
+
+        tasks = queue.Queue()
+        for name in sorted(names.intersection(std_names), key=lambda x: int(x[5:])):
+            tasks.put( (name, 0, frozenset()) )
+
+        # {document name : list of the results of each mode}, None if skipped
+        self.documents = {}
+        self.failed = []
+        self.lock = threading.Lock()
+        job = (source, ext, modes, len(output_path) > 0)
+        while not tasks.empty() and len(connections) > 0:
+            threads = [threading.Thread(target=self._runWorker, args=(x, tasks, job))
+                       for x in connections]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            connections = [x for x in connections if x[1] != None]
+            self._dropExcluded(tasks, [x[0] for x in connections])
+
+        for address, f, documents in connections:
+            f.close()
+
+        while not tasks.empty():
+            self.failed.append(tasks.get()[0])
+        if len(self.failed) > 0:
+            raise Exception('Failed to evaluate: {}'.format(
+                ', '.join(sorted(self.failed))))
+
+        # the documents are added in the same order as in a single run, so that even the
+        # floating point totals are the same
+        res = {}
+        names = sorted(self.documents.keys(), key=lambda x: int(x[5:]))
+        for i, mode in enumerate(modes):
+            out_dir = output_path
+            if len(output_path) > 0 and len(modes) > 1:
+                out_dir = os.path.join(output_path, mode)
+            if len(out_dir) > 0:
+                os.makedirs(out_dir, exist_ok=True)
+
+            metrics = {}
+            for name in names:
+                if self.documents[name] == None:
+                    continue
+                result = self.documents[name][i]
+                for tag, values in result['metrics'].items():
+                    metrics.setdefault(tag, Metrics()).add(Metrics.create(*values))
+                if len(out_dir) > 0 and result['report'] != None:
+                    path = os.path.join(out_dir, result['report_name'])
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(result['report'])
+            res[mode] = metrics
+
+        return res
+
+    def _connect(self):
+        """Connect to all the available workers. Returns a list of (address, connection
+        file, standard document names) tuples"""
+        connections = []
+        for address in self.addresses:
+            try:
+                conn = socket.create_connection(address, self.timeout)
+                f = conn.makefile('rwb')
+                conn.close()
+                ready = json.loads(f.readline().decode('utf-8'))
+            except (OSError, ValueError) as e:
+                print('WARNING: worker {}:{} is not available: {}'.format(
+                    address[0], address[1], e))
+                continue
+            connections.append( [address, f, ready['documents']] )
+
+        if len(connections) == 0:
+            raise Exception('No workers available')
+        if any(set(x[2]) != set(connections[0][2]) for x in connections):
+            raise Exception('The workers have different standard markup loaded')
+        return connections
+
+    def _runWorker(self, connection, tasks, job):
+        """Send the queued documents to a single worker until the queue is empty or the
+        worker fails. The connection file is set to None if the worker fails. The
+        documents that already failed on the worker are left to the others, they are
+        queued again when the worker is done"""
+        address, f, documents = connection
+        source, ext, modes, with_reports = job
+        skipped = []
+        try:
+            while True:
+                try:
+                    name, attempts, excluded = tasks.get_nowait()
+                except queue.Empty:
+                    return
+
+                if address in excluded:
+                    skipped.append( (name, attempts, excluded) )
+                    continue
+
+                request = {
+                    'name' : name,
+                    'modes' : modes,
+                    'test' : base64.b64encode(source.read(name, ext)).decode('ascii'),
+                    'reports' : with_reports
+                }
+                try:
+                    f.write((json.dumps(request) + '\n').encode('utf-8'))
+                    f.flush()
+                    line = f.readline()
+                    if len(line) == 0:
+                        raise ConnectionError('connection closed')
+                    reply = json.loads(line.decode('utf-8'))
+                except (OSError, ValueError) as e:
+                    print('WARNING: worker {}:{} failed: {}'.format(
+                        address[0], address[1], e))
+                    self._retry(tasks, name, attempts, excluded)
+                    f.close()
+                    connection[1] = None
+                    return
+
+                if reply['status'] == 'error':
+                    print('WARNING: {} failed on worker {}:{}: {}'.format(
+                        name, address[0], address[1], reply['message']))
+                    self._retry(tasks, name, attempts, excluded.union([address]))
+                    continue
+
+                with self.lock:
+                    self.documents[name] = reply.get('results', None)
+        finally:
+            for task in skipped:
+                tasks.put(task)
+
+    def _retry(self, tasks, name, attempts, excluded):
+        """Queue the failed document again, unless it is out of attempts. excluded is
+        the set of the addresses of the workers it must not be sent to"""
+        if attempts < self.retries:
+            tasks.put( (name, attempts + 1, excluded) )
+        else:
+            with self.lock:
+                self.failed.append(name)
+
+    def _dropExcluded(self, tasks, addresses):
+        """Remove the queued documents that none of the workers with the given addresses
+        can evaluate, they are failed"""
+        remaining = []
+        while not tasks.empty():
+            remaining.append(tasks.get())
+        for name, attempts, excluded in remaining:
+            if all(x in excluded for x in addresses):
+                self.failed.append(name)
+            else:
+                tasks.put( (name, attempts, excluded) )
@@ -0,0 +1,239 @@
+# This module evaluates a batch of submissions against a single standard markup
+
+import os
+import glob
+
+from dialent.common.metrics import Metrics
+from dialent.common.reports import openReports
+from dialent.common.source import openSource
+from dialent.common.util import frozenObjects
+
+from dialent.task1.eval import Evaluator as Evaluator1
+from dialent.task2.eval import Evaluator as Evaluator2
+from dialent.task3.eval import Evaluator as Evaluator3
+
+from dialent.task1.util import loadAllTest as loadAllTest1
+from dialent.task2.util import loadAllTest as loadAllTest2
+from dialent.task3.util import loadAllTest as loadAllTest3
+
+from dialent.task2.util import loadAllStandard
+
+#########################################################################################
+
+class Leaderboard:
+    """Evaluates many submissions in all modes against the standard markup that is loaded
+    only once. Reports are written in the layout of the 'reports' folder:
+    <output_dir>/<run>.<set>.<mode>, or to archives <output_dir>/<run>.<set>.<mode>.zip
+    (.tar.gz) if the archive format is set"""
+
+    # evaluation modes in the order they are run, named as the report folders
+    modes = ['t1', 't1-l', 't2', 't2-m', 't3', 't3-m']
+
+    # formats of the report archives
+    report_formats = ['zip', 'tar.gz']
+
+    # evaluator class and test loading function for each track
+    evaluators = { 1 : Evaluator1, 2 : Evaluator2, 3 : Evaluator3 }
+    test_loaders = { 1 : loadAllTest1, 2 : loadAllTest2, 3 : loadAllTest3 }
+
+    def __init__(self, std_path, set_name=None, modes=None, cache=None,
+                 is_incremental=False, report_format=None, only_imperfect=False,
+                 metrics_sink=None):
+        """Load the standard markup from std_path. set_name is used in the report folder
+        names, by default it is the name of the standard directory without 'set'.
+        modes is a list of the evaluated modes, all of them by default.
+        cache is an optional dialent.common.cache.ResultCache object.
+        If is_incremental is True, the submissions and the results of every document
+        are kept, so that the edited standard documents can be rescored with
+        updateDocument.
+        report_format is the format of the report archives of every run and mode (one of
+        report_formats), the reports are written to folders by default. If
+        only_imperfect is True, the reports are only written for the documents with
+        imperfect results. metrics_sink is an optional dialent.common.sink.MetricsSink
+        the results of every document of every run are written to"""
+        if set_name == None:
+            set_name = os.path.basename(os.path.normpath(std_path)).split('.')[0]
+            if set_name.endswith('set') and len(set_name) > 3:
+                set_name = set_name[:-3]
+
+        self.set_name = set_name
+        self.modes = [x for x in Leaderboard.modes if modes == None or x in modes]
+        self.cache = cache
+        if report_format != None and not report_format in Leaderboard.report_formats:
+            raise Exception('Unknown report format: {}'.format(report_format))
+        self.report_format = report_format
+        self.only_imperfect = only_imperfect
+        self.metrics_sink = metrics_sink
+        self.std_path = std_path
+        self.std = loadAllStandard(std_path)
+
+        # list of (run name, mode, metrics dictionary) tuples
+        self.results = []
+
+        # incremental mode data:
+        #   tests - {(run name, track) : {document name : test markup}}
+        #   documents - {(run name, mode) : {document name : metrics dictionary}}
+        #   totals - {(run name, mode) : metrics dictionary}
+        #   report_paths - {(run name, mode) : report folder}
+        self.is_incremental = is_incremental
+        self.tests = {}
+        self.documents = {}
+        self.totals = {}
+        self.report_paths = {}
+
+    def evaluate(self, test_path, output_path='', run_name=None, modes=None):
+        """Evaluate the submission from test_path in all modes of the tracks it has
+        responses for. test_path can also be a collection object, then run_name must be
+        provided. If output_path is provided, reports are written there. modes can limit
+        the evaluated modes further. Returns a dictionary {mode : metrics dictionary}"""
+        if run_name == None:
+            run_name = os.path.basename(os.path.normpath(test_path)).split('.')[0]
+
+        source = openSource(test_path)
+        if self.metrics_sink != None:
+            self.metrics_sink.run = run_name
+        res = {}
+        for track in sorted(Leaderboard.evaluators.keys()):
+            track_modes = [x for x in self.modes if int(x[1]) == track
+                           and (modes == None or x in modes)]
+            if len(track_modes) == 0 or len(source.names('.task{}'.format(track))) == 0:
+                continue
+
+            print('Evaluating {} ({})'.format(run_name, ', '.join(track_modes)),
+                  flush=True)
+            out_dirs = ['' for x in track_modes]
+            if len(output_path) > 0:
+                out_dirs = [self.reportPath(output_path, run_name, x) for x in track_modes]
+
+            # all modes of a track are evaluated in a single pass
+            test = Leaderboard.test_loaders[track](source)
+            documents = [{} for x in track_modes] if self.is_incremental else None
+            with frozenObjects():
+                results = Leaderboard.evaluators[track].evaluateModes(
+                    [self.makeEvaluator(x) for x in track_modes],
+                    self.std, test, out_dirs, is_silent=True, documents=documents)
+
+            for mode, metrics in zip(track_modes, results):
+                res[mode] = metrics
+
+            if self.is_incremental:
+                self.tests[(run_name, track)] = dict((x.name, x) for x in test)
+                for mode, metrics, by_name, out_dir in zip(
+                        track_modes, results, documents, out_dirs):
+                    self.documents[(run_name, mode)] = by_name
+                    self.totals[(run_name, mode)] = metrics
+                    self.report_paths[(run_name, mode)] = out_dir
+
+        return res
+
+    def evaluateAll(self, test_paths, output_path=''):
+        """Evaluate all the given submissions and add the results to the table.
+        Paths may contain wildcards"""
+        for pattern in test_paths:
+            paths = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+            for path in paths:
+                run_name = os.path.basename(os.path.normpath(path)).split('.')[0]
+                res = self.evaluate(path, output_path, run_name)
+                for mode in self.modes:
+                    if mode in res:
+                        self.results.append((run_name, mode, res[mode]))
+
+    def updateDocument(self, name, layer, std_path=None):
+        """Reload the edited layer of the standard document (see Standard.reload) from
+        std_path, by default the path the standard was loaded from. Then evaluate the
+        document again in every submission, and update the totals with the difference
+        between its new and old results. Only the incremental mode supports this.
+        Returns a dictionary {(run name, mode) : metrics dictionary} of the totals"""
+        if not self.is_incremental:
+            raise Exception('Documents can only be updated in the incremental mode')
+
+        std = [x for x in self.std if x.name == name]
+        if len(std) == 0:
+            raise Exception('Unknown standard document: {}'.format(name))
+        std[0].reload(layer, std_path if std_path != None else self.std_path)
+
+        for (run_name, track), tests in sorted(self.tests.items()):
+            if not name in tests:
+                continue
+
+            track_modes = [x for x in self.modes if (run_name, x) in self.totals
+                           and int(x[1]) == track]
+            out_dirs = [self.report_paths[(run_name, x)] for x in track_modes]
+            for out_dir in out_dirs:
+                # the report of an imperfect document has a different name
+                if len(out_dir) > 0 and os.path.exists(out_dir):
+                    with openReports(out_dir) as output:
+                        output.remove(name, [name + '.report.txt',
+                                             '_' + name + '.report.txt'])
+
+            documents = [{} for x in track_modes]
+            if self.metrics_sink != None:
+                self.metrics_sink.run = run_name
+            Leaderboard.evaluators[track].evaluateModes(
+                [self.makeEvaluator(x) for x in track_modes],
+                std, [tests[name]], out_dirs, is_silent=True, documents=documents)
+
+            # the documents with no .coref/.facts layer are not evaluated at all
+            for mode, by_name in zip(track_modes, documents):
+                old = self.documents[(run_name, mode)].pop(name, None)
+                new = by_name.get(name)
+                for tag, metrics in self.totals[(run_name, mode)].items():
+                    if old != None:
+                        metrics.subtract(old[tag])
+                    if new != None:
+                        metrics.add(new[tag])
+                if new != None:
+                    self.documents[(run_name, mode)][name] = new
+
+        return self.totals
+
+    def buildTable(self):
+        """Build the combined table of the overall metrics of every evaluation"""
+        res = '{:24} {:6} '.format('Run', 'Mode') + Metrics.header()
+        for run_name, mode, metrics in self.results:
+            res += '\n{:24} {:6} '.format(run_name, mode) + metrics['overall'].toLine()
+
+        return res
+
+    def printTable(self, output_path=''):
+        """Print the combined table and save it to the output folder, if one is
+        provided"""
+        table = self.buildTable()
+        print(table)
+        if len(output_path) == 0:
+            return
+
+        os.makedirs(output_path, exist_ok=True)
+        filename = os.path.join(output_path, 'leaderboard.{}.txt'.format(self.set_name))
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(table + '\n')
+
+    def reportPath(self, output_path, run_name, mode):
+        """Returns the path of the report folder or archive of the run in the mode"""
+        path = os.path.join(output_path, '.'.join([run_name, self.set_name, mode]))
+        if self.report_format != None:
+            path += '.' + self.report_format
+        return path
+
+    def makeEvaluator(self, mode):
+        """Create an evaluator for the given mode with the options of the leaderboard"""
+        return Leaderboard.createEvaluator(mode, self.cache, self.only_imperfect,
+                                           self.metrics_sink)
+
+    @classmethod
+    def createEvaluator(cls, mode, cache=None, only_imperfect=False, metrics_sink=None):
+        """Create an evaluator for the given mode"""
+        if mode == 't1':
+            return Evaluator1(True, cache, only_imperfect, False, metrics_sink)
+        elif mode == 't1-l':
+            return Evaluator1(False, cache, only_imperfect, False, metrics_sink)
+        elif mode == 't2':
+            return Evaluator2('regular', cache, only_imperfect, False, metrics_sink)
+        elif mode == 't2-m':
+            return Evaluator2('simple', cache, only_imperfect, False, metrics_sink)
+        elif mode == 't3':
+            return Evaluator3(False, cache, only_imperfect, False, metrics_sink)
+        elif mode == 't3-m':
+            return Evaluator3(True, cache, only_imperfect, False, metrics_sink)
+        else:
+            raise Exception('Unknown evaluation mode: {}'.format(mode))
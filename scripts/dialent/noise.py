@@ -0,0 +1,279 @@
+# This module generates noisy responses: the perfect responses of the track response
+# generators (dialent.task1/2/3.util.ResponseGenerator) with random errors of the kinds
+# real systems make. Every kind of error has its rate, the share of the response objects
+# it is applied to:
+#
+#   drop      - a mention (track 1), entity (track 2) or fact (track 3) is missed
+#   spurious  - an extra object is added, built out of random tokens (tracks 1, 2) or
+#               of the arguments of other facts (track 3)
+#   shift     - a mention boundary is moved by one token (track 1)
+#   tag       - a mention or an entity gets another type (tracks 1, 2)
+#   typo      - an attribute or argument value gets as many typos as the fuzzy comparison
+#               (see dialent.common.util.compareStrings) still forgives (tracks 2, 3)
+#   far_typo  - a value gets more typos than that, so it no longer matches (tracks 2, 3)
+#   split     - the arguments of a fact are split between two facts (track 3)
+#   merge     - a fact is merged with the next fact of the same type (track 3)
+#
+# The errors of a document only depend on the seed and the document name, so a response
+# is reproduced exactly regardless of the order the documents are processed in.
+# generateVariants writes many responses with different seeds in parallel.
+
+import os
+import bisect
+import random
+import concurrent.futures
+
+from dialent.common.util import dist, DistCache
+
+from dialent.task1.util import ResponseGenerator as ResponseGenerator1
+from dialent.task2.util import ResponseGenerator as ResponseGenerator2
+from dialent.task3.util import ResponseGenerator as ResponseGenerator3
+
+from dialent.task2.util import loadAllStandard
+
+#########################################################################################
+
+class NoisyResponseGenerator:
+    """Generates responses with random errors for the standard documents"""
+
+    # rates used unless set explicitly
+    default_rates = {
+        'drop' : 0.05,
+        'spurious' : 0.03,
+        'shift' : 0.05,
+        'tag' : 0.03,
+        'typo' : 0.05,
+        'far_typo' : 0.03,
+        'split' : 0.03,
+        'merge' : 0.03
+    }
+
+    tags = ['per', 'org', 'loc', 'locorg']
+
+    # letters the typos are made of
+    letters = 'абвгдежзийклмнопрстуфхцчшщыэюя'
+
+    def __init__(self, rates=None, seed=1, tracks=(1, 2, 3)):
+        """Create the generator. rates is a dictionary {error kind : rate}, the missing
+        kinds get the default rates"""
+        rates = rates if rates != None else {}
+        unknown = [x for x in rates if not x in NoisyResponseGenerator.default_rates]
+        if len(unknown) > 0:
+            raise Exception('Unknown error kinds: {}'.format(', '.join(unknown)))
+
+        self.rates = dict(NoisyResponseGenerator.default_rates)
+        self.rates.update(rates)
+        self.seed = seed
+        self.tracks = tracks
+        self.generators = {
+            1 : ResponseGenerator1().buildDoc,
+            2 : ResponseGenerator2().buildDocumentResponse,
+            3 : ResponseGenerator3().buildDoc
+        }
+        self.perturbations = {
+            1 : self.perturbMentions,
+            2 : self.perturbEntities,
+            3 : self.perturbFacts
+        }
+
+    def generate(self, std, out_path):
+        """Write the responses for the loaded standard documents std to out_path"""
+        os.makedirs(out_path, exist_ok=True)
+        for s in std:
+            for track, text in self.generateDocument(s).items():
+                filename = os.path.join(out_path, s.name + '.task{}'.format(track))
+                with open(filename, 'w', encoding='utf-8') as f:
+                    f.write(text)
+
+    def generateDocument(self, std):
+        """Returns a dictionary {track : response text} for the standard document"""
+        res = {}
+        for track in self.tracks:
+            if track == 2 and not std.has_coref or track == 3 and not std.has_facts:
+                continue
+            rng = random.Random('{}:{}:{}'.format(self.seed, track, std.name))
+            text = self.generators[track](std)
+            res[track] = self.perturbations[track](std, text, rng)
+        return res
+
+    def perturbMentions(self, std, text, rng):
+        """Returns the track 1 response text with the errors"""
+        tokens = [x for x in std.tokens if not x.isPunctuation()]
+        starts = [x.start for x in tokens]
+        ends = [x.end for x in tokens]
+
+        res = []
+        for line in text.split('\n'):
+            if len(line.strip()) == 0:
+                continue
+            tag, start, length = line.split()
+            start, end = int(start), int(start) + int(length) - 1
+
+            if rng.random() < self.rates['drop']:
+                continue
+            if rng.random() < self.rates['shift']:
+                start, end = self._shift(rng, starts, ends, start, end)
+            if rng.random() < self.rates['tag']:
+                tag = rng.choice([x for x in NoisyResponseGenerator.tags if x != tag])
+            res.append('{} {} {}'.format(tag, start, end - start + 1))
+
+            if rng.random() < self.rates['spurious'] and len(tokens) > 0:
+                first = rng.randrange(len(tokens))
+                last = min(first + rng.randint(0, 2), len(tokens) - 1)
+                res.append('{} {} {}'.format(rng.choice(NoisyResponseGenerator.tags),
+                    tokens[first].start, tokens[last].end - tokens[first].start + 1))
+
+        return '\n'.join(res) + '\n'
+
+    def perturbEntities(self, std, text, rng):
+        """Returns the track 2 response text with the errors"""
+        words = [x.text for x in std.tokens if x.isLetter()]
+
+        res = []
+        for tag, values in self._parseBlocks(text):
+            if rng.random() < self.rates['drop']:
+                continue
+            if rng.random() < self.rates['tag']:
+                tag = rng.choice([x for x in NoisyResponseGenerator.tags if x != tag])
+            res.append( (tag, self._addTypos(rng, values)) )
+
+            if rng.random() < self.rates['spurious'] and len(words) > 0:
+                tag = rng.choice(NoisyResponseGenerator.tags)
+                name = 'lastname' if tag == 'per' else 'name'
+                res.append( (tag, [(name, rng.choice(words))]) )
+
+        return self._buildBlocks(res)
+
+    def perturbFacts(self, std, text, rng):
+        """Returns the track 3 response text with the errors"""
+        facts = self._parseBlocks(text)
+        all_values = sum((values for tag, values in facts), [])
+
+        res = []
+        i = 0
+        while i < len(facts):
+            tag, values = facts[i]
+            i += 1
+            if rng.random() < self.rates['drop']:
+                continue
+            values = self._addTypos(rng, values)
+
+            if rng.random() < self.rates['merge']:
+                k = next((k for k in range(i, len(facts)) if facts[k][0] == tag), None)
+                if k != None:
+                    values += [x for x in facts.pop(k)[1] if not x in values]
+
+            if len(values) > 1 and rng.random() < self.rates['split']:
+                values = list(values)
+                rng.shuffle(values)
+                cut = rng.randint(1, len(values) - 1)
+                res.append( (tag, values[:cut]) )
+                values = values[cut:]
+            res.append( (tag, values) )
+
+            if rng.random() < self.rates['spurious']:
+                res.append( (tag, rng.sample(all_values, min(2, len(all_values)))) )
+
+        return self._buildBlocks(res)
+
+    def _shift(self, rng, starts, ends, start, end):
+        """Move one of the boundaries of the mention [start, end] by a token"""
+        first = bisect.bisect_left(starts, start)
+        last = bisect.bisect_left(ends, end)
+        if first >= len(starts) or last >= len(ends) or starts[first] != start:
+            return start, end
+
+        options = []
+        if first > 0:
+            options.append( (first - 1, last) )
+        if first < last:
+            options.append( (first + 1, last) )
+            options.append( (first, last - 1) )
+        if last + 1 < len(ends):
+            options.append( (first, last + 1) )
+        if len(options) == 0:
+            return start, end
+        first, last = rng.choice(options)
+        return starts[first], ends[last]
+
+    def _addTypos(self, rng, values):
+        """Returns the list of (name, value) pairs, some of them with typos"""
+        res = []
+        for name, value in values:
+            threshold = DistCache.getThreshold(len(value))
+            r = rng.random()
+            if r < self.rates['typo'] and threshold > 0:
+                value = self._misspell(rng, value, threshold, 0)
+            elif r < self.rates['typo'] + self.rates['far_typo']:
+                value = self._misspell(rng, value, threshold + 1, threshold + 1)
+            res.append( (name, value) )
+        return res
+
+    def _misspell(self, rng, value, n_typos, min_dist):
+        """Replace at least n_typos letters of the value, and more of them until the
+        distance to the original value is at least min_dist (or the letters run out)"""
+        positions = [i for i, c in enumerate(value) if c.isalpha()]
+        rng.shuffle(positions)
+        res = list(value)
+        for k, i in enumerate(positions):
+            res[i] = rng.choice(
+                [x for x in NoisyResponseGenerator.letters if x != res[i]])
+            if k + 1 >= n_typos and dist(''.join(res), value) >= min_dist:
+                break
+        return ''.join(res)
+
+    def _parseBlocks(self, text):
+        """Parse a track 2 or track 3 response into a list of (type, [(name, value)]).
+        The values are sorted, since the generators list them in the order of sets, and
+        it would make the errors depend on the hash seed"""
+        res = []
+        for block in text.split('\n\n'):
+            lines = [x.strip() for x in block.split('\n') if len(x.strip()) > 0]
+            if len(lines) == 0:
+                continue
+            values = sorted(tuple(x.strip() for x in line.split(':', 1))
+                            for line in lines[1:])
+            res.append( (lines[0], values) )
+        return res
+
+    def _buildBlocks(self, blocks):
+        """Build the response text out of (type, [(name, value)]) blocks"""
+        return '\n'.join('\n'.join([tag] + ['{} : {}'.format(*x) for x in values]) + '\n'
+                         for tag, values in blocks)
+
+#########################################################################################
+# Parallel generation
+
+# standard documents loaded by a worker process
+_std = None
+
+def _loadStandard(std_path):
+    """Load the standard markup in a worker process"""
+    global _std
+    _std = loadAllStandard(std_path)
+
+def _generateVariant(out_path, rates, seed, tracks):
+    """Write a single variant in a worker process. Returns out_path"""
+    NoisyResponseGenerator(rates, seed, tracks).generate(_std, out_path)
+    return out_path
+
+def variantName(index):
+    """Returns the name of the folder of the variant with the given index"""
+    return 'run{:03d}'.format(index)
+
+def generateVariants(std_path, out_path, n_variants, rates=None, seed=1,
+                     tracks=(1, 2, 3), workers=1):
+    """Write n_variants noisy responses to the subfolders of out_path (see variantName).
+    The variant with index i uses the seed seed + i. The variants are generated by the
+    given number of worker processes, each of them loads the standard markup once.
+    Returns the list of the variant folders"""
+    jobs = [(os.path.join(out_path, variantName(i)), rates, seed + i, tracks)
+            for i in range(n_variants)]
+    if workers <= 1:
+        _loadStandard(std_path)
+        return [_generateVariant(*job) for job in jobs]
+
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_loadStandard, initargs=(std_path,)) as pool:
+        futures = [pool.submit(_generateVariant, *job) for job in jobs]
+        return [x.result() for x in futures]
@@ -3,8 +3,11 @@
 # and an argument builder for the standard markup
 
 import os
+import weakref
 
 from dialent.common.util import compareStrings
+from dialent.common.util import normalize
+from dialent.common.util import StringPool
 
 #########################################################################################
 
@@ -16,6 +19,8 @@ jobs_file_path = os.path.join(
 class Argument:
     """Fact argument"""
 
+    __slots__ = ['name', 'is_special', 'values', '_fact', '__weakref__']
+
     # names of the special cyrillic attributes
     special_names = ['сложность', 'модальность', 'фаза']
 
@@ -28,13 +33,23 @@ class Argument:
         if Argument.position_dict == None:
             Argument.loadPositionDict()
 
-        self.name = name.strip(' \n\r\t').lower()
+        self.name = StringPool.get(name.strip(' \n\r\t').lower())
         if self.name == 'job':
             self.name = 'position'
         self.is_special = self.name in Argument.special_names
         self.values = []
         self.fact = None
 
+    @property
+    def fact(self):
+        """Fact this argument belongs to. Only a weak reference is stored, so that the
+        fact and its arguments do not form a reference cycle"""
+        return self._fact() if self._fact != None else None
+
+    @fact.setter
+    def fact(self, fact):
+        self._fact = weakref.ref(fact) if fact != None else None
+
     def toTest(self):
         if(len(self.values) == 0):
             print(self.fact)
@@ -90,17 +105,28 @@ class Argument:
 
         return arg
 
+    @classmethod
+    def fromPrediction(cls, name, value):
+        """Create a test argument with the given name and value, normalized the same
+        way as in the test files"""
+        arg = cls(normalize(name))
+        arg.values.append(StringValue(normalize(value)))
+
+        return arg
+
 
 #########################################################################################
 
 class EntityValue:
     """Fact argument that is an entity"""
 
+    __slots__ = ['entity', 'descr', 'values']
+
     def __init__(self, full_id, descr, entity_dict):
         """Initialize the object"""
         assert(full_id.startswith('obj'))
         self.entity = entity_dict[full_id[3:]]
-        self.descr = descr.strip(' \n\r\t').lower()
+        self.descr = StringPool.get(descr.strip(' \n\r\t').lower())
         self.values = set([self.descr])
 
         # special logic for different types of entities
@@ -200,10 +226,13 @@ class EntityValue:
 class SpanValue:
     """Fact argument that is a span"""
 
+    __slots__ = ['_owner', 'span', 'values', 'descr']
+
     def __init__(self, owner, full_id, descr, span_dict):
         """Initialize the object"""
         assert(full_id.startswith('span'))
-        self.owner = owner
+        # the owner argument refers to this value, so a weak reference is used
+        self._owner = weakref.ref(owner)
         self.span = span_dict[full_id[4:]]
         self.values = [self.span.text]
         self.descr = self.span.text
@@ -216,7 +245,7 @@ class SpanValue:
 
     def finalize(self):
         """Finalize the value"""
-        if self.owner.name == 'position':
+        if self._owner().name == 'position':
             if(self.values[0] in Argument.position_dict):
                 self.values.append(Argument.position_dict[self.values[0]])
         self.values = [x.lower().strip(' \n\r\t').replace('ё', 'е') for x in self.values]
@@ -232,9 +261,11 @@ class SpanValue:
 class StringValue:
     """String value for special cases"""
 
+    __slots__ = ['value', 'descr']
+
     def __init__(self, value):
         """Initialie the object"""
-        self.value = value.strip(' \n\r\t').lower()
+        self.value = StringPool.get(value.strip(' \n\r\t').lower())
         self.descr = self.value
 
     def equals(self, other):
@@ -243,7 +274,8 @@ class StringValue:
 
     def finalize(self):
         """Finalize the value"""
-        self.value = self.value.lower().strip(' \n\r\t').replace('ё', 'е')
+        self.value = StringPool.get(
+            self.value.lower().strip(' \n\r\t').replace('ё', 'е'))
         # does nothing for now
 
     def __repr__(self):
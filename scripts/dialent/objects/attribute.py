@@ -2,12 +2,15 @@
 
 from dialent.common.util import compareStrings
 from dialent.common.util import normalize
+from dialent.common.util import StringPool
 
 #########################################################################################
 
 class Attribute:
     """Entity attribute with one or several synonimous values"""
 
+    __slots__ = ['name', 'values']
+
     def __init__(self):
         """Create a new object. Do not call this directly, use classmethods instead."""
         self.name = ''
@@ -58,7 +61,7 @@ class Attribute:
 
     def trimName(self):
         """Removes any digits following the attribute name"""
-        self.name = self.name.strip('1234567890')
+        self.name = StringPool.get(self.name.strip('1234567890'))
         
     def matches(self, other):
         """Returns true if a set of value of other corresponds to a set of values of this"""
@@ -105,9 +108,9 @@ class Attribute:
         parts = line.split(' ')
 
         instance = cls()
-        instance.name = parts[0].strip().lower()
+        instance.name = StringPool.get(parts[0].strip().lower())
         value = normalize(' '.join(parts[1:]))
-        instance.values.add(value)
+        instance.values.add(StringPool.get(value))
 
         return instance
 
@@ -122,9 +125,22 @@ class Attribute:
         assert(len(parts) >= 2)
 
         instance = cls()
-        instance.name = parts[0].strip().lower()
+        instance.name = StringPool.get(parts[0].strip().lower())
         value = normalize(':'.join(parts[1:]))
-        instance.values.add(value)
+        instance.values.add(StringPool.get(value))
+
+        return instance
+
+    @classmethod
+    def fromPrediction(cls, name, value):
+        """Create an attribute with the given name and value, normalized the same way
+        as in the test files.
+        
+        Returns a new Attribute instance"""
+
+        instance = cls()
+        instance.name = StringPool.get(normalize(name))
+        instance.values.add(StringPool.get(normalize(value)))
 
         return instance
 
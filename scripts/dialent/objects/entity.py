@@ -2,12 +2,15 @@
 
 #########################################################################################
 
+from dialent.common.util import normalize
 from dialent.objects.attribute import Attribute
 
 class Entity:
     """Entity with a set of attributes, assembled from several mentions throughout the
     document"""
 
+    __slots__ = ['attributes', 'id', 'tag', 'spans', 'mentions', 'is_problematic']
+
 
     def __init__(self):
         """Create a new object. Do not call this directly, use classmethods instead."""
@@ -180,3 +183,25 @@ class Entity:
 
         return instance
 
+    @classmethod
+    def fromPrediction(cls, attributes):
+        """Create the entity from an in-memory prediction:
+
+        { 'tag' : [entity_type], [attr_name] : [attr_value], ... }
+
+        An attribute value can also be a list of values, one attribute is added for each
+        """
+
+        instance = cls()
+        for name, values in attributes.items():
+            if name == 'tag':
+                continue
+            for value in ([values] if isinstance(values, str) else values):
+                instance.attributes.append(Attribute.fromPrediction(name, value))
+        instance.tag = normalize(attributes['tag']).strip(' :')
+        if instance.tag == 'locorg':
+            # all locorgs are considered locs for this task
+            instance.tag = 'loc'
+
+        return instance
+
@@ -1,5 +1,7 @@
 ﻿# Fact from the .facts layer of the standard markup
 
+from dialent.common.util import normalize
+
 from dialent.objects.argument import Argument
 from dialent.objects.argument import ArgumentBuilder
 
@@ -11,6 +13,9 @@ from dialent.objects.argument import SpanValue
 
 class Fact:
     """Fact extracted from a document"""
+
+    __slots__ = ['tag', 'id', 'arguments', 'has_easymode_modality',
+                 'has_hardmode_difficulty', 'is_ignored', '__weakref__']
     
     # values of the 'модальность' property that make the fact eligible for the easy mode
     # only
@@ -57,16 +62,20 @@ class Fact:
         self.id = parts[0]
         self.tag = parts[1].strip(' :\n\t\r').lower()
 
-    def canMatch(self, other):
+    def canMatch(self, other, can_match_arguments=None):
         """Determine if this fact can match the other in evaluation. In essense, returns
-        True only if at least one of the arguments has matching values"""
+        True only if at least one of the arguments has matching values.
+        can_match_arguments(a, b) is used to compare the arguments if provided"""
 
         if self.tag != other.tag:
             return False
 
+        if can_match_arguments == None:
+            can_match_arguments = lambda a, b: a.canMatch(b)
+
         for a in self.arguments:
             for b in other.arguments:
-                if a.canMatch(b):
+                if can_match_arguments(a, b):
                    if a.name=='position':
                        continue
                    return True
@@ -83,6 +92,20 @@ class Fact:
         assert(len(phase_args) == 1)
         self.arguments.remove(phase_args[0])
 
+    def makeEasyModeCopy(self):
+        """Returns a copy of the fact prepared for the easy mode evaluation: with no
+        phase argument, and ignored if marked as difficult. The fact itself is not
+        changed"""
+        res = Fact()
+        res.tag = self.tag
+        res.id = self.id
+        res.arguments = list(self.arguments)
+        res.has_easymode_modality = self.has_easymode_modality
+        res.has_hardmode_difficulty = self.has_hardmode_difficulty
+        res.is_ignored = self.is_ignored or self.has_hardmode_difficulty
+        res.removePhase()
+        return res
+
     def finalize(self):
         """Finalize the object for the evaluation"""
         self._processModality()
@@ -206,3 +229,24 @@ class Fact:
 
         return instance
 
+    @classmethod
+    def fromPrediction(cls, arguments):
+        """Create the fact from an in-memory prediction:
+
+        { 'tag' : [fact_type], [arg_name] : [arg_value], ... }
+
+        An argument value can also be a list of values, one argument is added for each
+        """
+
+        instance = cls()
+        instance.tag = normalize(arguments['tag']).strip(' :')
+        for name, values in arguments.items():
+            if name == 'tag':
+                continue
+            for value in ([values] if isinstance(values, str) else values):
+                arg = Argument.fromPrediction(name, value)
+                arg.fact = instance
+                instance.arguments.append(arg)
+
+        return instance
+
@@ -4,6 +4,8 @@
 
 class Interval:
     """Text interval"""
+
+    __slots__ = ['start', 'length', 'end']
     
     def __init__(self, start, length):
         """Create an interval with the given starting position and length."""
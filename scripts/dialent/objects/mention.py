@@ -3,6 +3,8 @@
 from dialent.config import Config
 from dialent.config import Tables
 
+from dialent.common.util import StringPool
+
 from dialent.objects.interval import Interval
 from dialent.objects.tokenset import TokenSet
 
@@ -10,11 +12,14 @@ from dialent.objects.tokenset import TokenSet
 
 class Mention:
     """Mention consisting of spans"""
+
+    __slots__ = ['id', 'parents', 'tag', 'spans', 'text', 'interval_text']
     
     def __init__(self, id, tag, span_ids, span_dict):
         """Create a new mention of a given type with the provided spans"""
         self.id = id
-        self.parents = []
+        # most mentions have no parents, so they share an empty tuple
+        self.parents = ()
         
         if not tag in Config.STANDARD_TYPES:
             raise Exception('Unknown mention tag: {}'.format(tag))
@@ -45,16 +50,17 @@ class Mention:
 
     def findParents(self, mentions):
         """Scans the given mention list for mentions embedding this one"""
-        self.parents = []
+        parents = []
         for m in [x for x in mentions if x.tag in Tables.PARENT_TAGS[self.tag]]:
             s_int = self.toInterval()
             m_int = m.toInterval()
             if s_int.isIn(m_int):
-                self.parents.append(m)
+                parents.append(m)
             else:
                 # organizations have priority over equally sized people and locations
                 if self.tag in ['per', 'loc'] and m.tag=='org' and s_int.isEqual(m_int):
-                    self.parents.append(m)
+                    parents.append(m)
+        self.parents = parents if len(parents) > 0 else ()
 
     def toInterval(self):
         assert(len(self.spans) > 0)
@@ -67,7 +73,7 @@ class Mention:
     def setText(self, documentText):
         """Sets the text from the document corresponding to the mention"""
         ts = TokenSet([t for s in self.spans for t in s.tokens], self.tag, documentText)
-        self.text = ' '.join([t.text for t in ts.sortedTokens()])
+        self.text = StringPool.get(' '.join([t.text for t in ts.sortedTokens()]))
         interval = ts.toInterval()
         self.interval_text = documentText[interval.start:interval.end]
 
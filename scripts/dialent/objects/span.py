@@ -1,14 +1,18 @@
 ﻿# Representation of a span from the standard markup .spans layer
 
+from dialent.common.util import StringPool
+
 #########################################################################################
 
 class Span:
     """Raw span"""
+
+    __slots__ = ['id', 'tag', 'start', 'end', 'token_start', 'ntokens', 'tokens', 'text']
     
     def __init__(self, id, tag, start, nchars, token_start, ntokens):
         """Create a new span with the given parameters"""
         self.id = id
-        self.tag = tag
+        self.tag = StringPool.get(tag)
         
         self.start = int(start)
         self.end = int(start) + int(nchars)
@@ -1,11 +1,16 @@
 ﻿# Representation of a token from the standard markup .tokens layer
 
+import weakref
+
 from dialent.common.util import normalize
+from dialent.common.util import StringPool
 
 #########################################################################################
 
 class Token:
     """Raw token"""
+
+    __slots__ = ['id', 'start', 'length', 'end', 'text', 'next', '_prev', '__weakref__']
     
     def __init__(self, id, start, length, text):
         """Create a new token with the given parameters"""
@@ -13,10 +18,20 @@ class Token:
         self.start = int(start)
         self.length = int(length)
         self.end = self.start + self.length - 1
-        self.text = normalize(text)
+        self.text = StringPool.get(normalize(text))
         self.next = None
         self.prev = None        
         
+    @property
+    def prev(self):
+        """Previous token of the document. Only a weak reference is stored, so that the
+        token chain has no reference cycles"""
+        return self._prev() if self._prev != None else None
+
+    @prev.setter
+    def prev(self, token):
+        self._prev = weakref.ref(token) if token != None else None
+
     def __repr__(self):
         return '{}[{}-{}, #{}]'.format(
             self.text, self.start, self.end, self.id)
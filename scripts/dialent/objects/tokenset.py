@@ -1,5 +1,8 @@
 ﻿# Tokenset is a set of tokens corresponding to an object used in task 1 evaluation
 
+import weakref
+from types import MappingProxyType
+
 from dialent.config import Tables
 
 from dialent.objects.token import Token
@@ -9,17 +12,31 @@ from dialent.objects.interval import Interval
 
 class TokenSet:
     """A set of tokens corresponding to an object"""
+
+    __slots__ = ['id', 'tokens', 'tag', 'parents', '_siblings', 'interval', '_span_marks',
+                 'text', '__weakref__']
+
+    # shared span marks of the token sets with all the marks equal to 0
+    no_marks = MappingProxyType({})
     
     def __init__(self, token_list, tag, text):
         self.id = -1
         self.tokens = set(token_list)
         self.tag = tag
-        self.parents = []
+        # most token sets have no parents or siblings, so they share an empty tuple
+        self.parents = ()
+        self._siblings = ()
         self.interval = None
-        self._span_marks = dict([(x, 0) for x in self.tokens])
+        # only the tokens with non-zero marks are stored
+        self._span_marks = TokenSet.no_marks
         self.text = text
-        self.is_ignored_sibling = False
         
+    @property
+    def siblings(self):
+        """Token sets with exactly the same tokens. Siblings refer to each other, so only
+        weak references are stored to avoid the reference cycles"""
+        return [x() for x in self._siblings]
+
     def __repr__(self):
         return '<' + ' '.join([repr(x) for x in self.sortedTokens()]) + '>'
 
@@ -83,14 +100,14 @@ class TokenSet:
         
     def mark(self, token):
         """Return the span mark for this token"""
-        if token not in self._span_marks:
-            return 0
-        else:
-            return self._span_marks[token]
+        return self._span_marks.get(token, 0)
         
     def setMark(self, token, mark):
         """Try to increase the mark of the given token"""
-        if(self._span_marks[token] < mark):
+        assert(token in self.tokens)
+        if(self.mark(token) < mark):
+            if self._span_marks is TokenSet.no_marks:
+                self._span_marks = {}
             self._span_marks[token] = mark
 
     def isEmbedded(self):
@@ -99,8 +116,8 @@ class TokenSet:
 
     def findParents(self, all_token_sets):
         """Fill the parent and sibling lists of the current token set"""
-        self.parents = []
-        self.siblings = []
+        parents = []
+        siblings = []
         for other in [x for x in all_token_sets
                         if x.tag in Tables.PARENT_TAGS[self.tag]]:
             if other is self:
@@ -108,9 +125,12 @@ class TokenSet:
                 continue
 
             if self.tokens < other.tokens:
-                self.parents.append(other)
+                parents.append(other)
             elif self.tokens == other.tokens:
-                self.siblings.append(other)
+                siblings.append(weakref.ref(other))
+
+        self.parents = parents if len(parents) > 0 else ()
+        self._siblings = siblings if len(siblings) > 0 else ()
 
     def toInlineString(self):
         """Make an inline representation using the tokensets interval"""
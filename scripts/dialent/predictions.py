@@ -0,0 +1,79 @@
+# This module evaluates predictions passed as in-memory structures (e.g. by a training
+# loop) against a standard markup that is loaded only once. No response files are
+# written or read. The predictions are dictionaries {document name : list}, where the
+# list items are:
+#
+#   track 1 - (tag, start symbol index, length) tuples
+#             e.g. ('per', 120, 12)
+#   track 2 - dictionaries of the entity type and attributes
+#             e.g. { 'tag' : 'per', 'firstname' : 'иван', 'lastname' : 'петров' }
+#   track 3 - dictionaries of the fact type and arguments
+#             e.g. { 'tag' : 'occupation', 'who' : 'иван петров', 'where' : 'газпром' }
+#
+# An attribute or argument value can be a list, one attribute/argument is added for each
+# value. Modes are named as in dialent.leaderboard: t1, t1-l, t2, t2-m, t3, t3-m
+
+from dialent.leaderboard import Leaderboard
+from dialent.common.util import frozenObjects
+
+from dialent.task1.test import Test as Test1
+from dialent.task2.test import Test as Test2
+from dialent.task3.test import Test as Test3
+
+from dialent.task2.util import loadAllStandard
+
+#########################################################################################
+
+class PredictionEvaluator:
+    """Evaluates in-memory predictions against the standard markup that is loaded only
+    once"""
+
+    # test markup class of each track
+    tests = { 1 : Test1, 2 : Test2, 3 : Test3 }
+
+    def __init__(self, std_path, cache=None):
+        """Load the standard markup from std_path.
+        cache is an optional dialent.common.cache.ResultCache object"""
+        self.std = loadAllStandard(std_path)
+        self.names = set([x.name for x in self.std])
+        self.cache = cache
+
+    def makeTest(self, track, predictions):
+        """Build the test markup of every standard document from the predictions of the
+        given track. The documents absent from the predictions get an empty markup, as
+        if nothing was found in them. Returns a list"""
+        unknown = [x for x in predictions if not x in self.names]
+        if len(unknown) > 0:
+            raise Exception('Predictions for unknown documents: {}'.format(
+                ', '.join(sorted(unknown))))
+
+        test_class = PredictionEvaluator.tests[track]
+        return [test_class.fromPredictions(x.name, predictions.get(x.name, []))
+                for x in self.std]
+
+    def evaluate(self, predictions, mode='t1', output_path=''):
+        """Evaluate the predictions in the given mode. If output_path is provided,
+        reports are written there. Returns a dictionary {tag : Metrics}"""
+        return self.evaluateModes(predictions, [mode], [output_path])[mode]
+
+    def evaluateModes(self, predictions, modes, output_paths=None):
+        """Evaluate the predictions in several modes of the same track in a single pass.
+        output_paths is a list of the report folders of each mode.
+        Returns a dictionary {mode : {tag : Metrics}}"""
+        unknown = [x for x in modes if not x in Leaderboard.modes]
+        if len(unknown) > 0:
+            raise Exception('Unknown modes: {}'.format(', '.join(unknown)))
+
+        tracks = set([int(x[1]) for x in modes])
+        if len(tracks) != 1:
+            raise Exception('All the modes must belong to the same track: {}'.format(
+                ', '.join(modes)))
+
+        track = tracks.pop()
+        test = self.makeTest(track, predictions)
+        with frozenObjects():
+            results = Leaderboard.evaluators[track].evaluateModes(
+                [Leaderboard.createEvaluator(x, self.cache) for x in modes],
+                self.std, test, output_paths, is_silent=True)
+
+        return dict(zip(modes, results))
@@ -0,0 +1,226 @@
+# This module implements the evaluation service, a long-running process that keeps the
+# standard markup loaded and evaluates submissions on request, and its client.
+#
+# The client connects to the service (localhost TCP or a Unix socket), sends one job as
+# a line of utf-8 JSON and reads the JSON lines of the replies until the last one with
+# the 'done' or 'error' status:
+#
+#   job     = { 'set' : <standard set name>,
+#               'modes' : [<mode>, ...],                      (optional, all by default)
+#               'path' : <submission directory or archive path>
+#                 or 'files' : {<file name> : <base64 contents>},
+#               'output' : <reports folder> }                 (optional)
+#
+#   replies = { 'status' : 'queued', 'position' : <number of jobs ahead> }
+#             { 'status' : 'started' }
+#             { 'status' : 'result', 'mode' : <mode>, 'metrics' : {<tag> : {...}},
+#               'table' : <metrics table> }                   (one per evaluated mode)
+#             { 'status' : 'done' } or { 'status' : 'error', 'message' : <text> }
+#
+# Modes are named as in dialent.leaderboard: t1, t1-l, t2, t2-m, t3, t3-m
+
+import os
+import json
+import base64
+import socket
+import asyncio
+import concurrent.futures
+
+from dialent.leaderboard import Leaderboard
+from dialent.common.cache import ResultCache
+from dialent.common.source import MemorySource, openSource
+from dialent.common.util import freezeObjects
+
+#########################################################################################
+
+default_port = 8016
+
+# loaded standard sets {set name : Leaderboard}. The worker processes are forked after
+# the sets are loaded, so they share the loaded markup with the service process
+boards = {}
+
+def loadStandards(std_paths, cache_path=None):
+    """Load the standard sets given as a dictionary {set name : path}, unless they are
+    already loaded"""
+    cache = ResultCache(cache_path) if cache_path != None else None
+    for name, path in std_paths.items():
+        if not name in boards:
+            boards[name] = Leaderboard(path, name, cache=cache)
+
+def runTrack(job, modes):
+    """Evaluate the job submission in the given modes of a single track. This is run in
+    a worker process. Returns a list of (mode, metrics dictionary, table) tuples"""
+    if 'files' in job:
+        files = dict((name, base64.b64decode(data)) for name, data in job['files'].items())
+        source = MemorySource(files)
+        run_name = 'submission'
+    else:
+        source = job['path']
+        run_name = None
+
+    board = boards[job['set']]
+    res = board.evaluate(source, job.get('output', ''), run_name, modes)
+
+    results = []
+    for mode in modes:
+        if not mode in res:
+            continue
+        table = Leaderboard.createEvaluator(mode).buildMetricsTable(res[mode])
+        metrics = dict((tag, m.toDict()) for tag, m in res[mode].items())
+        results.append( (mode, metrics, table) )
+
+    return results
+
+#########################################################################################
+
+class EvaluationServer:
+    """Evaluation service. Keeps the standard markup loaded, queues the incoming jobs and
+    runs them on a pool of worker processes"""
+
+    def __init__(self, std_paths, workers=2, cache_path=None):
+        """Load the standard sets given as a dictionary {set name : path}.
+        workers is the number of the worker processes, cache_path is an optional path
+        to the result cache folder"""
+        print('Loading the standard markup...', flush=True)
+        loadStandards(std_paths, cache_path)
+
+        # the loaded markup is never freed, and it should stay in the memory pages shared
+        # with the worker processes
+        freezeObjects()
+
+        self.workers = workers
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=loadStandards, initargs=(std_paths, cache_path))
+        self.queue = None
+
+    async def serve(self, host='127.0.0.1', port=default_port, unix_path=None):
+        """Accept the jobs until the process is stopped"""
+        self.queue = asyncio.Queue()
+        runners = [asyncio.create_task(self._runJobs()) for i in range(self.workers)]
+
+        # inline submissions are sent as a single line, so the line limit is raised
+        limit = 2**30
+        if unix_path != None:
+            server = await asyncio.start_unix_server(
+                self._handleClient, unix_path, limit=limit)
+            print('Listening on {}'.format(unix_path), flush=True)
+        else:
+            server = await asyncio.start_server(
+                self._handleClient, host, port, limit=limit)
+            print('Listening on {}:{}'.format(host, port), flush=True)
+
+        async with server:
+            await server.serve_forever()
+
+    def checkJob(self, job):
+        """Check the job description and fill the default values"""
+        if not isinstance(job, dict):
+            raise Exception('The job must be a JSON object')
+        if not job.get('set') in boards:
+            raise Exception('Unknown standard set: {} (available: {})'.format(
+                job.get('set'), ', '.join(sorted(boards.keys()))))
+        if not 'path' in job and not 'files' in job:
+            raise Exception('Either the submission path or the files must be set')
+
+        modes = job.setdefault('modes', list(Leaderboard.modes))
+        unknown = [x for x in modes if not x in Leaderboard.modes]
+        if len(unknown) > 0:
+            raise Exception('Unknown modes: {}'.format(', '.join(unknown)))
+
+    async def _handleClient(self, reader, writer):
+        """Read the job from the client, queue it and wait until it is completed"""
+        try:
+            job = json.loads((await reader.readline()).decode('utf-8'))
+            self.checkJob(job)
+        except Exception as e:
+            await self._send(writer, {'status' : 'error', 'message' : str(e)})
+            writer.close()
+            return
+
+        done = asyncio.get_running_loop().create_future()
+        await self._send(writer, {'status' : 'queued', 'position' : self.queue.qsize()})
+        await self.queue.put((job, writer, done))
+        await done
+        writer.close()
+
+    async def _runJobs(self):
+        """Take the jobs from the queue and run them on the worker pool one by one,
+        sending the results of every track as soon as they are ready"""
+        loop = asyncio.get_running_loop()
+        while True:
+            job, writer, done = await self.queue.get()
+            try:
+                await self._send(writer, {'status' : 'started'})
+                for track in sorted(Leaderboard.evaluators.keys()):
+                    modes = [x for x in job['modes'] if int(x[1]) == track]
+                    if len(modes) == 0:
+                        continue
+
+                    results = await loop.run_in_executor(self.pool, runTrack, job, modes)
+                    for mode, metrics, table in results:
+                        await self._send(writer, {'status' : 'result', 'mode' : mode,
+                                                  'metrics' : metrics, 'table' : table})
+
+                await self._send(writer, {'status' : 'done'})
+            except Exception as e:
+                try:
+                    await self._send(writer, {'status' : 'error', 'message' : str(e)})
+                except Exception:
+                    # the client is gone
+                    pass
+            finally:
+                done.set_result(None)
+
+    async def _send(self, writer, reply):
+        writer.write((json.dumps(reply, ensure_ascii=False) + '\n').encode('utf-8'))
+        await writer.drain()
+
+#########################################################################################
+
+class EvaluationClient:
+    """Client of the evaluation service"""
+
+    def __init__(self, host='127.0.0.1', port=default_port, unix_path=None):
+        """Set the address of the service: TCP host and port or a Unix socket path"""
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+
+    def run(self, job):
+        """Send the job to the service and yield the replies as they arrive"""
+        if self.unix_path != None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.unix_path)
+        else:
+            sock = socket.create_connection((self.host, self.port))
+
+        with sock, sock.makefile('r', encoding='utf-8') as f:
+            sock.sendall((json.dumps(job, ensure_ascii=False) + '\n').encode('utf-8'))
+            for line in f:
+                reply = json.loads(line)
+                yield reply
+                if reply['status'] in ['done', 'error']:
+                    break
+
+    @classmethod
+    def makeJob(cls, set_name, test_path, modes=None, output_path='', is_inline=False):
+        """Build a job description. If is_inline is True, the submission files are sent
+        to the service instead of the path (e.g. when the service can not read it)"""
+        job = { 'set' : set_name }
+        if modes != None:
+            job['modes'] = modes
+        if len(output_path) > 0:
+            job['output'] = os.path.abspath(output_path)
+
+        if is_inline:
+            source = openSource(test_path)
+            job['files'] = {}
+            for name in source.names():
+                for ext in ['.task1', '.task2', '.task3']:
+                    if source.has(name, ext):
+                        job['files'][name + ext] = base64.b64encode(
+                            source.read(name, ext)).decode('ascii')
+        else:
+            job['path'] = os.path.abspath(test_path)
+
+        return job
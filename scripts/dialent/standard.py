@@ -1,7 +1,7 @@
 ﻿# This module deals primarily with the standard markup representation
 
-import os
-import csv
+import io
+import hashlib
 
 from dialent.config import Config, Tables
 
@@ -13,8 +13,12 @@ from dialent.objects.fact import Fact
 from dialent.objects.interval import Interval
 from dialent.objects.tokenset import TokenSet
 
-from dialent.common.util import normalize
+from dialent.common.util import normalizeMany
 from dialent.common.util import safeNormalize
+from dialent.common.util import decodeText
+from dialent.common.util import StringPool
+from dialent.common.source import openSource
+from dialent.common.parsers import parseTokens, parseSpans, parseMentions
 
 #########################################################################################
 
@@ -28,50 +32,76 @@ class Standard:
      - 'NAME.objects'
      - 'NAME.coref'
      - 'NAME.facts'
+
+    The set is read from a directory or a packed corpus file (see dialent.common.packed)
      """
+
+    # layers in the loading order. Each layer refers to the objects of the previous ones
+    layers = ['.txt', '.tokens', '.spans', '.objects', '.coref', '.facts']
     
     def __init__(self, name, path='.'):
         self.name = name
+        self.has_coref = True
+        self.has_facts = True
+        # hashes of the raw layer contents, they make up the document digest
+        self.layer_hashes = []
+        # number of the layers loaded successfully
+        self.n_loaded = 0
+        self._loadLayers(path, 0)
+
+    def reload(self, layer, path='.'):
+        """Load the given layer of the document (e.g. '.coref') again after it was edited,
+        along with the following layers that refer to its objects. The previous layers
+        are kept, e.g. the tokens and the spans are not parsed again for an edited
+        entity or fact. A document that failed to load is loaded again in full"""
+        if not layer in Standard.layers:
+            raise Exception('Unknown standard layer: {}'.format(layer))
+        self._loadLayers(path, min(Standard.layers.index(layer), self.n_loaded))
+
+    def _loadLayers(self, path, first):
+        """Load the layers of the document starting from the one with the given index"""
+        loaders = [self.loadText, self.loadTokens, self.loadSpans, self.loadMentions,
+                   self.loadCoreference, self.loadFacts]
+        del self.layer_hashes[first:]
+        self.n_loaded = first
+        self.token_sets = {}
         try:
-            self.has_coref = True
-            self.has_facts = True
-            full_name = os.path.join(path, name)
-            self.loadText(full_name + '.txt')
-            self.loadTokens(full_name + '.tokens')
-            self.loadSpans(full_name + '.spans')
-            self.loadMentions(full_name + '.objects')
-            self.loadCoreference(full_name + '.coref')
-            self.loadFacts(full_name + '.facts')
+            source = openSource(path)
+            with StringPool.scope():
+                for ext, loader in list(zip(Standard.layers, loaders))[first:]:
+                    loader(*self._readLayer(source, ext, self.layer_hashes))
+                    self.n_loaded += 1
         except Exception as e:
-            print('Failed to load the standard of {}:'.format(name))
+            print('Failed to load the standard of {}:'.format(self.name))
             print(e)
             # reset the document so it has no impact on the comparison
             self.mentions = []
             self.entities = []
             self.facts = []
+            self.n_loaded = 0
+
+        # the digest identifies the contents of the document (e.g. in the result cache)
+        self.digest = hashlib.sha256(
+            '\n'.join(self.layer_hashes).encode('utf-8')).hexdigest()
+
+    def _readLayer(self, source, ext, layer_hashes):
+        """Read the given layer of the document from the source and add its hash to
+        layer_hashes. Returns a tuple (text, location), text is None if the layer is
+        missing"""
+        location = source.location(self.name, ext)
+        if ext in ['.coref', '.facts'] and not source.has(self.name, ext):
+            layer_hashes.append(ext)
+            return None, location
+
+        data = source.read(self.name, ext)
+        layer_hashes.append(ext + ' ' + hashlib.sha256(data).hexdigest())
+        return decodeText(data), location
     
-    def loadTokens(self, filename):
-        """Load the data from a file with the provided name
+    def loadTokens(self, text, filename):
+        """Load the data from the contents of a file with the provided name
         
         Raw token data should be loaded from one of the system export '.tokens' file"""
-        self.tokens = []
-        
-        with open(filename, 'r', encoding='utf-8') as f:
-            rdr = csv.reader(f, delimiter=Config.DEFAULT_DELIMITER, quotechar=Config.QUOTECHAR)
-            
-            for index, line in enumerate(rdr):
-                if len(line) == 0:
-                    # skip the empty lines
-                    continue
-                
-                if len(line) != Config.TOKEN_LINE_LENGTH:
-                    # bad non-empty line
-                    raise Exception(
-                        'Wrong length in line {} of file {}'.format(
-                            index, filename))
-                
-                self.tokens.append(
-                    Token(*line) )
+        self.tokens = [Token(*fields) for fields in parseTokens(text, filename)]
 
         # fill the token dictionary
         self._token_dict = dict([(x.id, x) for x in self.tokens])
@@ -85,96 +115,35 @@ class Standard:
                 token.next = self.tokens[i+1]
 
                 
-    def loadSpans(self, filename):
-        """Load the data from a file with the provided name
+    def loadSpans(self, text, filename):
+        """Load the data from the contents of a file with the provided name
         
         Raw span data should be loaded from one of the system export '.spans' file
-        
-        Expected format:
-        line = <left> SPAN_FILE_SEPARATOR <right>
-        left = <span_id> <tag_name> <start_pos> <nchars> <start_token> <ntokens>
-        right ::= [ <token>]+ [ <token_text>]+     // <ntokens> of each
-            """
+        (see dialent.common.parsers.parseSpans for the format)"""
         self.spans = []
         
-        with open(filename, 'r', encoding='utf-8') as f:
-            for index, line in enumerate(f):
-                if len(line) == 0:
-                    # skip the empty lines
-                    continue
-                
-                parts = line.split(Config.SPAN_FILE_SEPARATOR)
-                if len(parts) != 2:
-                    # bad non-empty line
-                    raise Exception(
-                        'Expected symbol "{}" missing in line {} of file {}'.format(
-                            Config.SPAN_FILE_SEPARATOR, index, filename))
-                    
-                left = parts[0]
-                right = parts[1]
-                
-                filtered_left = [i
-                     for i in left.split(Config.DEFAULT_DELIMITER)
-                         if len(i) > 0]
-                
-                if len(filtered_left) < 6:
-                    raise Exception(
-                        'Missing left parts in line {} of file {}'.format(
-                            index, filename))
-                    
-                new_span = Span(*filtered_left)
-                
-                filtered_right = [i
-                      for i in right.split(Config.DEFAULT_DELIMITER)
-                            if len(i) > 0]
-                if len(filtered_right) != 2*new_span.ntokens:
-                    raise Exception(
-                        'Missing right parts in line {} of file {}'.format(
-                            index, filename))
-                
-                
-                token_ids = [x.strip() for x in filtered_right[:new_span.ntokens]]
-                new_span.tokens = sorted([self._token_dict[x] for x in token_ids],
-                                         key=lambda x: x.start)
-                new_span.text = normalize(' '.join(filtered_right[new_span.ntokens:]))
-                new_span.text = new_span.text.replace('\n', '')
-                
-                self.spans.append(new_span)
+        rows = parseSpans(text, filename)
+        texts = normalizeMany([fields[7] for fields in rows])
+        for fields, span_text in zip(rows, texts):
+            new_span = Span(*fields[:6])
+            new_span.tokens = sorted([self._token_dict[x] for x in fields[6]],
+                                     key=lambda x: x.start)
+            new_span.text = StringPool.get(span_text.replace('\n', ''))
+            
+            self.spans.append(new_span)
                 
         # fill the span dictionary
         self._span_dict = dict([(x.id, x) for x in self.spans])
 
-    def loadMentions(self, filename):
-        """Load the data from a given 'objects' file. Expected format:
+    def loadMentions(self, text, filename):
+        """Load the data from the contents of a given 'objects' file. Expected format:
         
         line = <object_id> <type> <span_id> # <comment>
         """
         
-        self.mentions = []
-        with open(filename, 'r', encoding='utf-8') as f:
-            r = csv.reader(f, delimiter=' ', quotechar=Config.QUOTECHAR)
-            for index, line in enumerate(r):
-                if Config.COMMENT_SEPARATOR in line:
-                    comment_index = line.index(Config.COMMENT_SEPARATOR)
-                    line = line[:comment_index]
-
-                if len(line) == 0:
-                    continue
-                
-                if len(line) <= 2:
-                    raise Exception(
-                        'Missing spans in object description: line {} of file {}'.format(
-                            index, filename))
-                
-                try:
-                    mention_id = line[0].strip()
-                    span_indices = [descr.strip() for descr in line[2:]]
-                except Exception as e:
-                    raise Exception('Invalid mention or span id: line {} of file {}:\n{}'.format(
-                        index, filename, e))
-
-                self.mentions.append(
-                    Mention(mention_id, line[1], span_indices, self._span_dict))
+        self.mentions = [Mention(mention_id, tag, span_indices, self._span_dict)
+                         for mention_id, tag, span_indices
+                             in parseMentions(text, filename)]
                 
         # fill the mention dictionary
         self._mention_dict = dict([(x.id, x) for x in self.mentions])
@@ -182,18 +151,16 @@ class Standard:
             m.findParents(self.mentions)
             m.setText(self.text)
 
-    def loadCoreference(self, filename):
-        """Load coreference data from the associated file"""
+    def loadCoreference(self, text, filename):
+        """Load coreference data from the contents of the associated file"""
         self.entities = []
+        self.has_coref = text != None
 
-        try:
-            open(filename, 'r', encoding='utf-8')
-        except:
+        if text is None:
             # there are currently some documents with no .coref layer. This is temporary
-            self.has_coref = False
             return
         
-        with open(filename, 'r', encoding='utf-8') as f:
+        with io.StringIO(text) as f:
             buffer = ''
             for raw_line in f:
                 line = raw_line.strip(' \t\n\r')
@@ -212,18 +179,16 @@ class Standard:
         for ent in self.entities:
             self._entity_dict[ent.id] = ent
 
-    def loadFacts(self, filename):
-        """Load facts from the associated file"""
+    def loadFacts(self, text, filename):
+        """Load facts from the contents of the associated file"""
         self.facts = []
+        self.has_facts = text != None
 
-        try:
-            open(filename, 'r', encoding='utf-8')
-        except:
+        if text is None:
             # there are currently some documents with no .coref layer. This is temporary
-            self.has_facts = False
             return
         
-        with open(filename, 'r', encoding='utf-8') as f:
+        with io.StringIO(text) as f:
             buffer = ''
             for raw_line in f:
                 line = raw_line.strip(' \t\n\r')
@@ -242,11 +207,17 @@ class Standard:
         for fact in self.facts:
             fact.expandWithIsPartOf(part_of_facts)
 
-    def loadText(self, filename):
-        """Load text from the associated text file"""
-        with open(filename, 'r', encoding='utf-8') as f:
-            self.text = safeNormalize(''.join( [line for line in f] ))
+    def loadText(self, text, filename):
+        """Load text from the contents of the associated text file"""
+        self.text = safeNormalize(text)
             
+    def getTokenSets(self, is_locorg_allowed=True):
+        """Returns the TokenSet objects built by makeTokenSets. They are built once per
+        document and shared by all the evaluations, so they must not be modified"""
+        if not is_locorg_allowed in self.token_sets:
+            self.token_sets[is_locorg_allowed] = self.makeTokenSets(is_locorg_allowed)
+        return self.token_sets[is_locorg_allowed]
+
     def makeTokenSets(self, is_locorg_allowed=True):
         """Create a dictionary of typed TokenSet objects corresponding to the mentions
         
@@ -1,5 +1,6 @@
 ﻿
 import os
+import time
 
 from dialent.standard import Standard
 from dialent.task1.test import Test
@@ -7,30 +8,81 @@ from dialent.task1.test import Test
 from dialent.task1.util import loadAllStandard, loadAllTest
 
 from dialent.common.evalmatrix import EvaluationMatrix
-from dialent.common.metrics import Metrics
+from dialent.common.metrics import Metrics, MetricsTable
+from dialent.common.reports import openReports, reportOutput
+from dialent.common.timing import stage
+from dialent.common.util import frozenObjects
 
 #########################################################################################
 
 class Evaluator:
     """Response evaluator for the 1st track"""
 
-    def __init__(self, is_locorg_enabled=True):
-        """Create an object with or without the support for locorg objects"""
+    def __init__(self, is_locorg_enabled=True, cache=None, only_imperfect=False,
+                 report_thread=False, metrics_sink=None):
+        """Create an object with or without the support for locorg objects.
+        cache is an optional dialent.common.cache.ResultCache object.
+        If only_imperfect is True, the reports are only written for the documents with
+        imperfect results. If report_thread is True, the reports are written in a
+        background thread while the next documents are evaluated. metrics_sink is an
+        optional dialent.common.sink.MetricsSink the results of every document are
+        written to"""
         self.is_locorg_enabled = is_locorg_enabled
         if is_locorg_enabled:
             self.tags = ['per', 'loc', 'org', 'locorg', 'overall']
         else:
             self.tags = ['per', 'loc', 'org', 'overall']
 
+        self.cache = cache
+        self.only_imperfect = only_imperfect
+        self.report_thread = report_thread
+        self.report_output = None
+        self.metrics_sink = metrics_sink
+        # per-document metrics of the last evaluation, a
+        # dialent.common.metrics.MetricsTable
+        self.table = None
         self.metrics_dict = None
+        # matching search counters of every evaluated document
+        # {document name : SearchStats}
+        self.search_stats = {}
 
 
-    def evaluate(self, std_path, test_path, output_path='', is_silent=False):
+    def evaluate(self, std_path, test_path, output_path='', is_silent=False, shard=None,
+                 partial_path=''):
         """Run evaluation on all files in the given directories
         If output_path is provided, evaluation reports will be written there.
-        is_silent determines if the result is printed to the output"""
-        std = loadAllStandard(std_path)
-        test = loadAllTest(test_path)
+        is_silent determines if the result is printed to the output.
+        If a dialent.common.shard.Shard is provided, only its documents are evaluated,
+        and the partial results file is saved to partial_path"""
+        std = loadAllStandard(std_path, shard)
+        test = loadAllTest(test_path, shard)
+        documents = [{}] if shard != None else None
+        with frozenObjects():
+            res = Evaluator.evaluateModes([self], std, test, [output_path], is_silent,
+                                          documents)[0]
+        if shard != None:
+            shard.save(partial_path, self, documents[0], output_path)
+        return res
+
+    def evaluateMarkup(self, std, test, output_path='', is_silent=False):
+        """Run evaluation on the loaded lists of standard and test documents.
+        The standard markup is not modified, so it can be shared between evaluations"""
+        return Evaluator.evaluateModes([self], std, test, [output_path], is_silent)[0]
+
+    @classmethod
+    def evaluateModes(cls, evaluators, std, test, output_paths=None, is_silent=False,
+                      documents=None):
+        """Run evaluation on the loaded documents with several evaluators (one per mode)
+        in a single pass. The tokenization of the test mentions is shared between the
+        modes, so it is done only once per document. output_paths is a list of the
+        report folders or archives (see dialent.common.reports) of each evaluator.
+        documents is an optional list of dictionaries, one per evaluator, that receive
+        the metrics dictionary of every evaluated document by name. Returns a list of
+        results of each evaluator"""
+        if output_paths == None:
+            output_paths = [''] * len(evaluators)
+        if documents == None:
+            documents = [None] * len(evaluators)
 
         diff = set([x.name for x in std]).symmetric_difference(
             set([y.name for y in test]))
@@ -44,33 +96,92 @@ class Evaluator:
         names = sorted(set([x.name for x in std]).intersection(
             set([y.name for y in test])), key=lambda x: int(x[5:]))
 
-        res = dict((tag, Metrics()) for tag in self.tags)
-
-        for name in names:
-            s = std_by_name[name]
-            t = test_by_name[name]
-            m = self.evaluateDocument(s, t)
-            self.metrics_dict = dict((x, m[x]) for x in self.tags)
-            self.printReport(s.name, output_path)
-            for key in res:
-                res[key].add(self.metrics_dict[key])
+        for e in evaluators:
+            e.table = MetricsTable(e.tags, max(len(names), 1))
+
+        with reportOutput(evaluators, output_paths):
+            for name in names:
+                s = std_by_name[name]
+                t = test_by_name[name]
+                for e, output_path, by_name in zip(evaluators, output_paths, documents):
+                    start = time.perf_counter()
+                    metrics = e.processDocument(s, t, output_path)
+                    e.table.add(name, metrics)
+                    if by_name != None:
+                        by_name[name] = metrics
+                    if e.metrics_sink != None:
+                        e.metrics_sink.write(e.modeName(), name, metrics,
+                                             e.search_stats.get(name),
+                                             time.perf_counter() - start)
             
+        results = [e.table.total() for e in evaluators]
         if not is_silent:
-            print(self.buildMetricsTable(res))
+            for e, res in zip(evaluators, results):
+                print(e.buildMetricsTable(res))
+
+        return results
+
+    @classmethod
+    def evaluateDocumentModes(cls, evaluators, standard, test, with_reports=False):
+        """Evaluate a single document with several evaluators (one per mode), sharing the
+        tokenization of the test mentions. Returns a list of (metrics dictionary, report)
+        tuples of each evaluator, the reports are only built if with_reports is True
+        and the document is reported (see isReported)"""
+        res = []
+        for e in evaluators:
+            e.evaluateDocument(standard, test)
+            is_reported = with_reports and e.isReported(e.metrics_dict)
+            res.append( (e.metrics_dict, e.buildReport() if is_reported else None) )
 
         return res
 
+    def processDocument(self, standard, test, output_path=''):
+        """Evaluate the document and print its report. If the evaluator has a result
+        cache, the results of the unchanged documents are taken from it.
+        Returns the metrics dictionary"""
+        key = None
+        if self.cache != None:
+            key = self.cache.makeKey(self.modeName(), standard, test)
+            cached = self.cache.load(key) if key != None else None
+            if cached != None:
+                self.metrics_dict, report = cached
+                self.printReport(standard.name, output_path, report)
+                return self.metrics_dict
+
+        self.evaluateDocument(standard, test)
+        if key != None:
+            report = self.buildReport()
+            self.cache.save(key, self.metrics_dict, report)
+            self.printReport(standard.name, output_path, report)
+        else:
+            self.printReport(standard.name, output_path)
+
+        return self.metrics_dict
+
     def evaluateDocument(self, standard, test):
         """Run evaluation on the given standard and test markup"""
-        s = standard.makeTokenSets(self.is_locorg_enabled)
-        t = test.makeTokenSets(standard, self.is_locorg_enabled)
-
-        em = EvaluationMatrix(s, t, TokenSetQualityCalculator())
-        em.findSolution()
+        with stage('token sets', standard.name):
+            s = standard.getTokenSets(self.is_locorg_enabled)
+            t = test.makeTokenSets(standard, self.is_locorg_enabled)
+
+        with stage('matrix', standard.name):
+            em = EvaluationMatrix(s, t, TokenSetQualityCalculator())
+        with stage('search', standard.name):
+            em.findSolution()
         self.em = em
+        self.search_stats[standard.name] = em.stats
+        self.metrics_dict = dict((x, em.metrics[x]) for x in self.tags)
 
         return em.metrics
 
+    def modeName(self):
+        """Returns the name of the evaluation mode (as in dialent.leaderboard)"""
+        return 't1' if self.is_locorg_enabled else 't1-l'
+
+    def metricTags(self):
+        """Returns the list of the tags of the metrics dictionaries"""
+        return self.tags
+
     # Metrics and reports
 
     def buildMetricsTable(self, metrics_dict):
@@ -82,30 +193,47 @@ class Evaluator:
 
         return res
 
+    def renderReport(self, record, metrics_dict):
+        """Yields the lines of the detailed comparison report on a document with the
+        given dialent.common.evalmatrix.MatchingRecord and metrics"""
+        yield '------STANDARD------\n'
+        yield from record.describeStd()
+        yield '\n\n'
+        yield '--------TEST--------\n'
+        yield from record.describeTest()
+        yield '\n\n'
+        yield '-------METRICS------\n'
+        yield self.buildMetricsTable(metrics_dict)
+
     def buildReport(self):
         """Builds a detailed comparison report"""
-        res = ''
-        res += '------STANDARD------\n'
-        res += self.em.describeMatchingStd() + '\n\n';
-        res += '--------TEST--------\n'
-        res += self.em.describeMatchingTest() + '\n\n';
-        res += '-------METRICS------\n'
-        res += self.buildMetricsTable(
-                self.metrics_dict
-            )
-
-        return res
+        return ''.join(self.renderReport(self.em.record, self.metrics_dict))
 
-    def printReport(self, name, out_dir):
-        if len(out_dir) == 0:
+    def printReport(self, name, out_dir, report=None):
+        """Print the report on the last evaluated document, unless it is not reported
+        (see isReported). If the report text is not provided, it is rendered while it
+        is written"""
+        if len(out_dir) == 0 or not self.isReported(self.metrics_dict):
             return
 
-        is_perfect = self.em.metrics['overall'].f1 == 1.0
-        os.makedirs(out_dir, exist_ok=True)
+        filename = self.reportName(name, self.metrics_dict)
+        lines = ([report] if report != None
+                 else self.renderReport(self.em.record, self.metrics_dict))
+        with stage('reports', name):
+            if self.report_output != None and self.report_output.path == out_dir:
+                self.report_output.write(name, filename, lines)
+            else:
+                with openReports(out_dir) as output:
+                    output.write(name, filename, lines)
+
+    def isReported(self, metrics_dict):
+        """Check if the report on the document with the given metrics is written"""
+        return not self.only_imperfect or metrics_dict['overall'].f1 < 1.0
 
-        filename = ('' if is_perfect else '_') +  name + '.report.txt'
-        with open(os.path.join(out_dir, filename), 'w', encoding='utf-8') as f:
-            f.write(self.buildReport())
+    def reportName(self, name, metrics_dict):
+        """Returns the report file name of the document with the given metrics"""
+        is_perfect = metrics_dict['overall'].f1 == 1.0
+        return ('' if is_perfect else '_') +  name + '.report.txt'
 
 
 #########################################################################################
@@ -120,6 +248,11 @@ class TokenSetQualityCalculator:
         ('locorg', 'per') : 0, ('locorg', 'org') : 0, ('locorg', 'loc') : 0, ('locorg', 'locorg') : 1
     }
 
+    def __init__(self):
+        """Make a new calculator. It is used for a single document, since it keeps
+        track of the ignored siblings within the document matching"""
+        self.ignored_siblings = set()
+
     def tagMultiplier(self, s, t):
         return TokenSetQualityCalculator.tag_table[(s.tag, t.tag)]
     
@@ -218,10 +351,10 @@ class TokenSetQualityCalculator:
                 # when both or neither are matched, ignore the non-organization
                 # in case of both being organizations, use any of them
                 if sibling.tag == s.tag:
-                    if s.is_ignored_sibling:
+                    if s in self.ignored_siblings:
                         return True
                     else:
-                        sibling.is_ignored_sibling = True
+                        self.ignored_siblings.add(sibling)
                         return False
                 else:
                     assert('org' in [sibling.tag, s.tag])
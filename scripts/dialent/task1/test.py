@@ -2,11 +2,14 @@
 
 #########################################################################################
 
-import os
+import io
 import csv
+import hashlib
 
-from dialent.common.util import safeOpen
+from dialent.common.util import decodeText
 from dialent.common.util import normalize
+from dialent.common.util import digestPredictions
+from dialent.common.source import openSource
 
 from dialent.config import Config
 
@@ -25,18 +28,33 @@ class Test:
         """Load the data from the given document
         
         name - file to load the data from (without an extension)
+        dir - directory, .zip/.tar(.gz) archive or collection object containing the file.
+              If None, the markup is left empty (see fromPredictions)
         """
+        full_name = name + '.task1'
+        # hash of the raw file contents, identifies the document in the result cache
+        self.digest = None
+        # (standard tokens, tokenized mentions) pair, see tokenize
+        self.tokenized = None
+        if dir == None:
+            self.name = name
+            self.load('', name)
+            return
+
         try:
             self.name = name
-            full_name = os.path.join(dir, name + '.task1')
-            self.load(full_name)
+            source = openSource(dir)
+            full_name = source.location(name, '.task1')
+            data = source.read(name, '.task1')
+            self.digest = hashlib.sha256(data).hexdigest()
+            self.load(decodeText(data, 'utf-8-sig'), full_name)
         except Exception as e:
             print('Failed to load "{}"'.format(full_name))
             print(e)
     
 
-    def load(self, filename):
-        """Do the exception-prone loading"""
+    def load(self, text, filename):
+        """Do the exception-prone loading of the contents of the given file"""
         
         # set the allowed tags for later
         self.allowed_tags = set(['org', 'per', 'loc', 'locorg'])
@@ -47,7 +65,7 @@ class Test:
             
         # read the file that should consist of lines like
         # [TAG] [START_SYMBOL_INDEX] [LENGTH]
-        with safeOpen(filename) as f:
+        with io.StringIO(text) as f:
             r = csv.reader(f, delimiter=' ', quotechar=Config.QUOTECHAR)
             for index, parts in enumerate(r):
                 # skip the empty lines
@@ -65,28 +83,56 @@ class Test:
                     raise Exception(
                         'Error: "{}", line {}.\nExpected: {}\nReceived: {}\nDetails: {}'.format(
                             filename, index, line_descr, ' '.join(parts), str(e)))
+
+    @classmethod
+    def fromPredictions(cls, name, mentions):
+        """Build the test markup of the document from in-memory predictions instead of
+        a file. mentions is a list of (tag, start symbol index, length) tuples"""
+        instance = cls(name, None)
+        for tag, start, length in mentions:
+            key = normalize(tag)
+            if not key in instance.allowed_tags:
+                raise Exception('Unknown mention tag in "{}": {}'.format(name, tag))
+            instance.mentions[key].append(Interval(start, length))
+
+        instance.digest = digestPredictions(mentions)
+        return instance
                     
                     
     def makeTokenSets(self, standard, is_locorg_allowed=True):
         """Create a dictionary of typed TokenSet objects corresponding to the mentions,
         using the provided standard data to tokenize the intervals"""
         
+        res = []
+        for key, interval, tokens in self.tokenize(standard):
+            ts = TokenSet(tokens, key, standard.text)
+
+            # save the interval within the token set
+            # to display it as-is in future
+            ts.interval = interval
+
+            if not is_locorg_allowed and key == 'locorg':
+                ts.tag = 'loc'
+            res.append(ts)
+        
+        return res
+
+    def tokenize(self, standard):
+        """Returns a list of (tag, interval, token list) tuples for all the mentions,
+        using the provided standard data to tokenize the intervals. The result is
+        reused while the standard tokens are the same, so all the evaluation modes share
+        it"""
+        if self.tokenized != None and self.tokenized[0] is standard.tokens:
+            return self.tokenized[1]
+
         res = []
         for key in self.allowed_tags:
             for interval in self.mentions[key]:
-                ts = TokenSet([token
+                res.append( (key, interval, [token
                               for token in standard.tokens
                                   if token.start >= interval.start
                                       and token.end <= interval.end
-                                      and not token.isIgnored()],
-                             key, standard.text)
-
-                # save the interval within the token set
-                # to display it as-is in future
-                ts.interval = interval
+                                      and not token.isIgnored()]) )
 
-                if not is_locorg_allowed and key == 'locorg':
-                    ts.tag = 'loc'
-                res.append(ts)
-        
+        self.tokenized = (standard.tokens, res)
         return res
\ No newline at end of file
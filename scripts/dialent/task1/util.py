@@ -5,6 +5,7 @@
 #########################################################################################
 
 import os
+import time
 import numpy as np
 
 import re
@@ -13,6 +14,10 @@ from dialent.config import Config
 from dialent.config import Tables
 
 from dialent.standard import Standard
+from dialent.common.source import openSource
+from dialent.common.timing import stage
+from dialent.common.util import StringPool
+from dialent.common.stats import SearchStats
 from dialent.task1.test import Test
 
 #########################################################################################
@@ -61,6 +66,20 @@ class ResponseGenerator:
             out_filename - destination filename
         """
         
+        res = self.buildDoc(standard)
+        
+        os.makedirs(os.path.dirname(out_filename), exist_ok=True)
+        with open(out_filename, 'w') as f:
+            f.write(res)
+
+
+    def buildDoc(self, standard):
+        """
+            Build the response text for the provided standard markup.
+
+            standard - loaded standard markup
+        """
+        
         s = standard.makeTokenSets(self.is_locorg_allowed)
 
         allowed_tags = ['per', 'org', 'loc']
@@ -71,9 +90,7 @@ class ResponseGenerator:
         for tag in allowed_tags:
             res += self._doBuildResponse(tag, [x for x in s if x.tag == tag])
         
-        os.makedirs(os.path.dirname(out_filename), exist_ok=True)
-        with open(out_filename, 'w') as f:
-            f.write(res)
+        return res
         
                 
     def _doBuildResponse(self, tag, token_sets):
@@ -272,6 +289,7 @@ class MatchingOptimizer:
 
         self.std = std
         self.test = test
+        self.stats = SearchStats()
 
         n_std = len(std)
         n_test = len(test)
@@ -294,7 +312,10 @@ class MatchingOptimizer:
         s_ind = [i for i,x in enumerate(self.std)]
         t_ind = [i for i,x in enumerate(self.test)]
 
-        return self._recursiveSearch(s_ind, t_ind, [])
+        start = time.perf_counter()
+        res = self._recursiveSearch(s_ind, t_ind, [])
+        self.stats.time += time.perf_counter() - start
+        return res
 
 
     def _evaluatePairs(self, pairs):
@@ -341,7 +362,10 @@ class MatchingOptimizer:
         According to the documentation, any perfectly fitting objects MUST be matched"""
         perfect_matches = [t for t in test if self.m[s_index, t] == 1]
         matches = [t for t in test if self.m[s_index, t] != 0] 
-        return perfect_matches if len(perfect_matches) > 0 else matches
+        if len(perfect_matches) > 0:
+            self.stats.pruned += len(matches) - len(perfect_matches)
+            return perfect_matches
+        return matches
 
 
     def _recursiveSearch(self, std, test, pairs):
@@ -357,8 +381,11 @@ class MatchingOptimizer:
         """
         if len(std) == 0 or len(test) == 0:
             # final step, evaluate the matching
+            self.stats.leaves += 1
+            self.stats.max_depth = max(self.stats.max_depth, len(self.std) - len(std))
             return self._evaluatePairs(pairs)
 
+        self.stats.nodes += 1
         curr = std[0]
         max_res = None
 
@@ -383,6 +410,7 @@ class MatchingOptimizer:
                     pair_max_alternatives = alt_count
                 
             if skip_test_object:
+                self.stats.pruned += 1
                 continue
 
             # try to confirm the pair
@@ -456,21 +484,35 @@ def calcMetrics(tp, n_std, n_test):
 #########################################################################################
 # Misc.
 
-def loadAllStandard(path):
-    """Load all standard markup files from the provided directory. Returns a list."""
+def loadAllStandard(path, shard=None):
+    """Load all standard markup files from the provided directory, packed corpus file or
+    .zip/.tar(.gz) archive. If a dialent.common.shard.Shard is provided, only its
+    documents are loaded. Returns a list."""
 
-    names = set([x.split('.')[0] for x in os.listdir(path)])
+    source = openSource(path)
+    names = source.names()
     res = []
-    for name in names:
-        if re.match('book_[0-9]+', name) == None:
-            continue
-        res.append(Standard(name, path))
+    # the documents share the pooled strings
+    with StringPool.scope():
+        for name in names:
+            if re.match('book_[0-9]+', name) == None:
+                continue
+            if shard != None and not shard.contains(name):
+                continue
+            with stage('std load', name):
+                res.append(Standard(name, source))
     
     return sorted(res, key=lambda x: int(x.name[5:]))   # book_XXX - sort by number
 
-def loadAllTest(path):
-    """Load all test markup files from the provided directory. Returns a list"""
-    names = set(x.split('.')[0] for x in os.listdir(path) if '.task1' in x)
-    res = [Test(name, path) for name in names]
+def loadAllTest(path, shard=None):
+    """Load all test markup files from the provided directory or .zip/.tar(.gz) archive.
+    If a dialent.common.shard.Shard is provided, only its documents are loaded.
+    Returns a list"""
+    source = openSource(path)
+    names = [x for x in source.names('.task1') if shard == None or shard.contains(x)]
+    res = []
+    for name in names:
+        with stage('test load', name):
+            res.append(Test(name, source))
     
     return sorted(res, key=lambda x: int(x.name[5:]))   # book_XXX - sort by number
@@ -1,9 +1,13 @@
 ﻿# this module contains evaluation logic for the 2nd task
 
 import os
+import time
 
 from dialent.common.evalmatrix import EvaluationMatrix
-from dialent.common.metrics import Metrics
+from dialent.common.metrics import Metrics, MetricsTable
+from dialent.common.reports import openReports, reportOutput
+from dialent.common.timing import stage
+from dialent.common.util import frozenObjects
 
 from dialent.standard import Standard
 from dialent.task2.test import Test
@@ -21,18 +25,66 @@ class Evaluator:
 
     stat_tags = ['per', 'loc', 'org', 'overall']
 
-    def __init__(self, mode='regular'):
-        """Initialize the object. Mode can be 'regular' or 'simple'"""
+    def __init__(self, mode='regular', cache=None, only_imperfect=False,
+                 report_thread=False, metrics_sink=None):
+        """Initialize the object. Mode can be 'regular' or 'simple'.
+        cache is an optional dialent.common.cache.ResultCache object.
+        If only_imperfect is True, the reports are only written for the documents with
+        imperfect results. If report_thread is True, the reports are written in a
+        background thread while the next documents are evaluated. metrics_sink is an
+        optional dialent.common.sink.MetricsSink the results of every document are
+        written to"""
         assert(mode == 'regular' or mode == 'simple')
         self.mode = mode
-
-
-    def evaluate(self, std_path, test_path, output_path='', is_silent=False):
+        self.cache = cache
+        self.only_imperfect = only_imperfect
+        self.report_thread = report_thread
+        self.report_output = None
+        self.metrics_sink = metrics_sink
+        # per-document metrics of the last evaluation, a
+        # dialent.common.metrics.MetricsTable
+        self.table = None
+        # matching search counters of every evaluated document
+        # {document name : SearchStats}
+        self.search_stats = {}
+
+
+    def evaluate(self, std_path, test_path, output_path='', is_silent=False, shard=None,
+                 partial_path=''):
         """Run evaluation on all files in the given directories.
         If output_path is provided, evaluation reports will be written there.
-        is_silent determines if the result is printed to the output"""
-        std = loadAllStandard(std_path)
-        test = loadAllTest(test_path)
+        is_silent determines if the result is printed to the output.
+        If a dialent.common.shard.Shard is provided, only its documents are evaluated,
+        and the partial results file is saved to partial_path"""
+        std = loadAllStandard(std_path, shard)
+        test = loadAllTest(test_path, shard)
+        documents = [{}] if shard != None else None
+        with frozenObjects():
+            res = Evaluator.evaluateModes([self], std, test, [output_path], is_silent,
+                                          documents)[0]
+        if shard != None:
+            shard.save(partial_path, self, documents[0], output_path)
+        return res
+
+    def evaluateMarkup(self, std, test, output_path='', is_silent=False):
+        """Run evaluation on the loaded lists of standard and test documents.
+        The standard markup is not modified, so it can be shared between evaluations"""
+        return Evaluator.evaluateModes([self], std, test, [output_path], is_silent)[0]
+
+    @classmethod
+    def evaluateModes(cls, evaluators, std, test, output_paths=None, is_silent=False,
+                      documents=None):
+        """Run evaluation on the loaded documents with several evaluators (one per mode)
+        in a single pass. The attribute comparisons are shared between the modes, so
+        they are done only once per document. output_paths is a list of the report
+        folders or archives (see dialent.common.reports) of each evaluator. documents is
+        an optional list of dictionaries, one per evaluator, that receive the metrics
+        dictionary of every evaluated document by name. Returns a list of results of
+        each evaluator"""
+        if output_paths == None:
+            output_paths = [''] * len(evaluators)
+        if documents == None:
+            documents = [None] * len(evaluators)
 
         diff = set([x.name for x in std]).symmetric_difference(
             set([y.name for y in test]))
@@ -41,34 +93,93 @@ class Evaluator:
             print('Warning: missing files :\n  {}'.format('\n  '.join(diff)))
             std = [s for s in std if s.name not in diff]
             test = [t for t in test if t.name not in diff]
-        res = dict((tag, Metrics()) for tag in Evaluator.stat_tags)
-
-        for i, s in enumerate(std):
-            if not s.has_coref:
-                # do not compare documents without a .coref file
-                # this is just for convenience
-                continue
-            m_tuple = self.evaluateDocument(s, test[i])
-            self.printReport(s.name, output_path)
-            for j, tag in enumerate(Evaluator.stat_tags):
-                res[tag].add(m_tuple[j])
+        for e in evaluators:
+            e.table = MetricsTable(Evaluator.stat_tags, max(len(std), 1))
+
+        with reportOutput(evaluators, output_paths):
+            for i, s in enumerate(std):
+                if not s.has_coref:
+                    # do not compare documents without a .coref file
+                    # this is just for convenience
+                    continue
+                comparisons = {}
+                for e, output_path, by_name in zip(evaluators, output_paths, documents):
+                    start = time.perf_counter()
+                    metrics = e.processDocument(s, test[i], output_path, comparisons)
+                    e.table.add(s.name, metrics)
+                    if by_name != None:
+                        by_name[s.name] = metrics
+                    if e.metrics_sink != None:
+                        e.metrics_sink.write(e.modeName(), s.name, metrics,
+                                             e.search_stats.get(s.name),
+                                             time.perf_counter() - start)
             
+        results = [e.table.total() for e in evaluators]
         if not is_silent:
-            print(self.buildMetricsTable(res))
+            for e, res in zip(evaluators, results):
+                print(e.buildMetricsTable(res))
 
-        return res
+        return results
             
-    def evaluateDocument(self, s, t):
+    @classmethod
+    def evaluateDocumentModes(cls, evaluators, s, t, with_reports=False):
+        """Evaluate a single document with several evaluators (one per mode), sharing the
+        attribute comparisons. Returns a list of (metrics dictionary, report) tuples of
+        each evaluator, the reports are only built if with_reports is True and the
+        document is reported (see isReported). Returns None if the document is not
+        evaluated (it has no .coref layer)"""
+        if not s.has_coref:
+            return None
+
+        comparisons = {}
+        res = []
+        for e in evaluators:
+            e.evaluateDocument(s, t, comparisons)
+            is_reported = with_reports and e.isReported(e.metrics_dict)
+            res.append( (e.metrics_dict, e.buildReport() if is_reported else None) )
+
+        return res
+
+    def processDocument(self, s, t, output_path='', comparisons=None):
+        """Evaluate the document and print its report. If the evaluator has a result
+        cache, the results of the unchanged documents are taken from it.
+        Returns the metrics dictionary"""
+        key = None
+        if self.cache != None:
+            key = self.cache.makeKey(self.modeName(), s, t)
+            cached = self.cache.load(key) if key != None else None
+            if cached != None:
+                self.metrics_dict, report = cached
+                self.printReport(s.name, output_path, report)
+                return self.metrics_dict
+
+        self.evaluateDocument(s, t, comparisons)
+        if key != None:
+            report = self.buildReport()
+            self.cache.save(key, self.metrics_dict, report)
+            self.printReport(s.name, output_path, report)
+        else:
+            self.printReport(s.name, output_path)
+
+        return self.metrics_dict
+
+    def evaluateDocument(self, s, t, comparisons=None):
         """Compare standard markup s with test markup t and evaluate T.
+        comparisons is a dictionary of attribute comparison results that can be shared
+        with the evaluation of the same documents in another mode.
         Returns the typical metrics tuple"""
 
         # remove all the nameless entities from the standard markup:
         s_ent = [ent for ent in s.entities if len(ent.attributes) > 0]
 
-        em = EvaluationMatrix(s_ent, t.entities,
-                 EntityQualityCalculator(forgive_extra_values = (self.mode=='simple')))
-        em.findSolution()
+        with stage('matrix', s.name):
+            calc = EntityQualityCalculator(forgive_extra_values = (self.mode=='simple'),
+                                           comparisons = comparisons)
+            em = EvaluationMatrix(s_ent, t.entities, calc)
+        with stage('search', s.name):
+            em.findSolution()
         self.em = em
+        self.search_stats[s.name] = em.stats
 
         self.metrics_tuple = (em.metrics['per'], em.metrics['loc'],
                 em.metrics['org'], em.metrics['overall'])
@@ -76,6 +187,14 @@ class Evaluator:
 
         return self.metrics_tuple
 
+    def modeName(self):
+        """Returns the name of the evaluation mode (as in dialent.leaderboard)"""
+        return 't2' if self.mode == 'regular' else 't2-m'
+
+    def metricTags(self):
+        """Returns the list of the tags of the metrics dictionaries"""
+        return Evaluator.stat_tags
+
     # Metrics and reports
 
     def buildMetricsTable(self, metrics_dict):
@@ -87,31 +206,49 @@ class Evaluator:
 
         return res
 
+    def renderReport(self, record, metrics_dict):
+        """Yields the lines of the detailed comparison report on a document with the
+        given dialent.common.evalmatrix.MatchingRecord and metrics"""
+        yield '------STANDARD------\n'
+        yield from record.describeStd()
+        yield '\n\n'
+        yield '--------TEST--------\n'
+        yield from record.describeTest()
+        yield '\n\n'
+        yield '-------METRICS------\n'
+        yield self.buildMetricsTable(metrics_dict)
+
     def buildReport(self):
         """Builds a detailed comparison report"""
-        res = ''
-        res += '------STANDARD------\n'
-        res += self.em.describeMatchingStd() + '\n\n';
-        res += '--------TEST--------\n'
-        res += self.em.describeMatchingTest() + '\n\n';
-        res += '-------METRICS------\n'
-        res += self.buildMetricsTable(
-                self.metrics_dict
-            )
-
-        return res
+        return ''.join(self.renderReport(self.em.record, self.metrics_dict))
 
-    def printReport(self, name, out_dir):
-        if len(out_dir) == 0:
+    def printReport(self, name, out_dir, report=None):
+        """Print the report on the last evaluated document, unless it is not reported
+        (see isReported). If the report text is not provided, it is rendered while it
+        is written"""
+        if len(out_dir) == 0 or not self.isReported(self.metrics_dict):
             return
 
-        os.makedirs(out_dir, exist_ok=True)
+        filename = self.reportName(name, self.metrics_dict)
+        lines = ([report] if report != None
+                 else self.renderReport(self.em.record, self.metrics_dict))
+        with stage('reports', name):
+            if self.report_output != None and self.report_output.path == out_dir:
+                self.report_output.write(name, filename, lines)
+            else:
+                with openReports(out_dir) as output:
+                    output.write(name, filename, lines)
+
+    def isReported(self, metrics_dict):
+        """Check if the report on the document with the given metrics is written"""
+        return not self.only_imperfect or metrics_dict['overall'].f1 < 1.0
+
+    def reportName(self, name, metrics_dict):
+        """Returns the report file name of the document with the given metrics"""
         true_name = name + '.report.txt'
-        if self.em.metrics['overall'].f1 < 1.0:
+        if metrics_dict['overall'].f1 < 1.0:
             true_name = '_' + true_name
-
-        with open(os.path.join(out_dir, true_name), 'w', encoding='utf-8') as f:
-            f.write(self.buildReport())
+        return true_name
 
         
 #########################################################################################
@@ -126,10 +263,13 @@ class EntityQualityCalculator:
         ('locorg', 'per') : 0, ('locorg', 'org') : 0, ('locorg', 'loc') : 0, ('locorg', 'locorg') : 1
     }
 
-    def __init__(self, forgive_extra_values=False):
+    def __init__(self, forgive_extra_values=False, comparisons=None):
         """Make a new calculator. If forgive_extra_values is True, there will be no
-        penalty for any additional values in test"""
+        penalty for any additional values in test.
+        comparisons is a dictionary where the attribute comparison results are stored,
+        it does not depend on the mode"""
         self.forgive_extra_values = forgive_extra_values
+        self.comparisons = comparisons if comparisons != None else {}
 
 
     def tagMultiplier(self, s, t):
@@ -172,6 +312,21 @@ class EntityQualityCalculator:
         """Calculate final quality that is maximized during the search for the optimal
         matching"""
 
+        key = (s, t)
+        if not key in self.comparisons:
+            self.comparisons[key] = self.compareAttributes(s, t)
+        tp, fn, fp = self.comparisons[key]
+        if self.forgive_extra_values:
+            fp = 0
+
+        d = float(tp + fn + fp)
+
+        return (tp / d) if d > 0 else 0.0
+
+    def compareAttributes(self, s, t):
+        """Compare the attributes of the given entities.
+        Returns a tuple (matched std, unmatched std, unmatched test)"""
+
         unmatched_std = set(s.attributes)
         matched_std = set()
         unmatched_test = set(t.attributes)
@@ -188,13 +343,7 @@ class EntityQualityCalculator:
                     if t_attr in unmatched_test:
                         unmatched_test.remove(t_attr)
 
-        tp = len(matched_std)
-        fp = len(unmatched_test) if not self.forgive_extra_values else 0
-        fn = len(unmatched_std)
-
-        d = float(tp + fn + fp)
-
-        return (tp / d) if d > 0 else 0.0
+        return len(matched_std), len(unmatched_std), len(unmatched_test)
 
     def isIgnored(self, s, t, matching):
         """Check if the matched pair of (s, t) should be ignored within the current
@@ -2,11 +2,13 @@
 
 #########################################################################################
 
-import os
 import csv
+import hashlib
 
-from dialent.common.util import safeOpen
-from dialent.common.util import normalize
+from dialent.common.util import decodeText
+from dialent.common.source import openSource
+from dialent.common.util import normalizeMany
+from dialent.common.util import digestPredictions
 
 from dialent.config import Config
 
@@ -23,31 +25,51 @@ class Test:
         """Load the data from the given document
         
         name - file to load the data from (without an extension)
+        dir - directory, .zip/.tar(.gz) archive or collection object containing the file.
+              If None, the markup is left empty (see fromPredictions)
         """
+        full_name = name + '.task2'
+        # hash of the raw file contents, identifies the document in the result cache
+        self.digest = None
+        if dir == None:
+            self.name = name
+            self.load('', name)
+            return
+
         try:
             self.name = name
-            full_name = os.path.join(dir, name + '.task2')
-            self.load(full_name)
+            source = openSource(dir)
+            full_name = source.location(name, '.task2')
+            data = source.read(name, '.task2')
+            self.digest = hashlib.sha256(data).hexdigest()
+            self.load(decodeText(data, 'utf-8-sig'), full_name)
         except Exception as e:
             print('Failed to load "{}"'.format(full_name))
             print(e)
     
 
-    def load(self, filename):
-        """Do the exception-prone loading"""
+    def load(self, text, filename):
+        """Do the exception-prone loading of the contents of the given file"""
         self.entities = []
 
-        with safeOpen(filename) as f:
-            buffer = ''
-            for raw_line in f:
-                line = normalize(raw_line)
-                if len(line) == 0:
-                    if len(buffer) > 0:
-                        self.entities.append(Entity.fromTest(buffer))
-                        buffer = ''
-                else:
-                    buffer += line + '\n'
-            if len(buffer) > 0:
-                self.entities.append(Entity.fromTest(buffer))
+        buffer = ''
+        for line in normalizeMany(text.split('\n')):
+            if len(line) == 0:
+                if len(buffer) > 0:
+                    self.entities.append(Entity.fromTest(buffer))
+                    buffer = ''
+            else:
+                buffer += line + '\n'
+        if len(buffer) > 0:
+            self.entities.append(Entity.fromTest(buffer))
+
+    @classmethod
+    def fromPredictions(cls, name, entities):
+        """Build the test markup of the document from in-memory predictions instead of
+        a file. entities is a list of dictionaries, see Entity.fromPrediction"""
+        instance = cls(name, None)
+        instance.entities = [Entity.fromPrediction(x) for x in entities]
+        instance.digest = digestPredictions(entities)
+        return instance
                     
                     
\ No newline at end of file
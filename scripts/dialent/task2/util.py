@@ -6,6 +6,9 @@ import os
 import re
 
 from dialent.standard import Standard
+from dialent.common.source import openSource
+from dialent.common.timing import stage
+from dialent.common.util import StringPool
 from dialent.task2.test import Test
 
 #########################################################################################
@@ -22,33 +25,51 @@ class ResponseGenerator:
 
     def createDocumentResponse(self, std, test_path):
         os.makedirs(test_path, exist_ok=True)
-        res = ''
         filename = os.path.join(test_path, std.name + '.task2')
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(self.buildDocumentResponse(std))
+
+    def buildDocumentResponse(self, std):
+        """Returns the response text for the given standard document"""
+        res = ''
         for entity in std.entities:
             if entity.tag != 'unknown':
                 res += entity.toTestString() + '\n\n'
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(res.strip('\n'))
+        return res.strip('\n')
 
 #########################################################################################
 # Misc.
 
-def loadAllStandard(path):
-    """Load all standard markup files from the provided directory. Returns a list."""
+def loadAllStandard(path, shard=None):
+    """Load all standard markup files from the provided directory, packed corpus file or
+    .zip/.tar(.gz) archive. If a dialent.common.shard.Shard is provided, only its
+    documents are loaded. Returns a list."""
 
-    names = set([x.split('.')[0] for x in os.listdir(path)])
+    source = openSource(path)
+    names = source.names()
     res = []
-    for name in names:
-        if re.match('book_[0-9]+', name) == None:
-            continue
-        res.append(Standard(name, path))
+    # the documents share the pooled strings
+    with StringPool.scope():
+        for name in names:
+            if re.match('book_[0-9]+', name) == None:
+                continue
+            if shard != None and not shard.contains(name):
+                continue
+            with stage('std load', name):
+                res.append(Standard(name, source))
     
     return sorted(res, key=lambda x: int(x.name[5:]))   # book_XXX - sort by number
 
-def loadAllTest(path):
-    """Load all test markup files from the provided directory. Returns a list"""
-    names = set(x.split('.')[0] for x in os.listdir(path) if '.task2' in x)
-    res = [Test(name, path) for name in names]
+def loadAllTest(path, shard=None):
+    """Load all test markup files from the provided directory or .zip/.tar(.gz) archive.
+    If a dialent.common.shard.Shard is provided, only its documents are loaded.
+    Returns a list"""
+    source = openSource(path)
+    names = [x for x in source.names('.task2') if shard == None or shard.contains(x)]
+    res = []
+    for name in names:
+        with stage('test load', name):
+            res.append(Test(name, source))
     
     return sorted(res, key=lambda x: int(x.name[5:]))   # book_XXX - sort by number
 
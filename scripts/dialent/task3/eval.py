@@ -1,6 +1,7 @@
 ﻿# This module contains task 3 evaluation logic
 
 import os
+import time
 
 from dialent.config import Tables
 
@@ -8,7 +9,12 @@ from dialent.standard import Standard
 from dialent.task3.test import Test
 
 from dialent.objects.fact import Fact
-from dialent.common.metrics import Metrics
+from dialent.common.metrics import Metrics, MetricsTable
+from dialent.common.stats import SearchStats
+from dialent.common.reports import openReports, reportOutput
+from dialent.common import timing
+from dialent.common.timing import stage
+from dialent.common.util import frozenObjects
 
 from dialent.task3.util import loadAllStandard
 from dialent.task3.util import loadAllTest
@@ -23,104 +29,257 @@ class Evaluator:
     # Tags used in statistics (everything but the ignored 'IsPartOf')
     stat_tags = ['ownership', 'occupation', 'meeting', 'deal', 'overall']
 
-    def __init__(self, hard_mode=False):
+    def __init__(self, hard_mode=False, cache=None, only_imperfect=False,
+                 report_thread=False, metrics_sink=None):
+        """Initialize the object. cache is an optional
+        dialent.common.cache.ResultCache object. If only_imperfect is True, the reports
+        are only written for the documents with imperfect results. If report_thread is
+        True, the reports are written in a background thread while the next documents
+        are evaluated. metrics_sink is an optional dialent.common.sink.MetricsSink the
+        results of every document are written to"""
         self.hard_mode = hard_mode
-
-    def evaluate(self, std_path, test_path, output_path, is_silent=False):
-        if not is_silent:
+        self.cache = cache
+        self.only_imperfect = only_imperfect
+        self.report_thread = report_thread
+        self.report_output = None
+        self.metrics_sink = metrics_sink
+        # per-document metrics of the last evaluation, a
+        # dialent.common.metrics.MetricsTable
+        self.table = None
+        # matching search counters of every evaluated document
+        # {document name : SearchStats}
+        self.search_stats = {}
+
+    def evaluate(self, std_path, test_path, output_path, is_silent=False, shard=None,
+                 partial_path=''):
+        """Run evaluation on all files in the given directories. If a
+        dialent.common.shard.Shard is provided, only its documents are evaluated, and
+        the partial results file is saved to partial_path"""
+        if not is_silent and timing.active == None:
+            # the profiler prints the progress instead
             print('Running evaluation, this might take a while...')
-        std = loadAllStandard(std_path)
-        test = loadAllTest(test_path)
-        
+        std = loadAllStandard(std_path, shard)
+        test = loadAllTest(test_path, shard)
+        documents = [{}] if shard != None else None
+        with frozenObjects():
+            res = Evaluator.evaluateModes([self], std, test, [output_path], is_silent,
+                                          documents)[0]
+        if shard != None:
+            shard.save(partial_path, self, documents[0], output_path)
+        return res
+
+    def evaluateMarkup(self, std, test, output_path='', is_silent=False):
+        """Run evaluation on the loaded lists of standard and test documents.
+        The standard markup is not modified, so it can be shared between evaluations"""
+        return Evaluator.evaluateModes([self], std, test, [output_path], is_silent)[0]
+
+    @classmethod
+    def evaluateModes(cls, evaluators, std, test, output_paths=None, is_silent=False,
+                      documents=None):
+        """Run evaluation on the loaded documents with several evaluators (one per mode)
+        in a single pass. The argument comparisons are shared between the modes, so they
+        are done only once per document. output_paths is a list of the report folders or
+        archives (see dialent.common.reports) of each evaluator. documents is an
+        optional list of dictionaries, one per evaluator, that receive the metrics
+        dictionary of every evaluated document by name. Returns a list of results of
+        each evaluator"""
+        if output_paths == None:
+            output_paths = [''] * len(evaluators)
+        if documents == None:
+            documents = [None] * len(evaluators)
+
         diff = set([x.name for x in std]).symmetric_difference(
             set([y.name for y in test]))
 
         assert(len(diff) == 0)
-        res = dict((x, Metrics()) for x in Evaluator.stat_tags)
-
-        for i, s in enumerate(std):
-            if not s.has_facts:
-                # do not compare documents without a .facts file
-                # this is just for convenience
-                continue
-            metrics = self.evaluateDocument(s, test[i])
-            self.printReport(s.name, output_path)
-            for tag in Evaluator.stat_tags:
-                res[tag].add(metrics[tag])
+        for e in evaluators:
+            e.table = MetricsTable(Evaluator.stat_tags, max(len(std), 1))
+
+        timing.progress(0, len(std))
+        with reportOutput(evaluators, output_paths):
+            for i, s in enumerate(std):
+                if not s.has_facts:
+                    # do not compare documents without a .facts file
+                    # this is just for convenience
+                    continue
+                matcher = ArgumentMatcher()
+                for e, output_path, by_name in zip(evaluators, output_paths, documents):
+                    start = time.perf_counter()
+                    metrics = e.processDocument(s, test[i], output_path, matcher)
+                    e.table.add(s.name, metrics)
+                    if by_name != None:
+                        by_name[s.name] = metrics
+                    if e.metrics_sink != None:
+                        e.metrics_sink.write(e.modeName(), s.name, metrics,
+                                             e.search_stats.get(s.name),
+                                             time.perf_counter() - start)
+                timing.progress(i + 1, len(std))
             
+        results = [e.table.total() for e in evaluators]
         if not is_silent:
-            print('TAG             ' + Metrics.header())
-            for tag in Evaluator.stat_tags:
-                print('{:15} '.format(tag) + res[tag].toLine())
+            for e, res in zip(evaluators, results):
+                print(e.buildMetricsTable(res))
+
+        return results
+
+    @classmethod
+    def evaluateDocumentModes(cls, evaluators, std, test, with_reports=False):
+        """Evaluate a single document with several evaluators (one per mode), sharing the
+        argument comparisons. Returns a list of (metrics dictionary, report) tuples of
+        each evaluator, the reports are only built if with_reports is True and the
+        document is reported (see isReported). Returns None if the document is not
+        evaluated (it has no .facts layer)"""
+        if not std.has_facts:
+            return None
+
+        matcher = ArgumentMatcher()
+        res = []
+        for e in evaluators:
+            e.evaluateDocument(std, test, matcher)
+            is_reported = with_reports and e.isReported(e.metrics)
+            res.append( (e.metrics, e.buildReport() if is_reported else None) )
 
         return res
 
-    def evaluateDocument(self, std, test):
+    def processDocument(self, std, test, output_path='', matcher=None):
+        """Evaluate the document and print its report. If the evaluator has a result
+        cache, the results of the unchanged documents are taken from it.
+        Returns the metrics dictionary"""
+        key = None
+        if self.cache != None:
+            key = self.cache.makeKey(self.modeName(), std, test)
+            cached = self.cache.load(key) if key != None else None
+            if cached != None:
+                self.metrics, report = cached
+                self.printReport(std.name, output_path, report)
+                return self.metrics
+
+        self.evaluateDocument(std, test, matcher)
+        if key != None:
+            report = self.buildReport()
+            self.cache.save(key, self.metrics, report)
+            self.printReport(std.name, output_path, report)
+        else:
+            self.printReport(std.name, output_path)
+
+        return self.metrics
+
+    def evaluateDocument(self, std, test, matcher=None):
+        """Evaluate the test markup of the document. matcher is an ArgumentMatcher that
+        can be shared with the evaluation of the same document in another mode"""
+        if matcher == None:
+            matcher = ArgumentMatcher()
         self.metrics = dict((x, Metrics()) for x in Evaluator.stat_tags)
         self.clusters = []
+        stats = SearchStats()
         for tag in Evaluator.stat_tags:
             if tag == 'overall':
                 continue
             tag_std = [s for s in std.facts if s.tag == tag]
             tag_test = [t for t in test.facts if t.tag == tag]
-            self.optimizer = Optimizer(tag_std, tag_test, self.hard_mode)
-            self.optimizer.findSolution()
+            with stage('matrix', std.name):
+                self.optimizer = Optimizer(tag_std, tag_test, self.hard_mode, matcher)
+            with stage('search', std.name):
+                self.optimizer.findSolution()
             
             self.metrics[tag].add(self.optimizer.metrics)
             self.metrics['overall'].add(self.optimizer.metrics)
             self.clusters.extend(self.optimizer.clusters)
+            stats.add(self.optimizer.stats)
         
+        self.search_stats[std.name] = stats
         return self.metrics
 
+    def modeName(self):
+        """Returns the name of the evaluation mode (as in dialent.leaderboard)"""
+        return 't3-m' if self.hard_mode else 't3'
+
+    def metricTags(self):
+        """Returns the list of the tags of the metrics dictionaries"""
+        return Evaluator.stat_tags
+
+    def buildMetricsTable(self, metrics_dict):
+        """Build a table from the provided metrics for the output"""
+        res = 'TAG             ' + Metrics.header()
+        for tag in Evaluator.stat_tags:
+            res += '\n{:15} '.format(tag) + metrics_dict[tag].toLine()
+
+        return res
+
+    def renderReport(self, clusters, metrics):
+        """Yields the lines of the evaluation report on a document with the given
+        clusters and metrics"""
+        return Optimizer.describeLines(clusters, metrics)
+
     def buildReport(self):
         """Build an evaluation report"""
-        return self.optimizer.describeMatching(self.clusters, self.metrics)
+        return ''.join(self.renderReport(self.clusters, self.metrics))
 
-    def printReport(self, name, out_dir):
-        """Print a detailed report on the document evaluation"""
-        if len(out_dir) == 0:
+    def printReport(self, name, out_dir, report=None):
+        """Print a detailed report on the document evaluation, unless it is not reported
+        (see isReported). If the report text is not provided, it is rendered while it
+        is written"""
+        if len(out_dir) == 0 or not self.isReported(self.metrics):
             return
 
-        os.makedirs(out_dir, exist_ok=True)
-        with open(os.path.join(out_dir, name + '.report.txt'), 'w', encoding='utf-8') as f:
-            f.write(self.buildReport())
+        filename = self.reportName(name, self.metrics)
+        lines = ([report] if report != None
+                 else self.renderReport(self.clusters, self.metrics))
+        with stage('reports', name):
+            if self.report_output != None and self.report_output.path == out_dir:
+                self.report_output.write(name, filename, lines)
+            else:
+                with openReports(out_dir) as output:
+                    output.write(name, filename, lines)
+
+    def isReported(self, metrics_dict):
+        """Check if the report on the document with the given metrics is written"""
+        return not self.only_imperfect or metrics_dict['overall'].f1 < 1.0
+
+    def reportName(self, name, metrics_dict):
+        """Returns the report file name of the document"""
+        return name + '.report.txt'
 
 class Optimizer:
     """Optimizes the matching"""
 
-    def __init__(self, std, test, hard_mode):
+    def __init__(self, std, test, hard_mode, matcher=None):
         self.test = test
         self.hard_mode = hard_mode
+        self.matcher = matcher if matcher != None else ArgumentMatcher()
 
         if hard_mode:
             # hard mode, remove all facts with modality other than 'actual'
             self.std = [x for x in std if not x.has_easymode_modality]
         else:
             # easy mode, ignore all facts marked as difficult, and remove phase argument
-            self.std = std
-            for fact in self.std:
-                if fact.has_hardmode_difficulty:
-                    fact.is_ignored = True
-                fact.removePhase()
+            self.std = [x.makeEasyModeCopy() for x in std]
 
+        self.stats = SearchStats()
         self.findPossibleMatches()
 
     def findPossibleMatches(self):
         """Initialize the compatability table of test and standard objects"""
         self.possible_matches = []
         for t in self.test:
-            self.possible_matches.append([s for s in self.std if s.canMatch(t)])
+            self.possible_matches.append(
+                [s for s in self.std if self.matcher.canMatchFacts(s, t)])
 
     def findSolution(self):
+        start = time.perf_counter()
         self.metrics, self.clusters = self.recursiveSearch(self.test, self.possible_matches, [])
+        self.stats.time += time.perf_counter() - start
 
     def recursiveSearch(self, test, matches, indices):
         if len(test) == 0:
             assert(len(indices) == len(self.test))
+            self.stats.leaves += 1
+            self.stats.max_depth = max(self.stats.max_depth, len(indices))
             self.clusters = self.buildClusters(indices)
             self.metrics = self.evaluate(self.clusters)
             return self.metrics, self.clusters
 
+        self.stats.nodes += 1
         m_best, c_best = None, []
         t = test[0]
         index = self.test.index(t)
@@ -159,7 +318,7 @@ class Optimizer:
         q_test = dict([(t,-1) for t in self.test])
 
         for c in clusters:
-            c.calculateQuality()
+            c.calculateQuality(self.matcher)
             q_std[c.std] = c.quality
             for t in c.test:
                 assert(q_test[t] == -1)
@@ -185,17 +344,44 @@ class Optimizer:
 
     def describeMatching(self, clusters, metrics):
         """Returns a string description of the matching this optimizer built"""
-        res = ''
+        return ''.join(Optimizer.describeLines(clusters, metrics))
+
+    @classmethod
+    def describeLines(cls, clusters, metrics):
+        """Yields the lines of the description of the matching clusters"""
         for i, c in enumerate(clusters):
-            res += '---- #{} ----\n'.format(i+1)
-            res += c.toInlineString() + '\n'
-        res += '\n\n'
-        res += '-------METRICS------\n'
-        res += 'TAG             ' + Metrics.header() + '\n'
+            yield '---- #{} ----\n'.format(i+1)
+            yield c.toInlineString() + '\n'
+        yield '\n\n'
+        yield '-------METRICS------\n'
+        yield 'TAG             ' + Metrics.header() + '\n'
         for tag in Evaluator.stat_tags:
-            res += '{:15} '.format(tag) + metrics[tag].toLine() + '\n'
+            yield '{:15} '.format(tag) + metrics[tag].toLine() + '\n'
+
+
+#########################################################################################
+
+class ArgumentMatcher:
+    """Compares the standard and test fact arguments and remembers the results. The
+    results do not depend on the evaluation mode, so a single object can be shared by
+    all the evaluations of a document"""
+
+    def __init__(self):
+        self.table = {}
+
+    def canMatch(self, s, t):
+        """Check if the standard argument s can match the test argument t"""
+        key = (s, t)
+        res = self.table.get(key)
+        if res == None:
+            res = s.canMatch(t)
+            self.table[key] = res
         return res
 
+    def canMatchFacts(self, s, t):
+        """Check if the standard fact s can match the test fact t, the same way as
+        Fact.canMatch does"""
+        return s.canMatch(t, self.canMatch)
 
 #########################################################################################
 
@@ -215,12 +401,13 @@ class Cluster:
         
         self.test.append(test_obj)
         
-    def calculateQuality(self):
-        """Calculate quality"""
-        self._doCalculateQuality()
+    def calculateQuality(self, matcher=None):
+        """Calculate quality. matcher is an ArgumentMatcher used for the argument
+        comparisons"""
+        self._doCalculateQuality(matcher if matcher != None else ArgumentMatcher())
         self.quality = (self.arg_quality + self.id_quality * self.arg_quality) / 2.0
 
-    def _doCalculateQuality(self):
+    def _doCalculateQuality(self, matcher):
         """Calculates the matchings argument extraction and identification quality"""
         t_args = []
         for t in self.test:
@@ -245,7 +432,7 @@ class Cluster:
         for t in t_args:
             found_match = False
             for s in self.std.arguments:
-                if s.canMatch(t):
+                if matcher.canMatch(s, t):
                     found_match = True
                     if s in self.unmatched_s_args:
                         self.unmatched_s_args.remove(s)
@@ -2,10 +2,12 @@
 
 #########################################################################################
 
-import os
+import hashlib
 
-from dialent.common.util import normalize
-from dialent.common.util import safeOpen
+from dialent.common.util import normalizeMany
+from dialent.common.util import decodeText
+from dialent.common.util import digestPredictions
+from dialent.common.source import openSource
 
 from dialent.objects.fact import Fact
 
@@ -18,30 +20,51 @@ class Test:
         """Load the data from the given document
         
         name - file to load the data from (without an extension)
+        dir - directory, .zip/.tar(.gz) archive or collection object containing the file.
+              If None, the markup is left empty (see fromPredictions)
         """
+        full_name = name + '.task3'
+        # hash of the raw file contents, identifies the document in the result cache
+        self.digest = None
+        if dir == None:
+            self.name = name
+            self.load('', name)
+            return
+
         try:
             self.name = name
-            full_name = os.path.join(dir, name + '.task3')
-            self.load(full_name)
+            source = openSource(dir)
+            full_name = source.location(name, '.task3')
+            data = source.read(name, '.task3')
+            self.digest = hashlib.sha256(data).hexdigest()
+            self.load(decodeText(data, 'utf-8-sig'), full_name)
         except Exception as e:
             print('Failed to load "{}"'.format(full_name))
             print(e)
     
 
-    def load(self, filename):
-        """Do the exception-prone loading"""
+    def load(self, text, filename):
+        """Do the exception-prone loading of the contents of the given file"""
         self.facts = []
 
-        with safeOpen(filename) as f:
-            buffer = ''
-            for raw_line in f:
-                line = normalize(raw_line)
-                if len(line) == 0:
-                    if len(buffer) > 0:
-                        self.facts.append(Fact.fromTest(buffer))
-                        buffer = ''
-                else:
-                    buffer += line + '\n'
-            if len(buffer) > 0:
-                self.facts.append(Fact.fromTest(buffer))
+        buffer = ''
+        for line in normalizeMany(text.split('\n')):
+            if len(line) == 0:
+                if len(buffer) > 0:
+                    self.facts.append(Fact.fromTest(buffer))
+                    buffer = ''
+            else:
+                buffer += line + '\n'
+        if len(buffer) > 0:
+            self.facts.append(Fact.fromTest(buffer))
+
+    @classmethod
+    def fromPredictions(cls, name, facts):
+        """Build the test markup of the document from in-memory predictions instead of
+        a file. facts is a list of dictionaries, see Fact.fromPrediction"""
+        instance = cls(name, None)
+        instance.facts = [Fact.fromPrediction(x) for x in facts]
+        instance.digest = digestPredictions(facts)
+        return instance
+
                     
@@ -4,6 +4,8 @@ import os
 
 from dialent.task2.util import loadAllStandard
 from dialent.task3.test import Test
+from dialent.common.source import openSource
+from dialent.common.timing import stage
 
 from dialent.objects.argument import StringValue
 
@@ -27,23 +29,32 @@ class ResponseGenerator:
         filename"""
 
         print('Processing {}'.format(std.name))
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(self.buildDoc(std))
+
+    def buildDoc(self, std):
+        """Returns the response text for the given standard markup"""
         res = ''
 
         for fact in std.facts:
             res += fact.toTestString() + '\n'
 
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(res)
+        return res
 
 #########################################################################################
 # various utility methods
 
-def loadAllTest(path):
-    """Load all test files from test_path. Returns a list of dialent.task3.test.Test
-    objects"""
+def loadAllTest(path, shard=None):
+    """Load all test files from the given directory or .zip/.tar(.gz) archive. If a
+    dialent.common.shard.Shard is provided, only its documents are loaded. Returns a
+    list of dialent.task3.test.Test objects"""
     
-    names = set(x.split('.')[0] for x in os.listdir(path) if '.task3' in x)
-    res = [Test(name, path) for name in names]
+    source = openSource(path)
+    names = [x for x in source.names('.task3') if shard == None or shard.contains(x)]
+    res = []
+    for name in names:
+        with stage('test load', name):
+            res.append(Test(name, source))
     
     return sorted(res, key=lambda x: int(x.name[5:]))   # book_XXX - sort by number
 
@@ -0,0 +1,101 @@
+# Runs the evaluation of a response on the evaluation service (see eval_server.py)
+# Requires python 3
+
+# Usage:
+#
+#   <Python3 executable> eval_client.py -s <set> -t <test_dir> [-m <modes>] [-o <output_dir>]
+#                                       [-i] [-p <port> | -u <socket>]
+#       -s [set]        - name of the standard set loaded by the service (e.g. devset)
+#       -t [test_dir]   - path to the response files directory or archive
+#       -m [modes]      - comma-separated list of the evaluated modes
+#                         (default: t1,t1-l,t2,t2-m,t3,t3-m)
+#       -o [output_dir] - path to the reports folder (written by the service)
+#       -i              - send the response files to the service instead of the path
+#       -p [port]       - localhost TCP port of the service (default: 8016)
+#       -u [socket]     - path of the Unix socket of the service instead of the port
+#       -h              - display this message
+#
+# The metrics tables are printed as the results arrive, the same way the evaluation
+# scripts print them
+
+#########################################################################################
+
+import sys
+import getopt
+
+from dialent.service import EvaluationClient, default_port
+
+#########################################################################################
+
+def usage():
+    print('Usage:')
+    print('<Python3 executable> eval_client.py -s <set> -t <test_dir> [-m <modes>] [-o <output_dir>]')
+    print('                                    [-i] [-p <port> | -u <socket>]')
+    print('    -s [set]        - name of the standard set loaded by the service (e.g. devset)')
+    print('    -t [test_dir]   - path to the response files directory or archive')
+    print('    -m [modes]      - comma-separated list of the evaluated modes')
+    print('                      (default: t1,t1-l,t2,t2-m,t3,t3-m)')
+    print('    -o [output_dir] - path to the reports folder (written by the service)')
+    print('    -i              - send the response files to the service instead of the path')
+    print('    -p [port]       - localhost TCP port of the service (default: {})'.format(
+        default_port))
+    print('    -u [socket]     - path of the Unix socket of the service instead of the port')
+    print('    -h              - display this message')
+
+def main():
+    """
+        Runs comparison
+    """
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 's:t:m:o:ip:u:h')
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+        sys.exit(2)
+
+    set_name = None
+    test_path = None
+    modes = None
+    out_path = ''
+    is_inline = False
+    port = default_port
+    unix_path = None
+    for o, a in opts:
+        if o == '-h':
+            usage()
+            sys.exit()
+        elif o == '-s':
+            set_name = a
+        elif o == '-t':
+            test_path = a
+        elif o == '-m':
+            modes = a.split(',')
+        elif o == '-o':
+            out_path = a
+        elif o == '-i':
+            is_inline = True
+        elif o == '-p':
+            port = int(a)
+        elif o == '-u':
+            unix_path = a
+        else:
+            assert False, 'unhandled option'
+
+    assert set_name != None and test_path != None, 'Standard set and test path must be'\
+        ' set (see python eval_client.py -h)'
+
+    client = EvaluationClient(port=port, unix_path=unix_path)
+    job = EvaluationClient.makeJob(set_name, test_path, modes, out_path, is_inline)
+    for reply in client.run(job):
+        if reply['status'] == 'queued' and reply['position'] > 0:
+            print('Queued, {} job(s) ahead'.format(reply['position']), flush=True)
+        elif reply['status'] == 'result':
+            if modes == None or len(modes) > 1:
+                print(reply['mode'])
+            print(reply['table'], flush=True)
+        elif reply['status'] == 'error':
+            print('Error: {}'.format(reply['message']))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
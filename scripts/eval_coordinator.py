@@ -0,0 +1,121 @@
+# Runs a distributed evaluation of a response on the workers (see eval_worker.py)
+# Requires python 3 and numpy
+
+# Usage:
+#
+#   <Python3 executable> eval_coordinator.py -t <test_dir> -m <modes> [-o <output_dir>]
+#                                            [-w <host>:<port>]* [--local <N> -s <std_dir>]
+#                                            [-r <retries>] [--timeout <seconds>]
+#       -t [test_dir]    - path to the response files directory or archive
+#       -m [modes]       - comma-separated list of the evaluated modes of a single track
+#                          (e.g. t1,t1-l)
+#       -o [output_dir]  - path to the reports folder. With several modes the reports of
+#                          each mode are written to a subfolder named by the mode
+#       -w [host]:[port] - address of a worker
+#       --local [N]      - start N workers on localhost for this evaluation
+#       -s [std_dir]     - path to the standard files directory or archive for the local
+#                          workers
+#       -r [retries]     - number of times a failed document is sent again (default: 2)
+#       --timeout [sec]  - time a worker is given for a document (default: 600)
+#       -h               - display this message
+#
+# The metrics tables are exactly the ones the evaluation scripts print
+
+#########################################################################################
+
+import sys
+import getopt
+
+from dialent.leaderboard import Leaderboard
+from dialent.distributed import Coordinator, startLocalWorkers
+
+#########################################################################################
+
+def usage():
+    print('Usage:')
+    print('<Python3 executable> eval_coordinator.py -t <test_dir> -m <modes> [-o <output_dir>]')
+    print('                                         [-w <host>:<port>]* [--local <N> -s <std_dir>]')
+    print('                                         [-r <retries>] [--timeout <seconds>]')
+    print('    -t [test_dir]    - path to the response files directory or archive')
+    print('    -m [modes]       - comma-separated list of the evaluated modes of a single track')
+    print('                       (e.g. t1,t1-l)')
+    print('    -o [output_dir]  - path to the reports folder. With several modes the reports of')
+    print('                       each mode are written to a subfolder named by the mode')
+    print('    -w [host]:[port] - address of a worker')
+    print('    --local [N]      - start N workers on localhost for this evaluation')
+    print('    -s [std_dir]     - path to the standard files directory or archive for the local')
+    print('                       workers')
+    print('    -r [retries]     - number of times a failed document is sent again (default: 2)')
+    print('    --timeout [sec]  - time a worker is given for a document (default: 600)')
+    print('    -h               - display this message')
+
+def main():
+    """
+        Runs comparison
+    """
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 't:m:o:w:s:r:h', ['local=', 'timeout='])
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+        sys.exit(2)
+
+    test_path = None
+    modes = None
+    out_path = ''
+    addresses = []
+    n_local = 0
+    std_path = None
+    retries = 2
+    timeout = 600
+    for o, a in opts:
+        if o == '-h':
+            usage()
+            sys.exit()
+        elif o == '-t':
+            test_path = a
+        elif o == '-m':
+            modes = a.split(',')
+        elif o == '-o':
+            out_path = a
+        elif o == '-w':
+            host, port = a.rsplit(':', 1)
+            addresses.append( (host, int(port)) )
+        elif o == '--local':
+            n_local = int(a)
+        elif o == '-s':
+            std_path = a
+        elif o == '-r':
+            retries = int(a)
+        elif o == '--timeout':
+            timeout = float(a)
+        else:
+            assert False, 'unhandled option'
+
+    assert test_path != None and modes != None, 'Test path and modes must be set'\
+        ' (see python eval_coordinator.py -h)'
+    assert len(addresses) > 0 or n_local > 0, 'Workers must be set'\
+        ' (see python eval_coordinator.py -h)'
+    assert n_local == 0 or std_path != None, 'Standard path must be set for the local'\
+        ' workers (see python eval_coordinator.py -h)'
+
+    processes = []
+    try:
+        if n_local > 0:
+            processes, local_addresses = startLocalWorkers(std_path, n_local)
+            addresses.extend(local_addresses)
+
+        coordinator = Coordinator(addresses, retries, timeout)
+        res = coordinator.evaluate(test_path, modes, out_path)
+    finally:
+        for p in processes:
+            p.terminate()
+            p.wait()
+
+    for mode in modes:
+        if len(modes) > 1:
+            print(mode)
+        print(Leaderboard.createEvaluator(mode).buildMetricsTable(res[mode]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# Runs the evaluation service that keeps the standard markup loaded
+# Requires python 3 and numpy
+
+# Usage:
+#
+#   <Python3 executable> eval_server.py [-s <name>=<std_dir>]* [-p <port> | -u <socket>]
+#                                       [-w <workers>] [-c <cache_dir>]
+#       -s [name]=[std_dir] - standard set name and the path to its files directory
+#                             (default: devset and testset of this repository)
+#       -p [port]           - localhost TCP port to listen on (default: 8016)
+#       -u [socket]         - path of the Unix socket to listen on instead of the port
+#       -w [workers]        - number of the worker processes (default: 2)
+#       -c [cache_dir]      - path to the result cache folder
+#       -h                  - display this message
+#
+# The jobs are sent with eval_client.py, see dialent/service.py for the protocol
+
+#########################################################################################
+
+import sys
+import os
+import getopt
+import asyncio
+
+from dialent.service import EvaluationServer, default_port
+
+#########################################################################################
+
+def usage():
+    print('Usage:')
+    print('<Python3 executable> eval_server.py [-s <name>=<std_dir>]* [-p <port> | -u <socket>]')
+    print('                                    [-w <workers>] [-c <cache_dir>]')
+    print('    -s [name]=[std_dir] - standard set name and the path to its files directory')
+    print('                          (default: devset and testset of this repository)')
+    print('    -p [port]           - localhost TCP port to listen on (default: {})'.format(
+        default_port))
+    print('    -u [socket]         - path of the Unix socket to listen on instead of the port')
+    print('    -w [workers]        - number of the worker processes (default: 2)')
+    print('    -c [cache_dir]      - path to the result cache folder')
+    print('    -h                  - display this message')
+
+def main():
+    """
+        Runs the service
+    """
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 's:p:u:w:c:h')
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+        sys.exit(2)
+
+    std_paths = {}
+    port = default_port
+    unix_path = None
+    workers = 2
+    cache_path = None
+    for o, a in opts:
+        if o == '-h':
+            usage()
+            sys.exit()
+        elif o == '-s':
+            assert '=' in a, 'Standard sets must be given as <name>=<std_dir>'
+            name, path = a.split('=', 1)
+            std_paths[name] = path
+        elif o == '-p':
+            port = int(a)
+        elif o == '-u':
+            unix_path = a
+        elif o == '-w':
+            workers = int(a)
+        elif o == '-c':
+            cache_path = a
+        else:
+            assert False, 'unhandled option'
+
+    if len(std_paths) == 0:
+        root = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+        for name in ['devset', 'testset']:
+            std_paths[name] = os.path.normpath(os.path.join(root, name))
+
+    server = EvaluationServer(std_paths, workers, cache_path)
+    try:
+        asyncio.run(server.serve(port=port, unix_path=unix_path))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
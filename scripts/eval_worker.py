@@ -0,0 +1,69 @@
+# Runs a distributed evaluation worker that keeps the standard markup loaded
+# Requires python 3 and numpy
+
+# Usage:
+#
+#   <Python3 executable> eval_worker.py -s <std_dir> [-a <host>] [-p <port>]
+#       -s [std_dir]  - path to the standard files directory or archive
+#       -a [host]     - host name or address to listen on (default: localhost)
+#       -p [port]     - TCP port to listen on, 0 selects a free one (default: 8017)
+#       -h            - display this message
+#
+# The documents are sent by eval_coordinator.py, see dialent/distributed.py for the
+# protocol
+
+#########################################################################################
+
+import sys
+import getopt
+
+from dialent.distributed import Worker, default_port
+
+#########################################################################################
+
+def usage():
+    print('Usage:')
+    print('<Python3 executable> eval_worker.py -s <std_dir> [-a <host>] [-p <port>]')
+    print('    -s [std_dir]  - path to the standard files directory or archive')
+    print('    -a [host]     - host name or address to listen on (default: localhost)')
+    print('    -p [port]     - TCP port to listen on, 0 selects a free one (default: {})'
+          .format(default_port))
+    print('    -h            - display this message')
+
+def main():
+    """
+        Runs the worker
+    """
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 's:a:p:h')
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+        sys.exit(2)
+
+    std_path = None
+    host = 'localhost'
+    port = default_port
+    for o, a in opts:
+        if o == '-h':
+            usage()
+            sys.exit()
+        elif o == '-s':
+            std_path = a
+        elif o == '-a':
+            host = a
+        elif o == '-p':
+            port = int(a)
+        else:
+            assert False, 'unhandled option'
+
+    assert std_path != None, 'Standard path must be set (see python eval_worker.py -h)'
+
+    worker = Worker(std_path)
+    try:
+        worker.serve(host, port)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
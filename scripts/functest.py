@@ -1,9 +1,28 @@
 # This module contains evaluators own functionality testing logic
 
+import io
 import os
+import json
+import shutil
+import tarfile
+import zipfile
+import contextlib
+import csv
 
 from dialent.standard import Standard
 
+from dialent.common.util import normalize, safeNormalize, normalizeMany
+from dialent.common.metrics import Metrics, MetricsTable
+from dialent.common.sink import MetricsSink
+from dialent.common.cache import ResultCache
+from dialent.common.shard import Shard
+from dialent.common.source import openSource
+from dialent.common.packed import packDirectory
+from dialent.common.reports import ReportArchiveReader
+
+from dialent.leaderboard import Leaderboard
+from dialent.predictions import PredictionEvaluator
+
 from dialent.task1.test import Test as Test1
 from dialent.task1.eval import Evaluator as Eval1
 
@@ -17,20 +36,20 @@ from dialent.task3.eval import Evaluator as Eval3
 
 eps = 0.01
 
-def createEvaluator(task, mode):
+def createEvaluator(task, mode, cache=None):
     """Create an evaluator corresponding to the given task/mode combination"""
     if task == 1 and mode == '-':
-        return Eval1()
+        return Eval1(True, cache)
     elif task == 1 and mode == 'l':
-        return Eval1(False)
+        return Eval1(False, cache)
     elif task == 2 and mode == '-':
-        return Eval2('regular')
+        return Eval2('regular', cache)
     elif task == 2 and mode == 'm':
-        return Eval2('simple')
+        return Eval2('simple', cache)
     elif task == 3 and mode == '-':
-        return Eval3()
+        return Eval3(False, cache)
     elif task == 3 and mode == 'm':
-        return Eval3(True)
+        return Eval3(True, cache)
     else:
         print('Unacceptable task/mode combination : {}/{}'.format(task, mode))
         return None
@@ -82,6 +101,16 @@ class TestManager:
 
                 self.tests.append(FuncTest(meaningful, self))
 
+        self.tests.append(NormalizationTest(self))
+        self.tests.append(LeaderboardUpdateTest(self))
+        self.tests.append(PredictionCacheTest(self))
+        self.tests.append(ShardMergeTest(self))
+        self.tests.append(CollectionFormatTest(self))
+        self.tests.append(ResultCacheTest(self))
+        self.tests.append(ReportArchiveTest(self))
+        self.tests.append(MetricsSinkTest(self))
+        self.tests.append(MetricsTableTest(self))
+
     def runTest(self, name):
         """Run test or tests with the given name"""
         tests = [x for x in self.tests if name == x.name]
@@ -143,6 +172,487 @@ class FuncTest:
             'N/A' if self.is_ok == None else ('SUCCESS' if self.is_ok else 'FAIL!')
             )
 
+def sameMetrics(a, b):
+    """Check if the two metrics dictionaries have the same counters for every tag"""
+    counters = lambda m: [m.tp_std, m.tp_test, m.n_std, m.n_test]
+    return a.keys() == b.keys() and all(counters(a[x]) == counters(b[x]) for x in a)
+
+def archiveFolders(filename, folders):
+    """Store the files of the folders {folder name in the archive : folder path} in a .zip
+    or .tar.gz archive"""
+    with contextlib.ExitStack() as stack:
+        if filename.endswith('.zip'):
+            archive = stack.enter_context(zipfile.ZipFile(filename, 'w'))
+            add = archive.write
+        else:
+            archive = stack.enter_context(tarfile.open(filename, 'w:gz'))
+            add = archive.add
+        for folder, path in sorted(folders.items()):
+            for x in sorted(os.listdir(path)):
+                add(os.path.join(path, x), folder + '/' + x)
+
+def referenceSafeNormalize(string):
+    """Straightforward version of dialent.common.util.safeNormalize"""
+    res = string.lower().strip(' \r\n\t')
+    for s in '«»“”„':
+        res = res.replace(s, '"')
+    for s in '’`':
+        res = res.replace(s, "'")
+    res = res.replace('ё', 'е')
+    for s in '-‐−‒–—―':
+        res = res.replace(s, '-')
+    return res
+
+def referenceNormalize(string):
+    """Straightforward version of dialent.common.util.normalize"""
+    res = referenceSafeNormalize(string)
+    for before, after in [(' ,', ','), (' .', '.'), (' -', '-'), ('- ', '-'),
+                          ('( ', '('), (' )', ')')]:
+        res = res.replace(before, after)
+    return res
+
+class NormalizationTest:
+    """Checks the optimized normalization functions against the straightforward ones on
+    all the lines of the test data files and on some tricky strings"""
+
+    tricky_strings = [
+        '', ' ', '  ,', 'a  -  b', '- -', '-  -', '(   )', '( -', '- )', '(  ,',
+        ' «ЁЛКА» — “Ёж”\t\r\n', 'ΟΔΟΣ ΣΟΦΟΣ', 'İstanbul ‐ ’ok`', '\n a , b . c \n'
+        ]
+
+    def __init__(self, owner):
+        self.name = 'normalization'
+        self.comment = 'normalization functions differ from the reference ones'
+        self.owner = owner
+        self.is_ok = None
+
+    def loadLines(self):
+        """Returns the lines of all the test data files, grouped by file"""
+        res = [NormalizationTest.tricky_strings]
+        for test_dir in sorted(os.listdir(self.owner.path)):
+            full_dir = os.path.join(self.owner.path, test_dir)
+            if test_dir == '__out' or not os.path.isdir(full_dir):
+                continue
+            for filename in sorted(os.listdir(full_dir)):
+                with open(os.path.join(full_dir, filename), encoding='utf-8') as f:
+                    res.append(f.read().split('\n'))
+        return res
+
+    def run(self):
+        """Run the test"""
+        print('Running test {:30} '.format(self.name), end='', flush=True)
+
+        self.is_ok = True
+        for lines in self.loadLines():
+            # normalize the lines twice to check the cached results as well
+            for line in lines + lines:
+                self.is_ok &= normalize(line) == referenceNormalize(line)
+                self.is_ok &= safeNormalize(line) == referenceSafeNormalize(line)
+            self.is_ok &= normalizeMany(lines) == [referenceNormalize(x) for x in lines]
+            self.is_ok &= normalizeMany(['\n'.join(lines)]) == [
+                referenceNormalize('\n'.join(lines))]
+
+        print('SUCCESS' if self.is_ok else 'FAIL!')
+
+class LeaderboardUpdateTest:
+    """Evaluates two runs on the leaderboard, then updates a document and checks that
+    the metrics records of the update are labelled with the run they belong to"""
+
+    def __init__(self, owner):
+        self.name = 'leaderboard_update'
+        self.comment = 'records of an updated document are labelled with a wrong run'
+        self.owner = owner
+        self.is_ok = None
+
+    def run(self):
+        """Run the test"""
+        print('Running test {:30} '.format(self.name), end='', flush=True)
+
+        test_dir = os.path.join(self.owner.path, 'embedded_org_1')
+        sink_path = os.path.join(self.owner.output_path, self.name + '.jsonl')
+        # the leaderboard progress messages are not shown
+        with MetricsSink(sink_path) as sink, contextlib.redirect_stdout(io.StringIO()):
+            board = Leaderboard(test_dir, modes=['t1'], is_incremental=True,
+                                metrics_sink=sink)
+            for run_name in ['run_a', 'run_b']:
+                board.evaluate(test_dir, run_name=run_name)
+            with open(sink_path, encoding='utf-8') as f:
+                n_evaluated = len(f.readlines())
+            board.updateDocument('book_100', '.objects')
+
+        with open(sink_path, encoding='utf-8') as f:
+            records = [json.loads(x) for x in f.readlines()[n_evaluated:]]
+        runs = [x['run'] for x in records if x['tag'] == 'overall']
+        self.is_ok = runs == ['run_a', 'run_b']
+
+        print('SUCCESS' if self.is_ok else 'FAIL!')
+
+class PredictionCacheTest:
+    """Evaluates the same in-memory predictions twice with a result cache and checks
+    that the second evaluation is taken from the cache with the same results"""
+
+    predictions = { 'book_100' : [('org', 1473, 23), ('per', 0, 5)] }
+
+    def __init__(self, owner):
+        self.name = 'prediction_cache'
+        self.comment = 'evaluation of the same predictions does not hit the cache'
+        self.owner = owner
+        self.is_ok = None
+
+    def run(self):
+        """Run the test"""
+        print('Running test {:30} '.format(self.name), end='', flush=True)
+
+        cache_dir = os.path.join(self.owner.output_path, self.name)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        cache = ResultCache(cache_dir)
+        evaluator = PredictionEvaluator(os.path.join(self.owner.path, 'embedded_org_1'),
+                                        cache)
+        modes = ['t1', 't1-l']
+        first = evaluator.evaluateModes(PredictionCacheTest.predictions, modes)
+        misses = cache.misses
+        second = evaluator.evaluateModes(PredictionCacheTest.predictions, modes)
+
+        self.is_ok = cache.hits == len(modes) and cache.misses == misses
+        for mode in modes:
+            self.is_ok &= all(abs(first[mode][x].f1 - second[mode][x].f1) < eps
+                              for x in first[mode])
+
+        print('SUCCESS' if self.is_ok else 'FAIL!')
+
+class ShardMergeTest:
+    """Evaluates the test data in two shards and checks that the merged results are
+    the same as the ones of a single run. With a single document one of the shards is
+    always empty, and so is the shard_no_facts set: its only document has no facts
+    layer, so it is not evaluated at all"""
+
+    # (task, mode, test data folder)
+    cases = [(1, '-', 'embedded_org_1'), (2, '-', 'ent_quotes'),
+             (3, '-', 'fact_duplicates'), (3, 'm', 'shard_no_facts')]
+
+    def __init__(self, owner):
+        self.name = 'shard_merge'
+        self.comment = 'merged shard results differ from a single run'
+        self.owner = owner
+        self.is_ok = None
+
+    def run(self):
+        """Run the test"""
+        print('Running test {:30} '.format(self.name), end='', flush=True)
+
+        self.is_ok = True
+        for task, mode, name in ShardMergeTest.cases:
+            path = os.path.join(self.owner.path, name)
+            out_dir = os.path.join(self.owner.output_path, self.name, name)
+            single = createEvaluator(task, mode).evaluate(path, path, '',
+                                                          is_silent=True)
+
+            partial_paths = []
+            for shard in [Shard(1, 2), Shard(2, 2)]:
+                partial_paths.append(shard.defaultPath(out_dir))
+                createEvaluator(task, mode).evaluate(path, path, '', is_silent=True,
+                                                     shard=shard,
+                                                     partial_path=partial_paths[-1])
+            self.is_ok &= sameMetrics(Shard.merge(partial_paths)[1], single)
+
+            # every shard can be merged on its own, even an empty one
+            for partial_path in partial_paths:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    mode_name, metrics, reports = Shard.merge([partial_path])
+                self.is_ok &= metrics.keys() == single.keys()
+
+        print('SUCCESS' if self.is_ok else 'FAIL!')
+
+class CollectionFormatTest:
+    """Stores the test data folders in other collection formats, then checks that every
+    file reads back the same and that the evaluation of the stored standard and response
+    gives the same results as the one of the folder. An archive with the same file name
+    in two folders must be rejected"""
+
+    # (task, mode, test data folder)
+    cases = [(1, '-', 'embedded_org_4'), (2, '-', 'ent_quotes'),
+             (3, '-', 'fact_duplicates')]
+
+    # {file extension : function(folder path, file name) storing the folder}
+    formats = {
+        '.pack' : packDirectory,
+        '.zip' : lambda path, filename: archiveFolders(filename, { 'set' : path }),
+        '.tar.gz' : lambda path, filename: archiveFolders(filename, { 'set' : path })
+        }
+
+    def __init__(self, owner):
+        self.name = 'collection_formats'
+        self.comment = 'a stored collection differs from the folder'
+        self.owner = owner
+        self.is_ok = None
+
+    def run(self):
+        """Run the test"""
+        print('Running test {:30} '.format(self.name), end='', flush=True)
+
+        out_dir = os.path.join(self.owner.output_path, self.name)
+        os.makedirs(out_dir, exist_ok=True)
+        self.is_ok = True
+        for task, mode, name in CollectionFormatTest.cases:
+            path = os.path.join(self.owner.path, name)
+            expected = createEvaluator(task, mode).evaluate(path, path, '',
+                                                            is_silent=True)
+            for ext, store in sorted(CollectionFormatTest.formats.items()):
+                filename = os.path.join(out_dir, name + ext)
+                store(path, filename)
+                self.is_ok &= self.sameFiles(path, openSource(filename))
+
+                metrics = createEvaluator(task, mode).evaluate(filename, filename, '',
+                                                               is_silent=True)
+                self.is_ok &= sameMetrics(metrics, expected)
+
+            for ext in ['.zip', '.tar.gz']:
+                filename = os.path.join(out_dir, name + '.duplicate' + ext)
+                archiveFolders(filename, { 'devset' : path, 'testset' : path })
+                try:
+                    openSource(filename)
+                    self.is_ok = False
+                except Exception:
+                    pass
+
+        print('SUCCESS' if self.is_ok else 'FAIL!')
+
+    def sameFiles(self, path, source):
+        """Check if the collection has the same files as the folder"""
+        filenames = sorted(os.listdir(path))
+        if source.names() != set(x.split('.')[0] for x in filenames):
+            return False
+        for filename in filenames:
+            name = filename.split('.')[0]
+            ext = filename[len(name):]
+            with open(os.path.join(path, filename), 'rb') as f:
+                if not source.has(name, ext) or source.read(name, ext) != f.read():
+                    return False
+        return True
+
+class ResultCacheTest:
+    """Evaluates the test data twice with a result cache and checks that the second
+    evaluation is taken from the cache with the same metrics and reports"""
+
+    # (task, mode, test data folder)
+    cases = [(1, 'l', 'embedded_org_4'), (2, 'm', 'ent_quotes'),
+             (3, '-', 'fact_duplicates')]
+
+    def __init__(self, owner):
+        self.name = 'result_cache'
+        self.comment = 'cached results differ from the evaluated ones'
+        self.owner = owner
+        self.is_ok = None
+
+    def run(self):
+        """Run the test"""
+        print('Running test {:30} '.format(self.name), end='', flush=True)
+
+        out_dir = os.path.join(self.owner.output_path, self.name)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        cache = ResultCache(os.path.join(out_dir, 'cache'))
+        self.is_ok = True
+        for task, mode, name in ResultCacheTest.cases:
+            path = os.path.join(self.owner.path, name)
+            reports = []
+            results = []
+            for run in ['evaluated', 'cached']:
+                reports.append(os.path.join(out_dir, run, name))
+                hits = cache.hits
+                results.append(createEvaluator(task, mode, cache).evaluate(
+                    path, path, reports[-1], is_silent=True))
+            self.is_ok &= cache.hits == hits + len(os.listdir(reports[0]))
+            self.is_ok &= sameMetrics(results[0], results[1])
+            self.is_ok &= self.sameReports(*reports)
+
+        print('SUCCESS' if self.is_ok else 'FAIL!')
+
+    def sameReports(self, path1, path2):
+        """Check if the two report folders have the same reports"""
+        if sorted(os.listdir(path1)) != sorted(os.listdir(path2)):
+            return False
+        for filename in os.listdir(path1):
+            with open(os.path.join(path1, filename), encoding='utf-8') as f1, \
+                 open(os.path.join(path2, filename), encoding='utf-8') as f2:
+                if f1.read() != f2.read():
+                    return False
+        return True
+
+class ReportArchiveTest:
+    """Writes the reports on several test data folders to a report folder and to .zip
+    and .tar.gz archives, one folder after another, and checks that the archives end up
+    with the same reports as the folder"""
+
+    # test data folders of track 1
+    names = ['embedded_org_4', 'embedded_per_4']
+
+    def __init__(self, owner):
+        self.name = 'report_archives'
+        self.comment = 'archived reports differ from the report folder'
+        self.owner = owner
+        self.is_ok = None
+
+    def run(self):
+        """Run the test"""
+        print('Running test {:30} '.format(self.name), end='', flush=True)
+
+        out_dir = os.path.join(self.owner.output_path, self.name)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        folder = os.path.join(out_dir, 'reports')
+        for name in ReportArchiveTest.names:
+            path = os.path.join(self.owner.path, name)
+            Eval1().evaluate(path, path, folder, is_silent=True)
+
+        self.is_ok = True
+        for ext in ['.zip', '.tar.gz']:
+            archive = folder + ext
+            # the reports of the first folder are written by the background thread
+            for i, name in enumerate(ReportArchiveTest.names):
+                path = os.path.join(self.owner.path, name)
+                Eval1(True, report_thread=i == 0).evaluate(path, path, archive,
+                                                           is_silent=True)
+
+            with ReportArchiveReader(archive) as reader:
+                filenames = [reader.filename(x) for x in reader.names()]
+                self.is_ok &= sorted(filenames) == sorted(os.listdir(folder))
+                for name, filename in zip(reader.names(), filenames):
+                    with open(os.path.join(folder, filename), encoding='utf-8') as f:
+                        self.is_ok &= reader.read(name) == f.read()
+
+        print('SUCCESS' if self.is_ok else 'FAIL!')
+
+class MetricsSinkTest:
+    """Evaluates the test data with a JSON Lines and a CSV metrics sink and checks that
+    the counters of the written records add up to the metrics of the evaluation"""
+
+    # (task, mode, test data folder)
+    cases = [(1, '-', 'embedded_org_4'), (1, 'l', 'embedded_org_4'),
+             (2, '-', 'ent_quotes'), (3, 'm', 'fact_duplicates')]
+
+    counters = ['tp_std', 'tp_test', 'n_std', 'n_test']
+
+    def __init__(self, owner):
+        self.name = 'metrics_sink'
+        self.comment = 'metrics sink records do not add up to the metrics'
+        self.owner = owner
+        self.is_ok = None
+
+    def run(self):
+        """Run the test"""
+        print('Running test {:30} '.format(self.name), end='', flush=True)
+
+        out_dir = os.path.join(self.owner.output_path, self.name)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.makedirs(out_dir)
+        self.is_ok = True
+        for ext in ['.jsonl', '.csv']:
+            filename = os.path.join(out_dir, 'metrics' + ext)
+            expected = {}
+            with MetricsSink(filename) as sink:
+                for task, mode, name in MetricsSinkTest.cases:
+                    path = os.path.join(self.owner.path, name)
+                    e = createEvaluator(task, mode)
+                    e.metrics_sink = sink
+                    res = e.evaluate(path, path, os.path.join(out_dir, name),
+                                     is_silent=True)
+                    for tag, m in res.items():
+                        expected[(e.modeName(), tag)] = [getattr(m, x)
+                                                         for x in MetricsSinkTest.counters]
+
+            self.is_ok &= self.loadTotals(filename) == expected
+
+        print('SUCCESS' if self.is_ok else 'FAIL!')
+
+    def loadTotals(self, filename):
+        """Load the records of a metrics sink file and sum their counters into
+        {(mode, tag) : counters}"""
+        with open(filename, encoding='utf-8', newline='') as f:
+            if filename.endswith('.csv'):
+                records = list(csv.DictReader(f))
+            else:
+                records = [json.loads(line) for line in f]
+
+        res = {}
+        for record in records:
+            total = res.setdefault((record['mode'], record['tag']),
+                                   [0] * len(MetricsSinkTest.counters))
+            for i, x in enumerate(MetricsSinkTest.counters):
+                total[i] += float(record[x])
+        return res
+
+class MetricsTableTest:
+    """Builds a metrics table out of the per-document results of several test data
+    folders and checks its totals and macro-averages against the ones accumulated with
+    Metrics"""
+
+    # test data folders of track 1, one document each
+    names = ['embedded_org_1', 'embedded_org_4', 'embedded_per_1', 'embedded_per_4',
+             'org_loc_duality_4']
+
+    def __init__(self, owner):
+        self.name = 'metrics_table'
+        self.comment = 'metrics table totals differ from the accumulated metrics'
+        self.owner = owner
+        self.is_ok = None
+
+    def run(self):
+        """Run the test"""
+        print('Running test {:30} '.format(self.name), end='', flush=True)
+
+        out_dir = os.path.join(self.owner.output_path, self.name)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        documents = {}
+        for name in MetricsTableTest.names:
+            path = os.path.join(self.owner.path, name)
+            e = Eval1()
+            documents[name] = e.evaluate(path, path, os.path.join(out_dir, name),
+                                         is_silent=True)
+        tags = e.metricTags()
+
+        # the small capacity makes the table grow while the documents are added
+        table = MetricsTable(tags, 2)
+        for name in MetricsTableTest.names:
+            table.add(name, documents[name])
+        # adding a document again replaces its metrics
+        table.add(MetricsTableTest.names[0], documents[MetricsTableTest.names[0]])
+
+        self.is_ok = len(table) == len(MetricsTableTest.names)
+        subsets = [(None, None), (MetricsTableTest.names[1:3], None),
+                   (None, tags[:2]), ([], None)]
+        for names, subset_tags in subsets:
+            self.is_ok &= sameMetrics(table.total(names, subset_tags),
+                                      self.accumulate(documents, names, subset_tags))
+            self.is_ok &= self.sameAverages(table.macroAverage(names, subset_tags),
+                                            documents, names, subset_tags)
+
+        built = MetricsTable.fromDocuments(documents, tags)
+        self.is_ok &= sameMetrics(built.total(), table.total())
+
+        print('SUCCESS' if self.is_ok else 'FAIL!')
+
+    def accumulate(self, documents, names, tags):
+        """Sum the metrics of the given documents and tags with Metrics.add"""
+        names = names if names != None else MetricsTableTest.names
+        tags = tags if tags != None else documents[MetricsTableTest.names[0]].keys()
+        res = dict((tag, Metrics()) for tag in tags)
+        for name in names:
+            for tag, m in res.items():
+                m.add(documents[name][tag])
+        return res
+
+    def sameAverages(self, averages, documents, names, tags):
+        """Check the macro-averages against the mean of the per-document scores"""
+        names = names if names != None else MetricsTableTest.names
+        for tag, values in averages.items():
+            if tags != None and not tag in tags:
+                return False
+            for i, attr in enumerate(['precision', 'recall', 'f1']):
+                scores = [getattr(documents[x][tag], attr) for x in names]
+                expected = sum(scores) / len(scores) if scores else 1.0
+                if abs(values[i] - expected) > eps:
+                    return False
+        return True
+
 #########################################################################################
 
 if __name__ == '__main__':
@@ -0,0 +1,127 @@
+# Evaluates a batch of submissions against one standard markup
+# Requires python 3 and numpy
+
+# Usage:
+#
+#   <Python3 executable> leaderboard.py -s <std_dir> [-o <output_dir>] [-n <set_name>]
+#                                       [-m <modes>] [-c <cache_dir>] [-z <format>] [-i]
+#                                       [--metrics <metrics_file>] <test_dir>+
+#       -s [std_dir]    - path to the standard files directory
+#       -o [output_dir] - path to the reports folder, reports of each evaluation are
+#                         written to <output_dir>/<run>.<set>.<mode>
+#       -n [set_name]   - set name used in the report folder names
+#                         (default: the standard directory name without 'set')
+#       -m [modes]      - comma-separated list of the evaluated modes
+#                         (default: t1,t1-l,t2,t2-m,t3,t3-m)
+#       -c [cache_dir]  - path to the result cache folder, only the documents that
+#                         changed since they were cached are evaluated
+#       -z [format]     - write the reports of each evaluation to a single archive
+#                         <output_dir>/<run>.<set>.<mode>.<format> instead of a folder,
+#                         the format is zip or tar.gz
+#       -i              - write the reports only for the documents with imperfect
+#                         results
+#       --metrics [metrics_file] - path to the file the results of every run, document
+#                         and tag are written to, as JSON Lines or as CSV if the name
+#                         ends with .csv (see dialent/common/sink.py)
+#       [test_dir]      - path to a submission directory or archive, wildcards are
+#                         allowed. The run name is the directory name
+#       -h              - display this message
+#
+# Every submission is evaluated in all the modes of the tracks it has responses for.
+# The standard markup is loaded only once, and the combined table of the results is
+# printed and saved to <output_dir>/leaderboard.<set>.txt
+
+#########################################################################################
+
+import sys
+import getopt
+
+from dialent.leaderboard import Leaderboard
+from dialent.common.cache import ResultCache
+from dialent.common.sink import MetricsSink
+
+#########################################################################################
+
+def usage():
+    print('Usage:')
+    print('<Python3 executable> leaderboard.py -s <std_dir> [-o <output_dir>] [-n <set_name>]')
+    print('                                    [-m <modes>] [-c <cache_dir>] [-z <format>] [-i]')
+    print('                                    [--metrics <metrics_file>] <test_dir>+')
+    print('    -s [std_dir]    - path to the standard files directory')
+    print('    -o [output_dir] - path to the reports folder')
+    print('    -n [set_name]   - set name used in the report folder names')
+    print('    -m [modes]      - comma-separated list of the evaluated modes')
+    print('                      (default: {})'.format(','.join(Leaderboard.modes)))
+    print('    -c [cache_dir]  - path to the result cache folder')
+    print('    -z [format]     - write the reports of each evaluation to a single archive')
+    print('                      ({})'.format(' or '.join(Leaderboard.report_formats)))
+    print('    -i              - write the reports only for the documents with imperfect')
+    print('                      results')
+    print('    --metrics [metrics_file] - path to the file the results of every run, document')
+    print('                      and tag are written to (JSON Lines, or CSV for a .csv file)')
+    print('    [test_dir]      - path to a submission directory or archive')
+    print('                      (wildcards are allowed)')
+    print('    -h              - display this message')
+
+def main():
+    """
+        Runs comparison
+    """
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 's:o:n:m:c:z:ih', ['metrics='])
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+        sys.exit(2)
+
+    std_path = None
+    out_path = ''
+    set_name = None
+    modes = None
+    cache = None
+    report_format = None
+    only_imperfect = False
+    metrics_path = None
+    for o, a in opts:
+        if o == '-h':
+            usage()
+            sys.exit()
+        elif o == '-s':
+            std_path = a
+        elif o == '-o':
+            out_path = a
+        elif o == '-n':
+            set_name = a
+        elif o == '-m':
+            modes = a.split(',')
+        elif o == '-c':
+            cache = ResultCache(a)
+        elif o == '-z':
+            report_format = a
+        elif o == '-i':
+            only_imperfect = True
+        elif o == '--metrics':
+            metrics_path = a
+        else:
+            assert False, 'unhandled option'
+
+    assert std_path != None and len(args) > 0, 'Standard and test paths must be set'\
+        ' (see python leaderboard.py -h)'
+
+    if modes != None:
+        unknown = [x for x in modes if not x in Leaderboard.modes]
+        assert len(unknown) == 0, 'Unknown modes: {}'.format(', '.join(unknown))
+
+    assert report_format == None or report_format in Leaderboard.report_formats, \
+        'Unknown report format: {}'.format(report_format)
+
+    sink = MetricsSink(metrics_path) if metrics_path != None else None
+    board = Leaderboard(std_path, set_name, modes, cache, False, report_format,
+                        only_imperfect, sink)
+    board.evaluateAll(args, out_path)
+    if sink != None:
+        sink.close()
+    board.printTable(out_path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Combines the partial results of a sharded evaluation into the final table
+# Requires python 3 and numpy
+
+# Usage:
+#
+#   <Python3 executable> merge.py [-o <output_file>] <partial_file>+
+#       -o [output_file]  - path to the file the final table is saved to
+#       [partial_file]    - path to a partial results file written by t1/t2/t3_eval.py
+#                           with the --shard option. Wildcards are allowed, a directory
+#                           stands for all the partial.*.json files in it
+#       -h                - display this message
+#
+# All the partial files must come from the same mode and the same number of shards.
+# The table is exactly the one the evaluation of all the documents at once prints
+
+#########################################################################################
+
+import sys
+import os
+import glob
+import getopt
+
+from dialent.leaderboard import Leaderboard
+from dialent.common.shard import Shard
+from dialent.common.reports import findMissing
+
+#########################################################################################
+
+def usage():
+    print('Usage:')
+    print('<Python3 executable> merge.py [-o <output_file>] <partial_file>+')
+    print('    -o [output_file]  - path to the file the final table is saved to')
+    print('    [partial_file]    - path to a partial results file written by t1/t2/t3_eval.py')
+    print('                        with the --shard option. Wildcards are allowed, a directory')
+    print('                        stands for all the partial.*.json files in it')
+    print('    -h                - display this message')
+
+def main():
+    """
+        Runs the merge
+    """
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'o:h')
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+        sys.exit(2)
+
+    out_path = ''
+    for o, a in opts:
+        if o == '-h':
+            usage()
+            sys.exit()
+        elif o == '-o':
+            out_path = a
+        else:
+            assert False, 'unhandled option'
+
+    paths = []
+    for pattern in args:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, 'partial.*.json')
+        paths.extend(sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern])
+
+    assert len(paths) > 0, 'Partial results files must be set (see python merge.py -h)'
+
+    mode, metrics, reports = Shard.merge(paths)
+    missing = findMissing([x for x in reports.values() if x != None])
+    if len(missing) > 0:
+        print('WARNING: missing reports:\n' + '\n'.join(missing))
+
+    table = Leaderboard.createEvaluator(mode).buildMetricsTable(metrics)
+    print(table)
+    if len(out_path) > 0:
+        with open(out_path, 'w', encoding='utf-8') as f:
+            f.write(table + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# Generates responses with random errors for a standard markup, e.g. for load tests
+# Requires python 3 and numpy
+
+# Usage:
+#
+#   <Python3 executable> noisy_response.py -s <std_dir> -o <output_dir> [-n <variants>]
+#                                           [-j <workers>] [-r <seed>] [-k <tracks>]
+#                                           [-e <kind>=<rate>[,<kind>=<rate>]*]
+#       -s [std_dir]     - path to the standard files directory or archive
+#       -o [output_dir]  - path to the folder the responses are written to
+#       -n [variants]    - number of the responses, each one is written to a subfolder
+#                          run000, run001, ... (default: 1)
+#       -j [workers]     - number of the worker processes (default: 1)
+#       -r [seed]        - random seed of the first response, the next ones get the next
+#                          seeds (default: 1)
+#       -k [tracks]      - comma-separated list of the tracks (default: 1,2,3)
+#       -e [kind]=[rate] - rate of a kind of errors, see dialent/noise.py for the kinds
+#                          and the default rates
+#       -h               - display this message
+#
+# A response generated with the same seed and rates is always the same
+
+#########################################################################################
+
+import sys
+import getopt
+
+from dialent.noise import NoisyResponseGenerator, generateVariants
+
+#########################################################################################
+
+def usage():
+    print('Usage:')
+    print('<Python3 executable> noisy_response.py -s <std_dir> -o <output_dir> [-n <variants>]')
+    print('                                        [-j <workers>] [-r <seed>] [-k <tracks>]')
+    print('                                        [-e <kind>=<rate>[,<kind>=<rate>]*]')
+    print('    -s [std_dir]     - path to the standard files directory or archive')
+    print('    -o [output_dir]  - path to the folder the responses are written to')
+    print('    -n [variants]    - number of the responses, each one is written to a subfolder')
+    print('                       run000, run001, ... (default: 1)')
+    print('    -j [workers]     - number of the worker processes (default: 1)')
+    print('    -r [seed]        - random seed of the first response, the next ones get the')
+    print('                       next seeds (default: 1)')
+    print('    -k [tracks]      - comma-separated list of the tracks (default: 1,2,3)')
+    print('    -e [kind]=[rate] - rate of a kind of errors ({})'.format(
+        ', '.join('{}={}'.format(k, v)
+                  for k, v in NoisyResponseGenerator.default_rates.items())))
+    print('    -h               - display this message')
+
+def main():
+    """
+        Runs the generation
+    """
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 's:o:n:j:r:k:e:h')
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+        sys.exit(2)
+
+    std_path = None
+    out_path = None
+    n_variants = 1
+    workers = 1
+    seed = 1
+    tracks = (1, 2, 3)
+    rates = {}
+    for o, a in opts:
+        if o == '-h':
+            usage()
+            sys.exit()
+        elif o == '-s':
+            std_path = a
+        elif o == '-o':
+            out_path = a
+        elif o == '-n':
+            n_variants = int(a)
+        elif o == '-j':
+            workers = int(a)
+        elif o == '-r':
+            seed = int(a)
+        elif o == '-k':
+            tracks = tuple(int(x) for x in a.split(','))
+        elif o == '-e':
+            for item in a.split(','):
+                kind, rate = item.split('=')
+                rates[kind.strip()] = float(rate)
+        else:
+            assert False, 'unhandled option'
+
+    assert std_path != None, 'Standard path must be set (see python noisy_response.py -h)'
+    assert out_path != None, 'Output path must be set (see python noisy_response.py -h)'
+
+    # check the rates before the workers are started
+    NoisyResponseGenerator(rates)
+    paths = generateVariants(std_path, out_path, n_variants, rates, seed, tracks,
+                             workers)
+    print('Generated {} responses in {}'.format(len(paths), out_path))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# Packs a standard markup directory into a single corpus file
+# Requires python 3
+
+# Usage:
+#
+#   <Python3 executable> pack.py [std_dir] [output_file]
+#       [std_dir]     - path to the standard files directory
+#       [output_file] - path to the packed corpus file to create
+#
+# The packed file can be used instead of the standard directory in all the evaluation
+# scripts (e.g. t1_eval.py -s devset.pack -t <test_dir>)
+
+import sys
+
+from dialent.common.packed import PackedCorpus
+from dialent.common.packed import packDirectory
+
+def pack(directory, filename):
+    """Packs the given directory and checks the result"""
+    print('Packing directory: {} ...'.format(directory))
+    n = packDirectory(directory, filename)
+    corpus = PackedCorpus(filename)
+    assert(len(corpus.names()) == n)
+    corpus.close()
+    print(' ... Packed {} documents into {}'.format(n, filename))
+
+
+def showUsage():
+    print('This script packs a standard markup directory into a single corpus file')
+    print('')
+    print(' Usage:')
+    print('')
+    print('   <Python3 executable> pack.py [std_dir] [output_file]')
+    print('      [std_dir]     - path to the standard files directory')
+    print('      [output_file] - path to the packed corpus file to create')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        showUsage()
+    else:
+        pack(sys.argv[1], sys.argv[2])
@@ -3,11 +3,39 @@
 
 # Usage:
 #
-#   <Python3 executable> t2_eval.py -s <std_dir> -t <test_dir> [-o <output_dir>] [-m]
+#   <Python3 executable> t2_eval.py -s <std_dir> -t <test_dir> [-o <output_dir>]
+#                                   [-c <cache_dir>] [-m] [-i] [--report-thread]
+#                                   [--metrics <metrics_file>]
+#                                   [--shard <i/N> [--partial <partial_file>]] [--stats]
+#                                   [--profile [--slowest <N>] [--cprofile <file>]
+#                                    [--memory]]
 #       -s [std_dir]    - path to the standard files directory
 #       -t [test_dir]   - path to the response files directory
-#       -o [output_dir] - path to the comparator reports folder
+#                         (both can also be .zip/.tar(.gz) archives)
+#       -o [output_dir] - path to the comparator reports folder, or to a .zip/.tar.gz
+#                         archive the reports are written to (with --shard, each shard
+#                         writes <name>.<i>-of-<N>.zip/.tar.gz)
+#       -c [cache_dir]  - path to the result cache folder, only the documents that
+#                         changed since they were cached are evaluated
+#       -i              - write the reports only for the documents with imperfect
+#                         results
+#       --report-thread - write the reports in a background thread
+#       --metrics [metrics_file] - path to the file the results of every document and
+#                         tag are written to, as JSON Lines or as CSV if the name
+#                         ends with .csv (see dialent/common/sink.py)
 #       -m              - enables the simplified comparison mode (no penalty for extra values)
+#       --shard [i/N]   - evaluate only the i-th of N shards (i = 1..N) of the documents
+#                         and save their results to a partial results file, see merge.py
+#       --partial [partial_file] - path to the partial results file
+#                         (default: <output_dir>/partial.<i>-of-<N>.json)
+#       --stats         - print the matching search counters of every document, ranked
+#                         by the time spent
+#       --profile       - print the wall and CPU time of every evaluation stage and the
+#                         slowest documents
+#       --slowest [N]   - number of the slowest documents printed (default: 10)
+#       --cprofile [file] - save the cProfile statistics of the run to the file
+#       --memory        - print the peak of the memory allocated in every stage
+#                         (slows the evaluation down)
 #       -h              - display this message
 #
 
@@ -18,16 +46,49 @@ import os
 import getopt
 
 from dialent.task2.eval import Evaluator
+from dialent.common.cache import ResultCache
+from dialent.common.shard import Shard
+from dialent.common.sink import MetricsSink
+from dialent.common.stats import SearchStats
+from dialent.common.timing import StageProfiler
 
 #########################################################################################
 
 def usage():
     print('Usage:')
-    print('<Python3 executable> t2_eval.py -s <std_dir> -t <test_dir> [-o <output_dir>] [-m]')
+    print('<Python3 executable> t2_eval.py -s <std_dir> -t <test_dir> [-o <output_dir>]')
+    print('                                  [-c <cache_dir>] [-m] [-i] [--report-thread]')
+    print('                                  [--metrics <metrics_file>]')
+    print('                                  [--shard <i/N> [--partial <partial_file>]] [--stats]')
+    print('                                  [--profile [--slowest <N>] [--cprofile <file>]')
+    print('                                   [--memory]]')
     print('    -s [std_dir]    - path to the standard files directory')
     print('    -t [test_dir]   - path to the response files directory')
-    print('    -o [output_dir] - path to the comparator reports folder')
+    print('                      (both can also be .zip/.tar(.gz) archives)')
+    print('    -o [output_dir] - path to the comparator reports folder, or to a .zip/.tar.gz')
+    print('                      archive the reports are written to (with --shard, each shard')
+    print('                      writes <name>.<i>-of-<N>.zip/.tar.gz)')
+    print('    -c [cache_dir]  - path to the result cache folder, only the documents that')
+    print('                      changed since they were cached are evaluated')
+    print('    -i              - write the reports only for the documents with imperfect')
+    print('                      results')
+    print('    --report-thread - write the reports in a background thread')
+    print('    --metrics [metrics_file] - path to the file the results of every document and')
+    print('                      tag are written to, as JSON Lines or as CSV if the name')
+    print('                      ends with .csv')
     print('    -m              - enables the simplified comparison mode (no penalty for extra values)')
+    print('    --shard [i/N]   - evaluate only the i-th of N shards (i = 1..N) of the documents')
+    print('                      and save their results to a partial results file, see merge.py')
+    print('    --partial [partial_file] - path to the partial results file')
+    print('                      (default: <output_dir>/partial.<i>-of-<N>.json)')
+    print('    --stats         - print the matching search counters of every document, ranked')
+    print('                      by the time spent')
+    print('    --profile       - print the wall and CPU time of every evaluation stage and the')
+    print('                      slowest documents')
+    print('    --slowest [N]   - number of the slowest documents printed (default: 10)')
+    print('    --cprofile [file] - save the cProfile statistics of the run to the file')
+    print('    --memory        - print the peak of the memory allocated in every stage')
+    print('                      (slows the evaluation down)')
     print('    -h              - display this message')
 
 def main():
@@ -35,7 +96,9 @@ def main():
         Runs comparison
     """
     try:
-        opts, args = getopt.getopt(sys.argv[1:], 's:t:o:hm')
+        opts, args = getopt.getopt(sys.argv[1:], 's:t:o:c:hmi',
+            ['shard=', 'partial=', 'stats', 'profile', 'slowest=', 'cprofile=', 'memory',
+             'report-thread', 'metrics='])
     except getopt.GetoptError as err:
         print(str(err))
         usage()
@@ -44,6 +107,17 @@ def main():
     std_path = None
     test_path = None
     out_path = ''
+    cache = None
+    only_imperfect = False
+    report_thread = False
+    metrics_path = None
+    shard = None
+    partial_path = None
+    is_stats = False
+    is_profile = False
+    n_slowest = 10
+    cprofile_path = None
+    is_memory = False
     mode = 'regular'
     for o, a in opts:
         if o == '-h':
@@ -55,6 +129,28 @@ def main():
             test_path = a
         elif o == '-o':
             out_path = a
+        elif o == '-c':
+            cache = ResultCache(a)
+        elif o == '-i':
+            only_imperfect = True
+        elif o == '--report-thread':
+            report_thread = True
+        elif o == '--metrics':
+            metrics_path = a
+        elif o == '--shard':
+            shard = Shard.parse(a)
+        elif o == '--partial':
+            partial_path = a
+        elif o == '--stats':
+            is_stats = True
+        elif o == '--profile':
+            is_profile = True
+        elif o == '--slowest':
+            n_slowest = int(a)
+        elif o == '--cprofile':
+            cprofile_path = a
+        elif o == '--memory':
+            is_memory = True
         elif o == '-m':
             mode = 'simple'
         else:
@@ -63,8 +159,25 @@ def main():
     assert std_path != None and test_path != None, 'Stnadard and test paths must be set'\
         '(see python t2_eval.py -h)'
 
-    e = Evaluator(mode)
-    e.evaluate(std_path, test_path, out_path)
+    if shard != None and partial_path == None:
+        partial_path = shard.defaultPath(out_path)
+    if shard != None:
+        out_path = shard.reportPath(out_path)
+
+    sink = MetricsSink(metrics_path) if metrics_path != None else None
+    e = Evaluator(mode, cache, only_imperfect, report_thread, sink)
+    profiler = StageProfiler(is_memory, cprofile_path) if is_profile else None
+    if profiler != None:
+        profiler.start()
+    e.evaluate(std_path, test_path, out_path, shard=shard, partial_path=partial_path)
+    if profiler != None:
+        profiler.stop()
+    if sink != None:
+        sink.close()
+    if is_stats:
+        print(SearchStats.buildTable(e.search_stats))
+    if profiler != None:
+        print(profiler.buildReport(n_slowest))
 
 if __name__ == '__main__':
     main()
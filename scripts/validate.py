@@ -4,20 +4,21 @@
 # Usage:
 #
 #   <Python3 executable> validate.py [dir]
-#       [dir]    - path to the submission files directory
+#       [dir]    - path to the submission files directory or .zip/.tar(.gz) archive
 #       Submission track is detected by file extension
 
-import os
 import sys
 
+from dialent.common.source import openSource
+
 from dialent.task1.util import loadAllTest as loadTask1
 from dialent.task2.util import loadAllTest as loadTask2
 from dialent.task3.util import loadAllTest as loadTask3
 
 def validate(directory):
-    """Runs validation of the task submission in the given directory"""
+    """Runs validation of the task submission in the given directory or archive"""
     
-    ext = set([x.split('.')[-1] for x in os.listdir(directory)])
+    source = openSource(directory)
 
     func_by_task = {
         '1' : loadTask1,
@@ -27,8 +28,8 @@ def validate(directory):
 
     print('Validating directory: {} ...'.format(directory))
     for task in ['1', '2', '3']:
-        if 'task' + task in ext:
-            t = func_by_task[task](directory)
+        if len(source.names('.task' + task)) > 0:
+            t = func_by_task[task](source)
             print(' ... Loaded {} submission files for task {}'.format(
                 len(t), task))
 
@@ -41,7 +42,7 @@ def showUsage():
     print(' Usage:')
     print('')
     print('   <Python3 executable> validate.py [dir]')
-    print('      [dir]    - path to the submission files directory')
+    print('      [dir]    - path to the submission files directory or .zip/.tar(.gz) archive')
 
 
 if __name__ == '__main__':